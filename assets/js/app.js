@@ -0,0 +1,95 @@
+/*
+ * Behaviour for the site's pages. Pages opt in with data attributes, so
+ * one cached script serves all of them and the templates carry no inline JS.
+ */
+(function () {
+  'use strict';
+
+  // Dismissible alerts: <button class="btn-close" data-dismiss="alert">
+  document.addEventListener('click', function (event) {
+    var button = event.target.closest('[data-dismiss="alert"]');
+    if (button) {
+      var alert = button.closest('.alert');
+      alert.classList.remove('show');
+      setTimeout(function () { alert.remove(); }, 150);
+    }
+  });
+
+  // Confirm before following a link: <a data-confirm="Are you sure?">
+  document.addEventListener('click', function (event) {
+    var link = event.target.closest('[data-confirm]');
+    if (link && !window.confirm(link.dataset.confirm)) {
+      event.preventDefault();
+    }
+  });
+
+  // Character counts: <input data-count="sloganCount" maxlength="200">
+  function updateCount(field) {
+    var counter = document.getElementById(field.dataset.count);
+    var max = field.maxLength > 0 ? field.maxLength : null;
+    var length = field.value.length;
+    counter.textContent = max ? length + '/' + max + ' characters' : length + ' characters';
+    counter.classList.toggle('near-limit', max !== null && length > max * 0.9);
+  }
+
+  // Live previews: <input data-preview="previewSlogan" data-empty="No slogan set" [data-words="30"]>
+  function updatePreview(field) {
+    var preview = document.getElementById(field.dataset.preview);
+    var words = parseInt(field.dataset.words || '0', 10);
+    var text = field.value;
+    if (text && words) {
+      var split = text.split(' ');
+      text = split.slice(0, words).join(' ') + (split.length > words ? '...' : '');
+    }
+    preview.textContent = text || field.dataset.empty || '';
+  }
+
+  document.addEventListener('input', function (event) {
+    var field = event.target;
+    if (field.dataset.count) updateCount(field);
+    if (field.dataset.preview) updatePreview(field);
+  });
+
+  // Results: grow the bars from zero, and reload while voting is open (<body data-reload="30">)
+  function animateBars() {
+    document.querySelectorAll('.progress-fill').forEach(function (bar) {
+      var width = bar.style.width;
+      bar.style.width = '0%';
+      setTimeout(function () { bar.style.width = width; }, 300);
+    });
+  }
+
+  function scheduleReload() {
+    var seconds = parseFloat(document.body.dataset.reload);
+    if (seconds > 0) {
+      setInterval(function () { location.reload(); }, seconds * 1000);
+    }
+  }
+
+  // Waiting room: poll the (database-free) status endpoint until our ticket is admitted
+  function waitInLine(position) {
+    var interval = parseFloat(position.dataset.pollInterval);
+    function poll() {
+      fetch(position.dataset.statusUrl, {credentials: 'same-origin'})
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          if (data.admitted) {
+            location.href = position.dataset.admitUrl;
+            return;
+          }
+          if (data.position) position.textContent = data.position;
+          setTimeout(poll, (data.retry_after || interval) * 1000);
+        })
+        .catch(function () { setTimeout(poll, interval * 1000); });
+    }
+    setTimeout(poll, interval * 1000);
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('[data-count]').forEach(updateCount);
+    animateBars();
+    scheduleReload();
+    var position = document.querySelector('[data-status-url]');
+    if (position) waitInLine(position);
+  });
+})();
@@ -1,12 +1,93 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, VoterProfile, CandidateProfile, Election, Vote, LoginToken
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Max
+from django.http import HttpResponse, HttpResponseRedirect, QueryDict
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
+from django.utils import timezone
+from . import deletion, mailer
+from .caching import bump_version
+from .sharding import sharding_enabled, vote_db
+from .models import (CustomUser, VoterProfile, CandidateProfile, Election, EligibilityRule, Vote, LoginToken,
+                     RequestProfile, ElectionArchive, DeletionJob, MailingJob, QueuedBallot, KioskBallot)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large tables.
+    Unfiltered changelists use a cheap row estimate instead of COUNT(*), and
+    filtered ones stop counting once `count_cap` matching rows have been seen.
+    The changelist then reads "10000+" and pages past the cap are still
+    served: each page fetches one extra row to learn whether a next one exists.
+    """
+    count_cap = 10000
+    capped = False  # True once a filtered count stopped at count_cap
+    reached = 0  # pages past the cap known to exist
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._estimate_rows(queryset)
+            if estimate is not None:
+                return estimate
+        count = queryset[:self.count_cap + 1].count()
+        self.capped = count > self.count_cap
+        return min(count, self.count_cap)
+
+    @property
+    def num_pages(self):
+        return max(super().num_pages, self.reached)
+
+    def validate_number(self, number):
+        if not (self.count and self.capped):
+            return super().validate_number(number)
+        # How many pages lie past the cap is unknown, so page() finds the end
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.capped:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        self.reached = max(self.reached, number + (len(rows) > self.per_page))
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def _estimate_rows(self, queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+                row = cursor.fetchone()
+            if row and row[0] > 0:
+                return row[0]
+            return None
+        # Primary keys are auto-incrementing, so MAX(pk) is a B-tree lookup that
+        # only over-estimates by the number of deleted rows.
+        return queryset.model._base_manager.using(queryset.db).aggregate(n=Max('pk'))['n'] or 0
+
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'role', 'is_staff', 'is_active')
     list_filter = ('role', 'is_staff', 'is_active')
     search_fields = ('username', 'email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = UserAdmin.fieldsets + (
         ('Additional Info', {'fields': ('role',)}),
@@ -17,38 +98,149 @@ class VoterProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'has_voted', 'email_verified')
     list_filter = ('has_voted', 'email_verified')
     search_fields = ('user__username', 'user__email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # __str__ walks user; also used by the Vote autocomplete widget
+        return super().get_queryset(request).select_related('user')
 
 @admin.register(CandidateProfile)
 class CandidateProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'slogan', 'votes_received')
+    list_display = ('user', 'election', 'position', 'slogan', 'votes_received')
+    list_filter = ('election', 'position')
     search_fields = ('user__username', 'user__email', 'slogan')
     readonly_fields = ('votes_received',)
-    fields = ('user', 'slogan', 'manifesto', 'votes_received')
+    fields = ('user', 'election', 'position', 'slogan', 'manifesto', 'votes_received')
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'election')
+
     # Optional: Show slogan preview in list
     def slogan_preview(self, obj):
         return obj.slogan[:50] + '...' if len(obj.slogan) > 50 else obj.slogan
     slogan_preview.short_description = 'Slogan'
 
+class EligibilityRuleInline(admin.TabularInline):
+    model = EligibilityRule
+    extra = 0
+
 @admin.register(Election)
 class ElectionAdmin(admin.ModelAdmin):
-    list_display = ('name', 'start_date', 'end_date', 'is_active')
-    list_filter = ('is_active',)
+    list_display = ('name', 'start_date', 'end_date', 'is_active', 'voting_method', 'seats', 'eligible_voter_count')
+    readonly_fields = ('eligible_voter_count',)
+    inlines = [EligibilityRuleInline]
+    list_filter = ('is_active', 'voting_method')
     search_fields = ('name',)
+    actions = ['announce']
+
+    def announce(self, request, queryset):
+        """Queue an email to each election's eligible voters; `manage.py send_announcement --queued` sends it"""
+        for election in queryset:
+            mailer.announcement(election, created_by=request.user)
+        self.message_user(request, f'{queryset.count()} announcement(s) queued; they are sent by '
+                                   f'`manage.py send_announcement --queued`.')
+    announce.short_description = 'Email eligible voters that voting is open'
+
+    # Deleting runs in the background in batches (voting/deletion.py), like the manage page
+    def get_deleted_objects(self, objs, request):
+        # Listing every ballot that would go is as slow as deleting them
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        Election.objects.filter(pk=obj.pk).update(is_active=False, opened_at=obj.opened_at or timezone.now())
+        deletion.queue(obj, 'election', requested_by=request.user)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_model(request, obj)
+
+    def response_delete(self, request, obj_display, obj_id):
+        self.message_user(request, f'"{obj_display}" is being deleted in the background '
+                                   f'by `manage.py run_deletion_jobs`.', messages.SUCCESS)
+        return HttpResponseRedirect(reverse('admin:voting_election_changelist'))
 
 @admin.register(Vote)
 class VoteAdmin(admin.ModelAdmin):
     list_display = ('voter', 'candidate', 'election', 'timestamp')
     list_filter = ('election', 'timestamp')
+    list_select_related = ('voter__user', 'candidate__user', 'election')
     search_fields = ('voter__user__username', 'candidate__user__username')
+    autocomplete_fields = ('voter', 'candidate', 'election')
     readonly_fields = ('timestamp',)
+    ordering = ('-pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        election_id = self._shard_election(request)
+        if election_id:
+            # Shards only hold the vote table: read the election's shard and
+            # fetch voters/candidates from the default database separately.
+            return queryset.using(vote_db(election_id)).prefetch_related(
+                'voter__user', 'candidate__user', 'election'
+            )
+        return queryset
+
+    def _shard_election(self, request):
+        """The election whose shard this request reads: the changelist's election filter, also kept by change pages"""
+        if not sharding_enabled():
+            return None
+        election_id = request.GET.get('election__id__exact') or QueryDict(
+            request.GET.get('_changelist_filters', '')
+        ).get('election__id__exact')
+        return election_id if election_id and election_id.isdigit() else None
+
+    def changelist_view(self, request, extra_context=None):
+        if sharding_enabled() and not self._shard_election(request):
+            # Every election's votes are in its own shard (vote ids repeat across
+            # them), so the list shows one election at a time: the newest by default.
+            election = (Election.objects.filter(is_active=True).order_by('-start_date').first()
+                        or Election.objects.order_by('-start_date').first())
+            if election is not None:
+                query = request.GET.copy()
+                query['election__id__exact'] = election.pk
+                return HttpResponseRedirect(f'{request.path}?{query.urlencode()}')
+        return super().changelist_view(request, extra_context)
+
+    def get_list_select_related(self, request):
+        if sharding_enabled():
+            return ()  # not False: that would make the changelist select_related() everything
+        return super().get_list_select_related(request)
+
+    # Edited and deleted votes change the tally without a new ballot: move the
+    # elections' versions, so cached results and the pages' ETags follow
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        for election_id in {obj.election_id, form.initial.get('election')} - {None}:
+            bump_version(election_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_version(obj.election_id)
+
+    def delete_queryset(self, request, queryset):
+        election_ids = set(queryset.values_list('election_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        for election_id in election_ids:
+            bump_version(election_id)
+
 @admin.register(LoginToken)
 class LoginTokenAdmin(admin.ModelAdmin):
     list_display = ('user', 'token_preview', 'created_at', 'expires_at', 'is_used', 'used_at')
     list_filter = ('is_used', 'created_at', 'expires_at')
-    search_fields = ('user__email', 'user__username', 'token')
+    list_select_related = ('user',)
+    # Tokens are random, so only exact matches make sense (and hit the unique index)
+    search_fields = ('=token', '^user__email', '^user__username')
+    autocomplete_fields = ('user',)
     readonly_fields = ('token', 'created_at', 'used_at')
-    date_hierarchy = 'created_at'
+    # created_at grows with pk; ordering by pk avoids sorting the whole table
+    ordering = ('-pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
     
     def token_preview(self, obj):
         '''Show first 16 characters of token for preview'''
@@ -62,3 +254,147 @@ class LoginTokenAdmin(admin.ModelAdmin):
         LoginToken.cleanup_expired()
         self.message_user(request, "Expired and used tokens cleaned up successfully.")
     cleanup_expired_tokens.short_description = "Clean up expired/used tokens"
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'sql_count', 'sql_ms', 'trigger',
+                    'user')
+    list_filter = ('trigger', 'method', 'status_code')
+    list_select_related = ('user',)
+    search_fields = ('path',)
+    ordering = ('-pk',)
+    fields = ('created_at', 'user', 'trigger', 'method', 'path', 'status_code', 'duration_ms', 'sql_count', 'sql_ms',
+              'download', 'query_table', 'summary')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view),
+                 name='voting_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        """The cProfile stats as a .prof file, for pstats or snakeviz"""
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="request-{profile.pk}.prof"'
+        return response
+
+    def download(self, obj):
+        url = reverse('admin:voting_requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">request-{}.prof</a>', url, obj.pk)
+    download.short_description = 'Profile'
+
+    def query_table(self, obj):
+        rows = format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td><td><code>{}</code></td></tr>', (
+            (f"{q['ms']:.2f} ms", q['alias'], q['origin'], q['sql']) for q in obj.queries
+        ))
+        return format_html('<table><tr><th>Time</th><th>Database</th><th>Issued from</th><th>SQL</th></tr>{}</table>',
+                           rows)
+    query_table.short_description = 'SQL'
+
+
+@admin.register(ElectionArchive)
+class ElectionArchiveAdmin(admin.ModelAdmin):
+    list_display = ('election', 'vote_count', 'ranked_count', 'size_bytes', 'archived_at')
+    list_select_related = ('election',)
+    readonly_fields = ('election', 'votes_file', 'ranked_file', 'vote_count', 'ranked_count', 'size_bytes', 'sha256',
+                       'archived_at')
+
+    def has_add_permission(self, request):
+        return False  # written by `manage.py archive_elections`
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('election_name', 'kind', 'status', 'progress_display', 'requested_by', 'created_at',
+                    'finished_at')
+    list_filter = ('status', 'kind')
+    list_select_related = ('requested_by',)
+    ordering = ('-pk',)
+    readonly_fields = ('election_id', 'election_name', 'kind', 'status', 'requested_by', 'total', 'deleted', 'error',
+                       'created_at', 'started_at', 'heartbeat_at', 'finished_at')
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        return False
+
+    def progress_display(self, obj):
+        progress = obj.progress()
+        return '-' if progress is None else f'{progress}% ({obj.deleted:,}/{obj.total or obj.deleted:,})'
+    progress_display.short_description = 'Progress'
+
+    def retry(self, request, queryset):
+        """Queue failed jobs again; they resume from the rows already deleted"""
+        retried = queryset.filter(status='failed').update(status='pending', error='', finished_at=None)
+        self.message_user(request, f'{retried} job(s) queued again.')
+    retry.short_description = 'Retry failed jobs'
+
+
+@admin.register(MailingJob)
+class MailingJobAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'election', 'status', 'progress_display', 'sent', 'failed', 'created_by', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('election', 'created_by')
+    ordering = ('-pk',)
+    readonly_fields = ('status', 'total', 'sent', 'failed', 'last_user_id', 'error', 'created_by', 'created_at',
+                       'started_at', 'heartbeat_at', 'finished_at')
+    actions = ['pause', 'queue_again']
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def progress_display(self, obj):
+        progress = obj.progress()
+        return '-' if progress is None else f'{progress}%'
+    progress_display.short_description = 'Progress'
+
+    def pause(self, request, queryset):
+        """The sender stops after its current batch"""
+        paused = queryset.filter(status__in=['pending', 'running']).update(status='paused')
+        self.message_user(request, f'{paused} mailing(s) paused.')
+    pause.short_description = 'Pause'
+
+    def queue_again(self, request, queryset):
+        """Resume paused or failed mailings from the last recipient they reached"""
+        queued = queryset.filter(status__in=['paused', 'failed']).update(status='pending')
+        self.message_user(request, f'{queued} mailing(s) queued; `manage.py send_announcement --queued` '
+                                   f'resumes them.')
+    queue_again.short_description = 'Resume'
+
+
+@admin.register(KioskBallot)
+class KioskBallotAdmin(admin.ModelAdmin):
+    """Every ballot synced from a polling-station kiosk, by batch, for reconciling with the kiosks' reports"""
+    list_display = ('ballot_id', 'kiosk', 'election_id', 'voter_id', 'status', 'detail', 'cast_at', 'received_at')
+    list_filter = ('status', 'kiosk')
+    search_fields = ('=ballot_id', '=batch')
+    ordering = ('-pk',)
+    readonly_fields = ('ballot_id', 'kiosk', 'batch', 'election_id', 'voter_id', 'cast_at', 'status', 'detail',
+                       'received_at')
+
+    def has_add_permission(self, request):
+        return False  # written by the kiosk/ballots/ endpoint
+
+
+@admin.register(QueuedBallot)
+class QueuedBallotAdmin(admin.ModelAdmin):
+    """On a kiosk: ballots cast here, and what the server made of them"""
+    list_display = ('ballot_id', 'election', 'voter', 'status', 'detail', 'cast_at', 'synced_at')
+    list_filter = ('status',)
+    list_select_related = ('election', 'voter__user')
+    ordering = ('-pk',)
+    readonly_fields = ('ballot_id', 'election', 'voter', 'candidate_ids', 'ranking', 'cast_at', 'signature', 'status',
+                       'detail', 'synced_at')
+
+    def has_add_permission(self, request):
+        return False
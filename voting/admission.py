@@ -0,0 +1,428 @@
+"""
+Admission control (a virtual waiting room) for the ballot pages.
+
+At most `capacity` voters are inside vote/ and submit-vote/ at a time. Every
+other voter gets a ticket number and a small waiting page that polls
+waiting-room/status/. Tickets are admitted in FIFO order as places free up.
+All of the state lives in the cache, so every worker shares one queue - which
+is why the room refuses to run on a per-process cache (see check_cache):
+
+- "tail" is the last ticket number handed out (cache.incr).
+- "state" is a handful of counters: the highest admitted number (head), the
+  current capacity, how many admitted voters still hold a place, and how far
+  the expiry walks have got. It is only changed by the worker holding the
+  short "lock" key, in admit(), and only when there is something to do.
+- Each admitted ticket has its own key holding its admission time. Claiming
+  it (turning up) and releasing it (casting a ballot or leaving the ballot
+  pages) set per-ticket markers; a release also bumps the "released" counter.
+- A voter who is admitted but never shows up (a closed tab) holds a place for
+  CLAIM_TIMEOUT. One who shows up holds it until they cast their ballot or
+  leave the ballot pages, and for at most SESSION_TIMEOUT.
+
+Tickets are admitted in number order, so they also expire in number order:
+admit() walks forward from where it last stopped and stops at the first
+ticket that is still valid. Each ticket is walked past once, so a request or
+poll costs a fixed number of cache operations whatever the capacity. Whoever
+first adds a ticket's "done" marker - its release, or its expiry - frees its
+place, so no place is freed twice.
+
+Tickets are signed cookies: a queue ticket carries the voter's number, and an
+admission ticket lets them through without any cache lookups. Both are bound
+to the voter's session cookie, so one admission cannot be shared around.
+
+Capacity adapts to the ballot requests' p95 latency (AIMD). While it stays
+under settings.WAITING_ROOM_TARGET_P95_MS, capacity grows by one every
+ADJUST_INTERVAL. When it goes over, capacity is cut by a quarter.
+settings.WAITING_ROOM_CAPACITY is the starting capacity, and 0 (the default)
+turns the waiting room off.
+"""
+import hashlib
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.urls import Resolver404, resolve
+from django.utils.http import url_has_allowed_host_and_scheme
+
+from .caching import PER_PROCESS_CACHES
+
+GATED_URL_NAMES = {'vote', 'submit_vote'}
+
+COOKIE_NAME = 'waiting_room'
+COOKIE_SALT = 'voting.admission'
+# How long a queue ticket, and an admission once claimed, stay valid
+QUEUE_TIMEOUT = 60 * 60
+SESSION_TIMEOUT = 10 * 60
+# Seconds an admitted voter has to turn up before their place is given away
+CLAIM_TIMEOUT = 30
+# Seconds between the waiting page's status polls
+POLL_INTERVAL = 3
+
+LOCK_TIMEOUT = 5
+ADJUST_INTERVAL = 5
+MIN_SAMPLES = 20
+DECREASE = 0.75
+MIN_CAPACITY = 5
+MAX_CAPACITY = 5000
+# Tickets read per cache round trip by the expiry walks
+WALK_BATCH = 16
+
+TAIL_KEY = 'voting:admission:tail'
+STATE_KEY = 'voting:admission:state'
+LOCK_KEY = 'voting:admission:lock'
+RELEASED_KEY = 'voting:admission:released'
+
+# Ballot request latencies (ms) seen by this worker since the last adjustment
+_latencies = deque(maxlen=1000)
+
+
+def _ticket_key(number):
+    return f'voting:admission:ticket:{number}'
+
+
+def _claimed_key(number):
+    return f'voting:admission:claimed:{number}'
+
+
+def _done_key(number):
+    return f'voting:admission:done:{number}'
+
+
+def enabled():
+    return settings.WAITING_ROOM_CAPACITY > 0
+
+
+@checks.register(checks.Tags.caches)
+def check_cache(app_configs, **kwargs):
+    """The queue lives in the cache: with a per-process cache each worker would run its own room."""
+    backend = settings.CACHES['default']['BACKEND']
+    if enabled() and backend in PER_PROCESS_CACHES:
+        return [checks.Error(
+            f'WAITING_ROOM_CAPACITY is set, but the default cache ({backend.rsplit(".", 1)[-1]}) is not shared '
+            'between worker processes, so each would keep its own queue and capacity.',
+            hint='Set CACHE_BACKEND to a shared cache (e.g. RedisCache or FileBasedCache), '
+                 'or WAITING_ROOM_CAPACITY=0.',
+            id='voting.E001',
+        )]
+    return []
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, None):
+            return 1
+        return cache.incr(key)
+
+
+def enqueue():
+    """Hand out the next ticket number."""
+    try:
+        return cache.incr(TAIL_KEY)
+    except ValueError:
+        if cache.add(TAIL_KEY, 1, None):
+            cache.set(STATE_KEY, _initial_state(head=0, released=cache.get(RELEASED_KEY, 0)), None)
+            return 1
+        return cache.incr(TAIL_KEY)
+
+
+def _initial_state(head, released):
+    return {
+        'head': head,
+        'capacity': settings.WAITING_ROOM_CAPACITY,
+        'in_flight': 0,
+        'released': released,  # the released counter as of the last admit()
+        'unclaimed_from': head,  # tickets up to these are settled by the expiry walks
+        'claimed_from': head,
+        'next_expiry': float('inf'),
+        'adjusted_at': 0,
+    }
+
+
+def _load_state():
+    """(state, tail, releases not yet counted in state['in_flight'])"""
+    found = cache.get_many([STATE_KEY, TAIL_KEY, RELEASED_KEY])
+    tail, released = found.get(TAIL_KEY, 0), found.get(RELEASED_KEY, 0)
+    state = found.get(STATE_KEY)
+    if state is None:
+        # Evicted: the places are forgotten, so start over from the current ticket.
+        # Voters already in line are given new numbers when they next poll.
+        state = _initial_state(head=tail, released=released)
+    return state, tail, max(0, released - state['released'])
+
+
+def in_flight(state, pending_releases=0):
+    return max(0, state['in_flight'] - pending_releases)
+
+
+def _due(state, tail, pending_releases, now):
+    return (
+        (in_flight(state, pending_releases) < state['capacity'] and state['head'] < tail)
+        or now >= state['next_expiry']
+        or (now - state['adjusted_at'] >= ADJUST_INTERVAL and len(_latencies) >= MIN_SAMPLES)
+    )
+
+
+def admit(now=None):
+    """
+    Expire lapsed places and give the free ones to the next tickets in line.
+    Runs in whichever worker gets the lock, and only when something is due;
+    everyone else reads the state as it is. Returns the state.
+    """
+    now = now or time.time()
+    state, tail, pending = _load_state()
+    if not _due(state, tail, pending, now) or not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        return state
+    try:
+        state, tail, pending = _load_state()
+        state['in_flight'] = in_flight(state, pending)
+        state['released'] += pending
+        state['next_expiry'] = min(_expire_unclaimed(state, now), _expire_claimed(state, now))
+        _adjust_capacity(state, now)
+
+        admitted = {}
+        while state['in_flight'] < state['capacity'] and state['head'] < tail:
+            state['head'] += 1
+            state['in_flight'] += 1
+            admitted[_ticket_key(state['head'])] = now
+        if admitted:
+            cache.set_many(admitted, QUEUE_TIMEOUT)
+            state['next_expiry'] = min(state['next_expiry'], now + CLAIM_TIMEOUT)
+        cache.set(STATE_KEY, state, None)
+        return state
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def _walk(state, cursor, now, step):
+    """
+    Walk the admitted tickets after state[cursor], in number order, calling
+    step(number, admitted_at, claimed, done) on each until it returns a
+    deadline (the walk stops there). Returns that deadline, or inf.
+    """
+    while state[cursor] < state['head']:
+        numbers = range(state[cursor] + 1, min(state['head'], state[cursor] + WALK_BATCH) + 1)
+        found = cache.get_many([key(n) for n in numbers for key in (_ticket_key, _claimed_key, _done_key)])
+        for number in numbers:
+            deadline = step(number, found.get(_ticket_key(number)), _claimed_key(number) in found,
+                            _done_key(number) in found)
+            if deadline is not None:
+                return deadline
+            state[cursor] = number
+    return float('inf')
+
+
+def _free(state, number):
+    """Give up the place of ticket `number`, unless its release already has."""
+    if cache.add(_done_key(number), True, QUEUE_TIMEOUT):
+        state['in_flight'] = max(0, state['in_flight'] - 1)
+
+
+def _expire_unclaimed(state, now):
+    """Free the places of admitted voters who did not turn up within CLAIM_TIMEOUT."""
+    def step(number, admitted_at, claimed, done):
+        if done or claimed:
+            return None  # left already, or held until SESSION_TIMEOUT (see _expire_claimed)
+        if admitted_at is not None and now < admitted_at + CLAIM_TIMEOUT:
+            return admitted_at + CLAIM_TIMEOUT
+        _free(state, number)  # lapsed (or its ticket was evicted)
+        return None
+
+    return _walk(state, 'unclaimed_from', now, step)
+
+
+def _expire_claimed(state, now):
+    """Free the places of voters still on the ballot pages SESSION_TIMEOUT after admission."""
+    def step(number, admitted_at, claimed, done):
+        if number > state['unclaimed_from']:
+            return float('inf')  # not settled yet: it may still be claimed
+        if done:
+            return None
+        if admitted_at is not None and now < admitted_at + SESSION_TIMEOUT:
+            return admitted_at + SESSION_TIMEOUT
+        _free(state, number)
+        return None
+
+    return _walk(state, 'claimed_from', now, step)
+
+
+def _adjust_capacity(state, now):
+    if now - state['adjusted_at'] < ADJUST_INTERVAL or len(_latencies) < MIN_SAMPLES:
+        return
+    p95 = percentile(_latencies, 95)
+    _latencies.clear()
+    if p95 > settings.WAITING_ROOM_TARGET_P95_MS:
+        state['capacity'] = max(MIN_CAPACITY, int(state['capacity'] * DECREASE))
+    elif state['in_flight'] >= state['capacity']:
+        # Only grow while the room is actually full, or idle periods would inflate it
+        state['capacity'] = min(MAX_CAPACITY, state['capacity'] + 1)
+    state['adjusted_at'] = now
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def record_latency(ms):
+    _latencies.append(ms)
+
+
+def claim(number):
+    """Turn up for an admitted ticket. False if the place was given away meanwhile."""
+    found = cache.get_many([_ticket_key(number), _done_key(number)])
+    if _ticket_key(number) not in found or _done_key(number) in found:
+        return False
+    cache.set(_claimed_key(number), True, QUEUE_TIMEOUT)
+    return True
+
+
+def release(number):
+    """The voter is done with the ballot pages; their place goes to the next ticket."""
+    if cache.add(_done_key(number), True, QUEUE_TIMEOUT):  # not already expired
+        _incr(RELEASED_KEY)
+
+
+def stats():
+    state, tail, pending = _load_state()
+    return {
+        'capacity': state['capacity'],
+        'in_flight': in_flight(state, pending),
+        'queued': max(0, tail - state['head']),
+        'p95_ms': round(percentile(_latencies, 95), 1),
+    }
+
+
+# ===============================================
+# Tickets
+# ===============================================
+
+def _holder(request):
+    """
+    Who a ticket belongs to: a digest of the session cookie, read without
+    loading the session, so a ticket copied into another browser is no good.
+    """
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+    return hashlib.blake2b(session_key.encode(), digest_size=8).hexdigest()
+
+
+def read_ticket(request):
+    """(number, admitted) from the request's signed cookie, or None."""
+    ticket = request.get_signed_cookie(COOKIE_NAME, default=None, salt=COOKIE_SALT, max_age=QUEUE_TIMEOUT)
+    if not ticket:
+        return None
+    kind, number, holder = (ticket.split(':') + ['', ''])[:3]
+    if holder != _holder(request) or not number.isdigit():
+        return None
+    # An admission is only good for one session's worth of time
+    if kind == 'admitted' and request.get_signed_cookie(COOKIE_NAME, default=None, salt=COOKIE_SALT,
+                                                        max_age=SESSION_TIMEOUT) is None:
+        return None
+    return int(number), kind == 'admitted'
+
+
+def write_ticket(request, response, number, admitted):
+    response.set_signed_cookie(COOKIE_NAME, f"{'admitted' if admitted else 'queued'}:{number}:{_holder(request)}",
+                               salt=COOKIE_SALT, max_age=QUEUE_TIMEOUT, httponly=True, samesite='Lax')
+
+
+def try_admission(number):
+    """
+    Whether ticket `number` may go in now, claiming its place if so.
+    Returns (admitted, number, state); number is a fresh ticket when the
+    voter's place was given away while they were gone.
+    """
+    state = admit()
+    if number > state['head']:
+        return False, number, state
+    if claim(number):
+        return True, number, state
+    return False, enqueue(), state
+
+
+# ===============================================
+# Middleware and status endpoint
+# ===============================================
+
+class WaitingRoomMiddleware:
+    """Queue voters in front of the ballot pages once they are at capacity."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if hasattr(request, '_admission'):
+            self.process_response(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if not enabled() or match.url_name not in GATED_URL_NAMES or not request.user.is_authenticated:
+            return None
+
+        ticket = read_ticket(request)
+        if ticket and ticket[1]:
+            admitted, number, state = True, ticket[0], None
+        else:
+            admitted, number, state = try_admission(ticket[0] if ticket else enqueue())
+        if admitted:
+            # Let the rest of the middleware and the view run; process_response() does the bookkeeping
+            request._admission = (number, not ticket or not ticket[1], time.perf_counter())
+            return None
+        # A 200, not a 503: every queued voter would otherwise be logged as a server error
+        response = render(request, 'voting/waiting_room.html', {
+            'position': number - state['head'],
+            'poll_interval': POLL_INTERVAL,
+        })
+        response['Cache-Control'] = 'no-store'
+        write_ticket(request, response, number, admitted=False)
+        return response
+
+    def process_response(self, request, response):
+        number, newly_admitted, started = request._admission
+        record_latency((time.perf_counter() - started) * 1000)
+        if self.leaving_ballot(request, response):
+            release(number)
+            response.delete_cookie(COOKIE_NAME, samesite='Lax')
+        elif newly_admitted:
+            write_ticket(request, response, number, admitted=True)
+
+    def leaving_ballot(self, request, response):
+        """A ballot was cast (submit-vote renders the receipt) or the view sent the voter elsewhere"""
+        if request.resolver_match.url_name == 'submit_vote' and response.status_code == 200:
+            return True
+        location = response.get('Location')
+        if response.status_code not in (301, 302) or not location:
+            return False
+        if not url_has_allowed_host_and_scheme(location, allowed_hosts={request.get_host()}):
+            return True
+        try:
+            return resolve(location.split('?')[0]).url_name not in GATED_URL_NAMES
+        except Resolver404:
+            return True
+
+
+def status_view(request):
+    """Polled by the waiting page: cheap, and never touches the database."""
+    ticket = read_ticket(request)
+    if ticket is None:
+        return JsonResponse({'admitted': False, 'position': None}, status=400)
+    number, admitted = ticket
+    if admitted:
+        return JsonResponse({'admitted': True, 'position': 0, 'retry_after': POLL_INTERVAL})
+    admitted, number, state = try_admission(number)
+    response = JsonResponse({
+        'admitted': admitted,
+        'position': 0 if admitted else number - state['head'],
+        'retry_after': POLL_INTERVAL,
+    })
+    write_ticket(request, response, number, admitted)
+    return response
@@ -0,0 +1,280 @@
+"""
+Read-only JSON API for the mobile and kiosk clients: the open election, its
+ballot, results and turnout, and the signed-in voter's own status.
+
+    GET /api/elections/                       every election, ?after=<id> for the next page
+    GET /api/elections/active/                the open election
+    GET /api/elections/<id>/ballot/           its candidates, by race
+    GET /api/elections/<id>/results/          counts per candidate (admins, or once it has ended)
+    GET /api/elections/<id>/turnout/          turnout per branch and year (as results)
+    GET /api/me/                              the voter's eligibility and whether they voted
+    GET /api/batch/?include=active,me,ballot  several of the above in one round trip
+
+Authentication is the site's session (settings.REST_FRAMEWORK). The
+serializers (voting/serializers.py) read dicts from values() or the caches,
+never model instances. Ballot, results and turnout payloads are cached
+whole under the election's version (voting/caching.py), so a candidate or
+election change invalidates them at once. Results and turnout also expire
+after LIVE_RESULTS_TIMEOUT while ballots come in, like the results page.
+"""
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+from django.utils import timezone
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import APIException, NotFound, PermissionDenied, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from . import kiosk
+from .caching import (
+    BALLOT_TIMEOUT, FINAL_RESULTS_TIMEOUT, LIVE_RESULTS_TIMEOUT, ballot_candidates, cached, participation,
+    ranked_tally, result_counts, turnout_breakdown,
+)
+from .models import CandidateProfile, Election, RankedBallot, VoterProfile
+from .pagination import keyset_page, parse_cursor
+from .replica import read_replica
+from .serializers import (
+    CandidateSerializer, ElectionSerializer, ResultSerializer, RoundSerializer, TurnoutSerializer,
+    VoterStatusSerializer,
+)
+from .sharding import votes_for
+
+ELECTION_PAGE_SIZE = 100
+
+
+class AfterCursorPagination(BasePagination):
+    """Keyset pages addressed by the last id seen (?after=<id>), as elsewhere in the site (voting/pagination.py)"""
+    page_size = ELECTION_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        rows, self.next_cursor = keyset_page(queryset, parse_cursor(request.query_params.get('after')),
+                                             self.page_size)
+        return rows
+
+    def get_paginated_response(self, data):
+        next_url = None
+        if self.next_cursor is not None:
+            next_url = replace_query_param(self.request.build_absolute_uri(), 'after', self.next_cursor)
+        return Response({'next': next_url, 'results': data})
+
+
+# ===============================================
+# Resources
+# ===============================================
+
+def _election(election_id=None):
+    """Election `election_id`, or the newest active one (as on the results page)"""
+    elections = Election.objects.filter(pk=election_id) if election_id else (
+        Election.objects.filter(is_active=True).order_by('-start_date'))
+    election = elections.first()
+    if election is None:
+        raise NotFound('No such election.' if election_id else 'No election is active.')
+    return election
+
+
+def _check_results_visible(request, election):
+    if request.user.role != 'admin' and not election.has_ended():
+        raise PermissionDenied('Results are viewable by admins only until the election ends.')
+
+
+def _results_timeout(election):
+    return FINAL_RESULTS_TIMEOUT if election.finalised_at else LIVE_RESULTS_TIMEOUT
+
+
+def active_payload(request, election):
+    data = ElectionSerializer({field: getattr(election, field) for field in ElectionSerializer.VALUES}).data
+    return {**data, 'voting_open': election.is_voting_open(), 'eligible_voters': election.eligible_voter_count}
+
+
+def ballot_payload(request, election):
+    if not election.is_voting_open():
+        raise NotFound('Voting is not open in this election.')
+
+    def compute():
+        candidates = ballot_candidates(election)
+        return {
+            'election': election.pk,
+            'ranked': election.is_ranked(),
+            'max_ranks': min(len(candidates), RankedBallot.MAX_RANKS) if election.is_ranked() else None,
+            'races': [
+                {'position': position, 'candidates': CandidateSerializer(list(group), many=True).data}
+                for position, group in groupby(candidates, key=itemgetter('position'))
+            ],
+        }
+
+    return cached('api:ballot', election.pk, compute, BALLOT_TIMEOUT)
+
+
+def results_payload(request, election):
+    _check_results_visible(request, election)
+
+    def compute():
+        counts = result_counts(election)
+        rows = []
+        for candidate in CandidateProfile.for_election(election).values(*ResultSerializer.VALUES):
+            name = f"{candidate['user__first_name']} {candidate['user__last_name']}".strip()
+            rows.append({
+                'candidate': candidate['id'], 'name': name or candidate['user__username'],
+                'position': candidate['position'], 'votes': counts.get(candidate['id'], 0),
+                'percentage': 0, 'leading': False,
+            })
+        race_totals = Counter()
+        for row in rows:
+            race_totals[row['position']] += row['votes']
+        for row in rows:
+            if race_totals[row['position']]:
+                row['percentage'] = round(row['votes'] / race_totals[row['position']] * 100, 2)
+        rows.sort(key=lambda row: (row['position'], -row['votes']))
+        for position, group in groupby(rows, key=itemgetter('position')):
+            leader = next(group)
+            leader['leading'] = leader['votes'] > 0
+
+        ballots = election.ballots_cast if election.finalised_at else participation(election)
+        payload = {
+            'election': election.pk,
+            'voting_open': election.is_voting_open(),
+            'ended': election.has_ended(),
+            'ballots': ballots,
+            'turnout': round(ballots / election.eligible_voter_count * 100, 2) if election.eligible_voter_count else 0,
+            'results': ResultSerializer(rows, many=True).data,
+            'ranked': None,
+        }
+        if election.is_ranked():
+            tally = ranked_tally(election, list(CandidateProfile.for_election(election).select_related('user')))
+            rounds = [
+                {**round_, 'rows': [{**row, 'candidate': row['candidate'].pk} for row in round_['rows']]}
+                for round_ in tally['rounds']
+            ]
+            payload['ranked'] = {
+                'ballots': tally['ballots'],
+                'winners': [candidate.pk for candidate in tally['winners']],
+                'rounds': RoundSerializer(rounds, many=True).data,
+            }
+        return payload
+
+    return cached('api:results', election.pk, compute, _results_timeout(election))
+
+
+def turnout_payload(request, election):
+    _check_results_visible(request, election)
+
+    def compute():
+        breakdown = turnout_breakdown(election)
+        return {
+            'election': election.pk,
+            'ballots': election.ballots_cast if election.finalised_at else participation(election),
+            'eligible': election.eligible_voter_count,
+            'branch': TurnoutSerializer(breakdown['branch'], many=True).data,
+            'year': TurnoutSerializer(breakdown['year'], many=True).data,
+        }
+
+    return cached('api:turnout', election.pk, compute, _results_timeout(election))
+
+
+def me_payload(request, election):
+    """The voter's own status: per user, so never cached"""
+    user = request.user
+    eligible = has_voted = False
+    if election is not None and user.role == 'voter':
+        eligible = election.is_eligible(user)
+        profile = VoterProfile.objects.filter(user=user).first()
+        has_voted = profile is not None and (votes_for(election).filter(voter=profile).exists()
+                                             or kiosk.has_queued(profile, election))
+    return VoterStatusSerializer({
+        'id': user.pk, 'name': f'{user.first_name} {user.last_name}'.strip() or user.username,
+        'role': user.role, 'branch': user.branch, 'year_of_study': user.year_of_study,
+        'election': election.pk if election else None, 'eligible': eligible, 'has_voted': has_voted,
+    }).data
+
+
+RESOURCES = {
+    'active': active_payload,
+    'ballot': ballot_payload,
+    'results': results_payload,
+    'turnout': turnout_payload,
+    'me': me_payload,
+}
+
+
+# ===============================================
+# Views
+# ===============================================
+
+@read_replica
+@api_view(['GET'])
+def elections_api(request):
+    paginator = AfterCursorPagination()
+    rows = paginator.paginate_queryset(Election.objects.values(*ElectionSerializer.VALUES), request)
+    return paginator.get_paginated_response(ElectionSerializer(rows, many=True).data)
+
+
+@api_view(['GET'])
+def active_election_api(request):
+    now = timezone.now()
+    election = Election.objects.filter(is_active=True, start_date__lte=now, end_date__gte=now).order_by(
+        '-start_date').first()
+    if election is None:
+        raise NotFound('No election is open.')
+    return Response(active_payload(request, election))
+
+
+@api_view(['GET'])
+def ballot_api(request, election_id):
+    return Response(ballot_payload(request, _election(election_id)))
+
+
+@read_replica
+@api_view(['GET'])
+def results_api(request, election_id):
+    return Response(results_payload(request, _election(election_id)))
+
+
+@read_replica
+@api_view(['GET'])
+def turnout_api(request, election_id):
+    return Response(turnout_payload(request, _election(election_id)))
+
+
+@api_view(['GET'])
+def me_api(request):
+    election_id = parse_cursor(request.query_params.get('election'))
+    election = _election(election_id) if election_id else Election.objects.filter(
+        is_active=True).order_by('-start_date').first()
+    return Response(me_payload(request, election))
+
+
+@read_replica
+@api_view(['GET'])
+def batch_api(request):
+    """
+    Several resources of one election in a single response, e.g.
+    ?include=active,ballot,me&election=7 (default: the newest active election).
+    Each resource answers on its own: one that is not allowed or not found is
+    reported as {"status": 403, "detail": ...} without failing the others.
+    """
+    include = [name for name in request.query_params.get('include', '').split(',') if name]
+    unknown = sorted(set(include) - set(RESOURCES))
+    if not include or unknown:
+        raise ValidationError({'include': f'Name one or more of {", ".join(RESOURCES)}'
+                                          + (f'; unknown: {", ".join(unknown)}' if unknown else '')})
+    election_id = parse_cursor(request.query_params.get('election'))
+    try:
+        election = _election(election_id)
+    except NotFound:
+        if election_id:
+            raise
+        election = None
+
+    found = {}
+    for name in include:
+        try:
+            if election is None and name != 'me':
+                raise NotFound('No election is active.')
+            found[name] = RESOURCES[name](request, election)
+        except APIException as e:
+            found[name] = {'status': e.status_code, 'detail': e.detail}
+    return Response(found)
@@ -6,3 +6,4 @@ class VotingConfig(AppConfig):
     
     def ready(self):
         import voting.signals
+        import voting.admission  # registers the waiting room's cache check
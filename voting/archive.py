@@ -0,0 +1,185 @@
+"""
+Archival of finalised elections.
+
+Once an election is finalised its tally is frozen in ElectionResult rows and
+its ballots are only read for audits. archive_election() moves them out of
+the Vote table into files under settings.ARCHIVE_DIR:
+- election_<id>_votes.ndjson.gz: one export row per vote (the same fields as
+  exports.VOTE_FIELDS), in vote id order;
+- election_<id>_ranked.bin.gz: for ranked elections, the RankedBallot.ranking
+  blobs back to back, in the same order.
+
+The files are written to a temporary name, checked against the database and
+(if the election has one) the ledger root, and only then moved into place
+and recorded as an ElectionArchive. The Vote rows are removed afterwards by a
+background DeletionJob (voting/deletion.py), never inside the request.
+
+Everything that read the ballots of an archived election reads the files
+instead: vote exports, verify_ledger, the turnout breakdown and the ranked
+tally. Results, ballots cast and the ledger's inclusion proofs stay in the
+database.
+"""
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ElectionArchive, LedgerState
+from .sharding import ranked_ballots_for, votes_for
+
+CHUNK_SIZE = 5000
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archive_dir():
+    return Path(settings.ARCHIVE_DIR)
+
+
+def archive_of(election):
+    """The ElectionArchive of `election`, or None while its ballots are in the database."""
+    try:
+        return election.archive
+    except ElectionArchive.DoesNotExist:
+        return None
+
+
+def archive_election(election, requested_by=None):
+    """
+    Write the ballots of a finalised `election` to its archive files and queue
+    the deletion of its Vote rows. Returns the ElectionArchive.
+    """
+    from . import deletion
+    from .caching import bump_version
+    from .exports import VOTE_FIELDS, encode, vote_rows
+
+    if not election.finalised_at:
+        raise ArchiveError(f'"{election.name}" is not finalised yet.')
+    if archive_of(election):
+        raise ArchiveError(f'"{election.name}" is already archived.')
+    ledger = LedgerState.objects.filter(election=election).first()
+    last_vote = votes_for(election).order_by('-pk').values_list('pk', flat=True).first()
+    if ledger and ledger.size and last_vote is not None and ledger.last_vote_id < last_vote:
+        raise ArchiveError(f'The ledger of "{election.name}" is behind; run `manage.py ledger_append` first.')
+
+    os.makedirs(archive_dir(), exist_ok=True)
+    votes_path = archive_dir() / f'election_{election.pk}_votes.ndjson.gz'
+    ranked_path = archive_dir() / f'election_{election.pk}_ranked.bin.gz'
+    written = []
+    try:
+        digest = hashlib.sha256()
+        with open(f'{votes_path}.tmp', 'wb') as out:
+            written.append(f'{votes_path}.tmp')
+            for chunk in encode(vote_rows(election, chunk_size=CHUNK_SIZE), VOTE_FIELDS, 'ndjson', compress=True):
+                out.write(chunk)
+                digest.update(chunk)
+        ranked_count = 0
+        if election.is_ranked():
+            with gzip.open(f'{ranked_path}.tmp', 'wb') as out:
+                written.append(f'{ranked_path}.tmp')
+                blobs = ranked_ballots_for(election).order_by('pk').values_list('ranking', flat=True)
+                for blob in blobs.iterator(chunk_size=CHUNK_SIZE):
+                    out.write(bytes(blob))
+                    ranked_count += 1
+
+        vote_count = sum(1 for _ in _read_votes(f'{votes_path}.tmp'))
+        if vote_count != votes_for(election).count():
+            raise ArchiveError('Votes were added or removed while archiving; try again.')
+        if ranked_count != (ranked_ballots_for(election).count() if election.is_ranked() else 0):
+            raise ArchiveError('Ranked ballots were added or removed while archiving; try again.')
+        if ledger and ledger.size:
+            root = ledger_root(ledger_rows(f'{votes_path}.tmp', upto=ledger.last_vote_id))
+            if root != ledger.root:
+                raise ArchiveError('The archived votes do not match the ledger root; run verify_ledger.')
+
+        os.replace(f'{votes_path}.tmp', votes_path)
+        if ranked_count:
+            os.replace(f'{ranked_path}.tmp', ranked_path)
+        elif election.is_ranked():
+            os.remove(f'{ranked_path}.tmp')
+    except BaseException:
+        for path in written:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    with transaction.atomic():
+        archive = ElectionArchive.objects.create(
+            election=election,
+            votes_file=votes_path.name,
+            ranked_file=ranked_path.name if ranked_count else '',
+            vote_count=vote_count,
+            ranked_count=ranked_count,
+            size_bytes=os.path.getsize(votes_path) + (os.path.getsize(ranked_path) if ranked_count else 0),
+            sha256=digest.hexdigest(),
+        )
+        deletion.queue(election, 'votes', requested_by=requested_by)
+    election.archive = archive
+    # Turnout and the ranked tally are read from the archive from now on
+    bump_version(election.pk)
+    return archive
+
+
+def remove_files(archive):
+    for name in (archive.votes_file, archive.ranked_file):
+        if name and os.path.exists(archive_dir() / name):
+            os.remove(archive_dir() / name)
+
+
+# ===============================================
+# Reading archives
+# ===============================================
+
+def _read_votes(path):
+    with gzip.open(path, 'rt') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def vote_rows(archive, after=None):
+    """Archived vote rows (exports.VOTE_FIELDS dicts) of an election, after vote id `after`."""
+    for row in _read_votes(archive_dir() / archive.votes_file):
+        if after is None or row['vote_id'] > after:
+            yield row
+
+
+def ledger_rows(source, upto=None):
+    """
+    ledger.VOTE_COLUMNS tuples of archived votes, to feed ballot_receipt().
+    `source` is an ElectionArchive or a file path.
+    """
+    path = archive_dir() / source.votes_file if isinstance(source, ElectionArchive) else source
+    for row in _read_votes(path):
+        if upto is not None and row['vote_id'] > upto:
+            return
+        yield (row['vote_id'], row['election_id'], row['voter_id'], row['candidate_id'],
+               datetime.fromisoformat(row['timestamp']))
+
+
+def ledger_root(rows):
+    from .ledger import MerkleFrontier, ballot_receipt
+
+    frontier = MerkleFrontier()
+    for row in rows:
+        frontier.append(ballot_receipt(*row))
+    return frontier.root()
+
+
+def voter_ids(archive):
+    """Ids of the voters with a ballot in the archive"""
+    return {row['voter_id'] for row in vote_rows(archive)}
+
+
+def ranking_blobs(archive):
+    """The archived RankedBallot.ranking blobs, for tally.decode_rankings()"""
+    if not archive.ranked_file:
+        return []
+    with gzip.open(archive_dir() / archive.ranked_file, 'rb') as f:
+        return [f.read()]  # fixed-width rows, so one blob holding them all decodes the same
@@ -0,0 +1,40 @@
+"""
+Shared helpers for the bench_* management commands.
+Benchmarks run against a throwaway test database so db.sqlite3 is never touched.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def benchmark_database(name=None, alias='default'):
+    """
+    Create a fresh, migrated database for the duration of the block.
+    Pass a file path as `name` when the benchmark needs a file-backed SQLite
+    database (e.g. several connections); the default is Django's test database.
+    """
+    connection = connections[alias]
+    if name:
+        connection.settings_dict['TEST'] = {**connection.settings_dict.get('TEST', {}), 'NAME': str(name)}
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat=5, alias='default'):
+    """Run func `repeat` times and return (median ms, queries on the last run)."""
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connections[alias]) as ctx:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(ctx.captured_queries)
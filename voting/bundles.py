@@ -0,0 +1,73 @@
+"""
+The site's CSS and JavaScript bundles.
+
+The stylesheets and scripts are written in assets/ (readable, commented) and
+built into one minified file per type in static/voting/ by
+`manage.py build_assets`. Every page links the same two bundles, so a
+browser downloads them once. collectstatic then fingerprints them
+(app.3f2a9c1b.css) and writes gzip (and, with Brotli installed, brotli)
+variants next to them, and WhiteNoise serves the fingerprinted names with
+far-future, immutable cache headers. A changed bundle gets a new name, so
+nothing stale is ever served from a browser's cache.
+
+The built bundles are committed, so a checkout runs without a build step;
+the test suite fails if they no longer match assets/.
+"""
+import re
+from pathlib import Path
+
+from django.conf import settings
+
+SOURCE_DIR = Path(settings.BASE_DIR) / 'assets'
+
+# Bundle (relative to the first STATICFILES_DIRS entry) -> its sources, in order
+BUNDLES = {
+    'voting/app.css': ['css/base.css', 'css/pages.css'],
+    'voting/app.js': ['js/app.js'],
+}
+
+_STRINGS = re.compile(r'''("(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')''')
+
+
+def output_dir():
+    return Path(settings.STATICFILES_DIRS[0])
+
+
+def minify_css(text):
+    """Drop comments and the whitespace CSS does not need; quoted strings are kept as they are."""
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    parts = _STRINGS.split(text)
+    for i in range(0, len(parts), 2):  # the odd parts are strings
+        code = re.sub(r'\s+', ' ', parts[i])
+        code = re.sub(r' ?([{}:;,>]) ?', r'\1', code)
+        parts[i] = code.replace(';}', '}')
+    return ''.join(parts).strip() + '\n'
+
+
+def minify_js(text):
+    """
+    Drop comments on lines of their own, indentation and blank lines.
+    Deliberately conservative: nothing within a line of code is rewritten.
+    """
+    text = re.sub(r'^\s*/\*.*?\*/\s*$', '', text, flags=re.S | re.M)
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def build(bundle):
+    """The minified contents of `bundle`, from its sources in assets/"""
+    minify = MINIFIERS[Path(bundle).suffix]
+    return ''.join(minify((SOURCE_DIR / source).read_text(encoding='utf-8')) for source in BUNDLES[bundle])
+
+
+def stale():
+    """Bundles whose built file in static/ does not match their sources"""
+    found = []
+    for bundle in BUNDLES:
+        path = output_dir() / bundle
+        if not path.exists() or path.read_text(encoding='utf-8') != build(bundle):
+            found.append(bundle)
+    return found
@@ -0,0 +1,239 @@
+"""
+Version-stamped caches of per-election data.
+
+Every key embeds the election's current version, so invalidating everything
+cached about an election is a single write to its version key (see
+bump_version(), called from voting/signals.py). Stale entries are simply
+never read again and expire on their own.
+
+The lifecycle scheduler (voting/lifecycle.py) fills these caches shortly
+before an election opens. That only helps the web workers when CACHES points
+at a cache they share (Redis, Memcached, a file-based cache); the default
+local-memory cache is per process. A per-process cache also keeps a stale
+copy in every other worker until it expires whenever a version is bumped, so
+`manage.py check --deploy` requires a shared one (voting.E002).
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+
+from . import singleflight
+
+BALLOT_TIMEOUT = 5 * 60
+ELIGIBILITY_TIMEOUT = 5 * 60
+PARTICIPATION_TIMEOUT = 60 * 60
+# Live tallies change with every ballot; final ones only when the version does
+LIVE_RESULTS_TIMEOUT = 15
+FINAL_RESULTS_TIMEOUT = 60 * 60
+
+# Cache backends that keep a separate copy in every worker process
+PER_PROCESS_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """bump_version() only reaches the worker that ran it unless the cache is shared."""
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PER_PROCESS_CACHES:
+        return [checks.Error(
+            f'The default cache ({backend.rsplit(".", 1)[-1]}) is not shared between worker processes, so '
+            'other workers keep serving ballots, eligibility rules and results cached before a change.',
+            hint='Set CACHE_BACKEND to a shared cache (e.g. RedisCache or FileBasedCache).',
+            id='voting.E002',
+        )]
+    return []
+
+
+def _version_key(election_id):
+    return f'voting:election:{election_id}:version'
+
+
+def version(election_id):
+    key = _version_key(election_id)
+    current = cache.get(key)
+    if current is None:
+        # Start from the clock rather than 1, so an evicted version key can
+        # never bring back entries written under an earlier version
+        cache.add(key, time.time_ns(), None)
+        current = cache.get(key)
+    return current
+
+
+def bump_version(election_id):
+    from django.utils import timezone
+    from .models import Election
+
+    try:
+        cache.incr(_version_key(election_id))
+    except ValueError:
+        cache.add(_version_key(election_id), time.time_ns(), None)
+    # The HTTP validators are read from the database, which every worker shares
+    Election.objects.filter(pk=election_id).update(changed_at=timezone.now())
+
+
+def stamps(election_id):
+    """
+    (changed at, last ballot, last ballot at) of an election, for HTTP
+    validators (voting/conditional.py). `changed at` moves with every
+    bump_version(), and the last ballot with every vote cast. Both are read
+    from the database rather than the cache, so every worker sees a change
+    as soon as it is committed, whichever worker made it: two index lookups.
+    """
+    from .models import Election
+    from .sharding import votes_for
+
+    changed_at = Election.objects.filter(pk=election_id).values_list('changed_at', flat=True).first()
+    last_vote, last_vote_at = votes_for(election_id).order_by('-pk').values_list('pk', 'timestamp').first() or (
+        None, None)
+    return changed_at, last_vote, last_vote_at
+
+
+def cache_key(kind, election_id):
+    return f'voting:{kind}:{election_id}:v{version(election_id)}'
+
+
+def cached(kind, election_id, compute, timeout, refresh=False):
+    """
+    Return the cached `kind` value of an election, computing and storing it on
+    a miss. Misses are single-flight (voting/singleflight.py): concurrent
+    callers share one computation.
+    """
+    return singleflight.fetch(cache_key(kind, election_id), compute, timeout, refresh)
+
+
+# ===============================================
+# Per-election values
+# ===============================================
+
+def ballot_candidates(election, refresh=False):
+    """Candidates on the ballot page, as plain dicts ordered by position"""
+    from .models import CandidateProfile
+
+    def compute():
+        candidates = []
+        for c in CandidateProfile.for_election(election).select_related('user'):
+            candidates.append({
+                'id': c.id,
+                'name': f"{c.user.first_name} {c.user.last_name}".strip() or c.user.username,
+                'party': getattr(c, 'party', 'Independent'),
+                'position': c.position,
+                'slogan': getattr(c, 'slogan', ''),
+                'manifesto': c.manifesto[:200] + '...' if len(c.manifesto) > 200 else c.manifesto
+            })
+        return candidates
+
+    return cached('ballot', election.pk, compute, BALLOT_TIMEOUT, refresh)
+
+
+def eligibility_rules(election, refresh=False):
+    """The election's rules as (field, values, exclude) tuples, for Eligibility()"""
+    def compute():
+        return [(rule.field, rule.values, rule.exclude) for rule in election.eligibility_rules.all()]
+
+    return cached('eligibility', election.pk, compute, ELIGIBILITY_TIMEOUT, refresh)
+
+
+def participation(election, refresh=False):
+    """Number of ballots cast so far"""
+    from .sharding import votes_for
+
+    def compute():
+        if election.finalised_at and election.ballots_cast is not None:
+            return election.ballots_cast  # counted when it closed; its votes may be archived since
+        return votes_for(election).values('voter_id').distinct().count()
+
+    return cached('participation', election.pk, compute, PARTICIPATION_TIMEOUT, refresh)
+
+
+def result_counts(election, refresh=False):
+    """{candidate id: votes}: the frozen tally once finalised, else a GROUP BY over the votes"""
+    from django.db.models import Count
+    from .sharding import votes_for
+
+    def compute():
+        if election.finalised_at:
+            return dict(election.final_results.values_list('candidate_id', 'votes'))
+        return dict(
+            votes_for(election).values('candidate_id').annotate(n=Count('pk')).values_list('candidate_id', 'n')
+        )
+
+    timeout = FINAL_RESULTS_TIMEOUT if election.finalised_at else LIVE_RESULTS_TIMEOUT
+    return cached('results', election.pk, compute, timeout, refresh)
+
+
+def ranked_tally(election, candidates, refresh=False):
+    """Round-by-round instant runoff / STV count (voting/tally.py)"""
+    from .tally import ranked_results
+
+    timeout = FINAL_RESULTS_TIMEOUT if election.finalised_at else LIVE_RESULTS_TIMEOUT
+    return cached('ranked', election.pk, lambda: ranked_results(election, candidates), timeout, refresh)
+
+
+def turnout_breakdown(election, refresh=False):
+    """Ballots, electorate and turnout per branch and per year of study"""
+    from django.db.models import Count, Subquery
+    from .archive import archive_of, voter_ids as archived_voter_ids
+    from .models import CustomUser, VoterProfile
+    from .sharding import sharding_enabled, votes_for
+
+    def compute():
+        voted = Counter()
+        voter_ids = votes_for(election).values('voter_id').distinct()
+        archive = archive_of(election)
+        if archive or sharding_enabled():
+            # The votes are in an archive file or another database: look the voters up in batches
+            voter_ids = (sorted(archived_voter_ids(archive)) if archive
+                         else list(voter_ids.values_list('voter_id', flat=True)))
+            batches = [voter_ids[i:i + 500] for i in range(0, len(voter_ids), 500)]
+        else:
+            batches = [Subquery(voter_ids)]
+        for batch in batches:
+            for row in VoterProfile.objects.filter(pk__in=batch).values(
+                'user__branch', 'user__year_of_study'
+            ).annotate(n=Count('pk')):
+                voted['branch', row['user__branch']] += row['n']
+                voted['year', row['user__year_of_study']] += row['n']
+
+        eligible = Counter()
+        for row in election.eligible_voters().values('branch', 'year_of_study').annotate(n=Count('pk')):
+            eligible['branch', row['branch']] += row['n']
+            eligible['year', row['year_of_study']] += row['n']
+
+        labels = {
+            'branch': dict(CustomUser.BRANCH_CHOICES),
+            'year': dict(CustomUser.YEAR_CHOICES),
+        }
+        breakdown = {'branch': [], 'year': []}
+        for (group, value) in sorted(set(voted) | set(eligible)):
+            ballots, electorate = voted[group, value], eligible[group, value]
+            breakdown[group].append({
+                'label': labels[group].get(value, value),
+                'ballots': ballots,
+                'eligible': electorate,
+                'turnout': round(ballots / electorate * 100, 2) if electorate else 0,
+            })
+        return breakdown
+
+    timeout = FINAL_RESULTS_TIMEOUT if election.finalised_at else LIVE_RESULTS_TIMEOUT
+    return cached('turnout', election.pk, compute, timeout, refresh)
+
+
+def count_ballot(election, ballots=1):
+    """Add just-committed ballots to the cached participation count, if it is cached."""
+    try:
+        cache.incr(cache_key('participation', election.pk), ballots)
+    except ValueError:
+        pass  # not cached: the next read counts from the database
+
+
+def warm(election):
+    """Recompute every cache the ballot and results pages read for `election`."""
+    ballot_candidates(election, refresh=True)
+    eligibility_rules(election, refresh=True)
+    participation(election, refresh=True)
@@ -0,0 +1,80 @@
+"""
+Conditional GETs for the pages voters keep reloading: results (which reloads
+itself every 30 seconds while the election is open), the ballot page and
+the dashboard.
+
+revalidate(stamps) wraps a view in Django's condition() decorator. Its
+`stamps` function is called before the view with the view's arguments and
+returns a Stamps: everything the page's content depends on (when the
+election last changed and its last ballot, from voting/caching.py, and
+whatever about the user changes the page), plus when it last changed. The
+parts are hashed into the ETag, and the time becomes Last-Modified. A browser
+that already has the current page gets a 304 with an empty body, after a few
+index lookups instead of the view's queries and template.
+
+Stamps are per user (the pages are), and responses are marked private,
+no-cache, so browsers always revalidate and shared caches never keep them. A
+stamps function returns None, and the page is served in full, when a
+message is waiting to be shown.
+"""
+import hashlib
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .caching import stamps as election_stamps
+
+Stamps = namedtuple('Stamps', 'etag last_modified')
+
+
+def page_stamps(request, page, election_ids, *parts):
+    """
+    Stamps of `page` for request.user, covering the stamps of `election_ids`
+    and any further `parts`; None when a message is waiting to be shown.
+    """
+    if request.COOKIES.get('messages') or request.session.get('_messages'):
+        return None
+    user = request.user
+    # The CSRF cookie changes at login, and the page's forms carry a token for it
+    parts = [page, user.pk, user.role, request.COOKIES.get(settings.CSRF_COOKIE_NAME), *parts]
+    changed = []
+    for election_id in election_ids:
+        changed_at, last_vote, last_vote_at = election_stamps(election_id)
+        parts += [election_id, changed_at, last_vote]
+        changed += [at for at in (changed_at, last_vote_at) if at is not None]
+    etag = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    last_modified = max(changed) if changed else None
+    return Stamps(etag, last_modified)
+
+
+def revalidate(stamps):
+    """Answer GETs of the decorated view with 304 Not Modified while `stamps` is unchanged."""
+
+    def computed(request, args, kwargs):
+        # condition() asks for the ETag and Last-Modified separately; compute both once
+        if not hasattr(request, '_page_stamps'):
+            request._page_stamps = stamps(request, *args, **kwargs) if request.method in ('GET', 'HEAD') else None
+        return request._page_stamps
+
+    def etag(request, *args, **kwargs):
+        found = computed(request, args, kwargs)
+        return found and found.etag
+
+    def last_modified(request, *args, **kwargs):
+        found = computed(request, args, kwargs)
+        return found and found.last_modified
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if getattr(request, '_page_stamps', None):
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,216 @@
+"""
+Synthetic, production-sized election data for benchmarks and load tests.
+
+generate() builds elections, candidates, voters and their ballots from a
+seeded NumPy generator, so the same arguments always give the same data.
+Rows are written with bulk_create in large batches. That bypasses save()
+and the signals, so the derived counters they would maintain
+(votes_received, has_voted, eligible_voter_count) are set directly
+afterwards.
+
+Voters are drawn from branch and year-of-study distributions. Each voter
+turns out with probability `turnout`, and picks candidates by per-race
+popularity. Ranked elections use Plackett-Luce preference orders. Ballot
+timestamps follow a turnout curve across the voting window:
+- 'rush': most ballots right after opening,
+- 'late': most just before closing,
+- 'both': peaks at opening and closing,
+- 'flat': uniform.
+
+Elections run back to back and end at `end`. With open_latest=True the
+newest one is still open, and its ballots so far fall between its opening
+and `end`.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from .caching import bump_version
+from .models import Ballot, CustomUser, VoterProfile, CandidateProfile, Election, RankedBallot, Vote
+from .sharding import vote_db, votes_for
+
+BATCH_SIZE = 5000
+CHUNK_SIZE = 50_000
+
+POSITIONS = ['President', 'Vice President', 'General Secretary', 'Treasurer', 'Cultural Secretary',
+             'Sports Secretary', 'Technical Secretary', 'Hostel Secretary']
+
+# Share of students per branch and per year of study
+BRANCHES = {'CSE': 0.32, 'ECE': 0.22, 'ME': 0.18, 'CE': 0.13, 'EE': 0.15}
+YEARS = {'1': 0.3, '2': 0.27, '3': 0.23, '4': 0.2}
+
+# Beta(a, b) shapes of ballot times across the voting window
+CURVES = {'rush': (1, 4), 'late': (4, 1), 'both': (0.5, 0.5), 'flat': (1, 1)}
+
+
+def parse_distribution(value, choices):
+    """'CSE=40,ECE=30' -> {'CSE': 0.57, 'ECE': 0.43}, checked against `choices`"""
+    weights = {}
+    for part in value.split(','):
+        key, _, weight = part.partition('=')
+        if key not in dict(choices):
+            raise ValueError(f"Unknown value {key!r}; expected one of {', '.join(dict(choices))}")
+        weights[key] = float(weight or 1)
+    total = sum(weights.values())
+    return {key: weight / total for key, weight in weights.items()}
+
+
+def rankings(rng, n, candidate_ids, popularity):
+    """
+    (n x MAX_RANKS) int32 matrix of Plackett-Luce preference orders over
+    candidate_ids, truncated at random lengths and zero padded.
+    """
+    k = len(candidate_ids)
+    # Gumbel-max trick: sorting log-weights plus Gumbel noise samples a Plackett-Luce order
+    order = np.argsort(-(np.log(popularity) + rng.gumbel(size=(n, k))), axis=1)
+    ids = np.asarray(candidate_ids, dtype='<i4')[order]
+    lengths = rng.integers(1, k + 1, size=n)
+    ids[np.arange(k) >= lengths[:, None]] = 0
+    rows = np.zeros((n, RankedBallot.MAX_RANKS), dtype='<i4')
+    rows[:, :k] = ids
+    return rows
+
+
+def ranked_blobs(rng, n, candidate_ids, popularity=None):
+    """`n` RankedBallot.ranking blobs, as rankings() orders"""
+    if popularity is None:
+        popularity = rng.dirichlet(np.full(len(candidate_ids), 2.0))
+    blobs = []
+    for start in range(0, n, 100_000):
+        rows = rankings(rng, min(100_000, n - start), candidate_ids, popularity)
+        blobs.extend(row.tobytes() for row in rows)
+    return blobs
+
+
+class _explicit_timestamps:
+    """Let bulk_create keep the generated Vote.timestamp instead of auto_now_add's now()."""
+
+    def __enter__(self):
+        self.field = Vote._meta.get_field('timestamp')
+        self.field.auto_now_add = False
+
+    def __exit__(self, *exc):
+        self.field.auto_now_add = True
+
+
+def generate(*, end, elections=1, voters=10_000, candidates=4, positions=1, method='fptp', seats=1,
+             turnout=0.6, curve='rush', hours=48, branches=BRANCHES, years=YEARS, open_latest=False,
+             seed=2025, prefix='gen', log=lambda message: None):
+    """
+    Create the dataset and return {'elections': [...], 'candidates': {election id: [...]},
+    'voters': number of voters, 'ballots': number of ballots}. `end` is when the newest
+    election closes (or, with open_latest, the current time). Usernames and emails start
+    with `prefix`, so several datasets can share a database.
+    """
+    if method != 'fptp' and positions != 1:
+        raise ValueError('Ranked elections have a single race.')
+    if candidates < positions:
+        raise ValueError('Every race needs at least one candidate.')
+    rng = np.random.default_rng(seed)
+    duration = timedelta(hours=hours)
+    newest_start = end - duration / 2 if open_latest else end - duration
+    starts = [newest_start - (elections - 1 - i) * duration for i in range(elections)]
+    election_rows = Election.objects.bulk_create([
+        Election(name=f'{prefix.title()} election {i + 1}', start_date=start, end_date=start + duration,
+                 opened_at=start, is_active=open_latest and i == elections - 1, voting_method=method, seats=seats)
+        for i, start in enumerate(starts)
+    ])
+
+    titles = POSITIONS[:positions] if positions <= len(POSITIONS) else [f'Post {r + 1}' for r in range(positions)]
+    candidate_users = CustomUser.objects.bulk_create([
+        CustomUser(username=f'{prefix}-candidate-{e}-{c}', email=f'{prefix}-candidate-{e}-{c}@example.com',
+                   password='!', role='candidate', first_name='Candidate', last_name=f'{e + 1}.{c + 1}')
+        for e in range(elections) for c in range(candidates)
+    ], batch_size=BATCH_SIZE)
+    profiles = CandidateProfile.objects.bulk_create([
+        CandidateProfile(user=user, election=election_rows[n // candidates],
+                         position=titles[n % candidates % positions])
+        for n, user in enumerate(candidate_users)
+    ], batch_size=BATCH_SIZE)
+    by_election = {e.pk: profiles[i * candidates:(i + 1) * candidates] for i, e in enumerate(election_rows)}
+    # Per election, one (position, candidate ids, popularity) per race
+    races = {}
+    for election in election_rows:
+        races[election.pk] = []
+        for r, title in enumerate(titles):
+            ids = np.array([c.pk for c in by_election[election.pk][r::positions]])
+            races[election.pk].append((title, ids, rng.dirichlet(np.full(len(ids), 2.0))))
+    log(f'{elections} election(s) of {hours}h, {len(profiles)} candidate(s) in {positions} race(s) each')
+
+    branch_p = np.array(list(branches.values()))
+    year_p = np.array(list(years.values()))
+    ballots = 0
+    with _explicit_timestamps():
+        for start in range(0, voters, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, voters - start)
+            branch = rng.choice(list(branches), size=size, p=branch_p / branch_p.sum())
+            year = rng.choice(list(years), size=size, p=year_p / year_p.sum())
+            voted = rng.random((elections, size)) < turnout
+
+            # bulk_create sends no post_save, so no profiles are made for us
+            with transaction.atomic():
+                users = CustomUser.objects.bulk_create([
+                    CustomUser(username=f'{prefix}-voter-{start + i}', email=f'{prefix}-voter-{start + i}@example.com',
+                               password='!', role='voter', branch=branch[i], year_of_study=year[i])
+                    for i in range(size)
+                ], batch_size=BATCH_SIZE)
+                voter_ids = np.array([profile.pk for profile in VoterProfile.objects.bulk_create([
+                    VoterProfile(user_id=user.pk, has_voted=bool(voted[:, i].any()), email_verified=True)
+                    for i, user in enumerate(users)
+                ], batch_size=BATCH_SIZE)])
+
+            for e, election in enumerate(election_rows):
+                chosen = voter_ids[voted[e]]
+                votes, ranked = _ballots(rng, election, chosen, races[election.pk], curve, end)
+                db = vote_db(election.pk)
+                with transaction.atomic(using=db):
+                    Ballot.objects.using(db).bulk_create([
+                        Ballot(voter_id=voter_id, election_id=election.pk) for voter_id in chosen.tolist()
+                    ], batch_size=BATCH_SIZE)
+                    Vote.objects.using(db).bulk_create(votes, batch_size=BATCH_SIZE)
+                    RankedBallot.objects.using(db).bulk_create(ranked, batch_size=BATCH_SIZE)
+                ballots += len(chosen)
+            log(f'{start + size:,} voters, {ballots:,} ballots')
+
+    _recount(election_rows)
+    return {'elections': election_rows, 'candidates': by_election, 'voters': voters, 'ballots': ballots}
+
+
+def _ballots(rng, election, voter_ids, races, curve, end):
+    """Vote (and RankedBallot) rows of `voter_ids` in `election`"""
+    n = len(voter_ids)
+    opened, closed = election.start_date, min(election.end_date, end)
+    offsets = rng.beta(*CURVES[curve], size=n) * (closed - opened).total_seconds()
+    timestamps = [opened + timedelta(seconds=float(offset)) for offset in offsets]
+
+    votes, ranked = [], []
+    if election.is_ranked():
+        position, ids, popularity = races[0]
+        rows = rankings(rng, n, ids, popularity)
+        for voter_id, row, timestamp in zip(voter_ids.tolist(), rows, timestamps):
+            # The Vote holds the first preference, as submit_vote_view records it
+            votes.append(Vote(voter_id=voter_id, candidate_id=int(row[0]), election_id=election.pk, position=position,
+                              timestamp=timestamp))
+            ranked.append(RankedBallot(voter_id=voter_id, election_id=election.pk, ranking=row.tobytes()))
+        return votes, ranked
+
+    for position, ids, popularity in races:
+        picks = ids[rng.choice(len(ids), size=n, p=popularity)]
+        votes.extend(
+            Vote(voter_id=voter_id, candidate_id=candidate_id, election_id=election.pk, position=position,
+                 timestamp=timestamp)
+            for voter_id, candidate_id, timestamp in zip(voter_ids.tolist(), picks.tolist(), timestamps)
+        )
+    return votes, ranked
+
+
+def _recount(elections):
+    """Set the counters that Vote.save() and the signals would have maintained."""
+    for election in elections:
+        counts = votes_for(election).values('candidate_id').annotate(n=Count('pk')).values_list('candidate_id', 'n')
+        for candidate_id, n in counts:
+            CandidateProfile.objects.filter(pk=candidate_id).update(votes_received=n)
+        bump_version(election.pk)
+    Election.refresh_eligible_counts([e.pk for e in elections])
@@ -0,0 +1,128 @@
+"""
+Background deletion of election data, driven by `manage.py run_deletion_jobs`.
+
+Deleting a large election in one statement holds the SQLite writer lock for
+as long as it takes to remove every ballot and ledger node, and every vote
+being cast meanwhile waits on it. Instead, deleting an election (or the
+ballots of an archived one, see voting/archive.py) queues a DeletionJob.
+run() removes the rows in primary-key batches of `batch_size`, each in its
+own short transaction, and records its progress after every batch, so other
+writers get the lock between batches and an interrupted job resumes where it
+stopped.
+
+Jobs are claimed with a conditional UPDATE, so two runners never work on the
+same job. A running job whose heartbeat is older than STALE_AFTER (its runner
+died) is claimed again.
+"""
+import time
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .models import DeletionJob, Election, LedgerNode
+from .sharding import ballots_for, drop_shard, ranked_ballots_for, sharding_enabled, votes_for
+
+BATCH_SIZE = 1000
+STALE_AFTER = timedelta(minutes=5)
+
+
+def queue(election, kind, requested_by=None):
+    """Queue the deletion of an election's ballots ('votes') or of the whole election ('election')."""
+    return DeletionJob.objects.create(election_id=election.pk, election_name=election.name, kind=kind,
+                                      requested_by=requested_by)
+
+
+def pending_for(election_ids):
+    """{election id: its unfinished 'election' job}, for showing progress next to elections"""
+    jobs = DeletionJob.objects.filter(election_id__in=election_ids, kind='election').exclude(status='done')
+    return {job.election_id: job for job in jobs.order_by('created_at')}
+
+
+def claim(now=None):
+    """Take the oldest pending (or abandoned) job, or return None."""
+    now = now or timezone.now()
+    candidates = DeletionJob.objects.filter(status='pending') | DeletionJob.objects.filter(
+        status='running', heartbeat_at__lt=now - STALE_AFTER
+    )
+    for job in candidates.order_by('created_at')[:10]:
+        if DeletionJob.objects.filter(pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at).update(
+            status='running', started_at=job.started_at or now, heartbeat_at=now
+        ):
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def _targets(job):
+    """(label, queryset) of the rows the job deletes, largest first"""
+    targets = []
+    if not sharding_enabled():
+        # Sharded ballots go with their shard file instead. Pinned to the
+        # primary, so the ids to delete are never read from a lagging replica.
+        targets += [('ranked ballots', ranked_ballots_for(job.election_id).using(DEFAULT_DB_ALIAS)),
+                    ('votes', votes_for(job.election_id).using(DEFAULT_DB_ALIAS))]
+    if job.kind == 'election':
+        if not sharding_enabled():
+            # Who voted outlives archiving, so no one votes twice in a closed election
+            targets.append(('ballots', ballots_for(job.election_id).using(DEFAULT_DB_ALIAS)))
+        # An archived election keeps its ledger for inclusion proofs until it is deleted
+        targets.append(('ledger nodes', LedgerNode.objects.filter(election_id=job.election_id)))
+    return targets
+
+
+def run(job, batch_size=BATCH_SIZE, pause=0, log=lambda message: None):
+    """Carry out `job` (claimed with claim()); returns it finished, or marked failed."""
+    try:
+        targets = _targets(job)
+        if job.total is None:
+            job.total = sum(rows.count() for _, rows in targets)
+            job.save(update_fields=['total'])
+        for label, rows in targets:
+            while True:
+                ids = list(rows.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                with transaction.atomic(using=rows.db):
+                    deleted, _ = rows.model.objects.using(rows.db).filter(pk__in=ids).delete()
+                job.deleted += deleted
+                job.heartbeat_at = timezone.now()
+                job.save(update_fields=['deleted', 'heartbeat_at'])
+                log(f'{job}: {job.deleted:,}/{job.total:,} rows ({label})')
+                if pause:
+                    time.sleep(pause)
+        drop_shard(job.election_id)
+        if job.kind == 'election':
+            _delete_election(job.election_id)
+    except Exception as e:
+        job.status = 'failed'
+        job.error = f'{type(e).__name__}: {e}'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        return job
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    return job
+
+
+def _delete_election(election_id):
+    from .archive import archive_of, remove_files
+
+    election = Election.objects.filter(pk=election_id).select_related('archive').first()
+    if election is None:
+        return
+    archive = archive_of(election)
+    # What is left (results, candidates, rules, the ledger head) is small
+    election.delete()
+    if archive:
+        remove_files(archive)
+
+
+def run_pending(batch_size=BATCH_SIZE, pause=0, log=lambda message: None):
+    """Run jobs until none is left. Returns the jobs run."""
+    done = []
+    while (job := claim()) is not None:
+        done.append(run(job, batch_size, pause, log))
+    return done
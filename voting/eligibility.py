@@ -0,0 +1,35 @@
+"""
+Per-election voter eligibility.
+
+An election's EligibilityRule rows are compiled once into an Eligibility,
+which offers the same test in two forms: q() for filtering users in SQL and
+allows(user) for checking a single user in memory. Every rule must hold. A
+rule holds when the user's field value is one of the rule's values, or, for
+an exclude rule, when it is not.
+"""
+from django.db.models import Q
+
+
+class Eligibility:
+    def __init__(self, rules=()):
+        # (field, allowed values, exclude) per rule
+        self.checks = tuple((field, frozenset(values), exclude) for field, values, exclude in rules)
+
+    @classmethod
+    def from_rules(cls, rules):
+        """Compile EligibilityRule instances (e.g. a prefetched election.eligibility_rules.all())"""
+        return cls((rule.field, rule.values, rule.exclude) for rule in rules)
+
+    def q(self, prefix=''):
+        """Q object selecting eligible users; pass prefix='user__' to filter profiles."""
+        q = Q()
+        for field, values, exclude in self.checks:
+            condition = Q(**{f'{prefix}{field}__in': sorted(values)})
+            q &= ~condition if exclude else condition
+        return q
+
+    def allows(self, user):
+        return all((getattr(user, field) in values) != exclude for field, values, exclude in self.checks)
+
+    def __bool__(self):
+        return bool(self.checks)
@@ -0,0 +1,118 @@
+"""
+Structured event log: one JSON object per line for ballots, login tokens
+and admin actions, e.g.
+
+    {"time": "2025-10-19T09:12:03.214+00:00", "level": "INFO", "event": "election_toggled",
+     "actor": 1, "election": 7, "active": true}
+
+emit() hands the record to the 'voting.events' logger. settings.LOGGING routes
+it to a QueuedRotatingFileHandler, which only puts it on an in-memory queue;
+a listener thread formats it and writes it to settings.EVENT_LOG_FILE,
+rotating the file at EVENT_LOG_MAX_BYTES. A request thread therefore never
+waits on disk. If the queue is full (the disk cannot keep up), records are
+dropped and counted rather than blocking the request.
+
+High-volume events can be sampled: settings.EVENT_SAMPLE_RATES maps an event
+name to the fraction of its occurrences that is kept, and every sampled
+record carries its sample_rate, so counts can be scaled back up. Ballot
+events never name the chosen candidates.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from django.conf import settings
+
+logger = logging.getLogger('voting.events')
+
+RESERVED = {'time', 'level', 'event'}
+
+
+def emit(event, level=logging.INFO, **fields):
+    """Log `event` with JSON-serialisable `fields`, unless sampled out."""
+    rate = settings.EVENT_SAMPLE_RATES.get(event, 1.0)
+    if rate < 1 and random.random() >= rate:
+        return
+    if not logger.isEnabledFor(level):
+        return
+    if rate < 1:
+        fields['sample_rate'] = rate
+    logger.log(level, event, extra={'event': event, 'fields': fields})
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record; events keep their fields, other records their message."""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+        }
+        event = getattr(record, 'event', None)
+        if event:
+            data['event'] = event
+            data.update((k, v) for k, v in record.fields.items() if k not in RESERVED)
+        else:
+            data['logger'] = record.name
+            data['message'] = record.getMessage()
+            if record.exc_info:
+                data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class QueuedRotatingFileHandler(QueueHandler):
+    """
+    A QueueHandler whose listener thread writes to a size-rotated file.
+    Used from settings.LOGGING; the listener is restarted in a forked child.
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5, queue_size=10_000):
+        super().__init__(queue.Queue(queue_size))
+        self.filename, self.max_bytes, self.backup_count = filename, max_bytes, backup_count
+        self.dropped = 0
+        self.listener = None
+        self.start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _start(self):
+        with self.start_lock:
+            if self.listener is not None and self.pid == os.getpid():
+                return
+            # A forked child inherits the queue but not the listener thread
+            self.queue = queue.Queue(self.queue.maxsize)
+            os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+            target = RotatingFileHandler(self.filename, maxBytes=self.max_bytes, backupCount=self.backup_count,
+                                         encoding='utf-8', delay=True)
+            target.setFormatter(JSONFormatter())
+            self.listener = QueueListener(self.queue, target)
+            self.listener.start()
+            self.pid = os.getpid()
+
+    def enqueue(self, record):
+        if self.listener is None or self.pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1  # never block the request
+
+    def prepare(self, record):
+        # The listener's JSONFormatter formats the record; keep its event fields as they are
+        if getattr(record, 'event', None):
+            return record
+        return super().prepare(record)
+
+    def close(self):
+        """Write out what is queued and stop the listener."""
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+        super().close()
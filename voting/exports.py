@@ -0,0 +1,164 @@
+"""
+Streaming audit exports of votes and results.
+
+Rows are read in primary-key order, one short keyset query per chunk
+(pk > last id seen, LIMIT chunk_size), and encoded on the fly, so memory use
+does not grow with the size of the election. Each query is finished before
+its rows are yielded: a streamed download never keeps a read open on the
+database, which in SQLite's rollback-journal mode would hold a shared lock
+and fail every ballot committed meanwhile with "database is locked". Vote
+exports are resumable: every row carries its vote id, and passing the last
+id seen as `after` continues from the next vote. The votes of an archived
+election are read from its archive file (voting/archive.py).
+"""
+import csv
+import json
+import zlib
+
+from django.db.models import Count
+
+from .archive import archive_of, vote_rows as archived_vote_rows
+from .models import CandidateProfile, VoterProfile
+from .sharding import sharding_enabled, votes_for
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+VOTE_FIELDS = ['vote_id', 'election_id', 'timestamp', 'voter_id', 'voter_branch', 'voter_year',
+               'candidate_id', 'candidate']
+
+RESULT_FIELDS = ['election_id', 'candidate_id', 'candidate', 'votes']
+
+CHUNK_SIZE = 2000
+
+# Encoded rows are grouped into pieces of about this size before being yielded
+FLUSH_BYTES = 64 * 1024
+
+
+class _Echo:
+    """File-like object whose write() hands back what it was given (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def _chunks(rows, after=None, chunk_size=CHUNK_SIZE):
+    """
+    values_list() rows of `rows` (primary key first) after primary key `after`,
+    as lists of up to `chunk_size`, each read by its own query (keyset pagination).
+    """
+    after = after or 0
+    while True:
+        chunk = list(rows.filter(pk__gt=after).order_by('pk')[:chunk_size])
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        after = chunk[-1][0]
+
+
+def _candidate_names(using):
+    candidates = CandidateProfile.objects.using(using).values_list(
+        'pk', 'user__first_name', 'user__last_name', 'user__username'
+    )
+    return {
+        pk: f'{first} {last}'.strip() or username
+        for chunk in _chunks(candidates) for pk, first, last, username in chunk
+    }
+
+
+def vote_rows(election, after=None, using='default', chunk_size=CHUNK_SIZE):
+    """Yield one dict per vote of `election` in primary-key order, starting after vote id `after`."""
+    archive = archive_of(election)
+    if archive:
+        yield from archived_vote_rows(archive, after)
+        return
+
+    votes = votes_for(election)
+    if not sharding_enabled():
+        votes = votes.using(using)
+    candidates = _candidate_names(using)
+
+    if not sharding_enabled():
+        # Same database: let SQL join the voter's branch and year
+        rows = votes.values_list(
+            'pk', 'election_id', 'timestamp', 'voter_id', 'voter__user__branch', 'voter__user__year_of_study',
+            'candidate_id',
+        )
+        for chunk in _chunks(rows, after, chunk_size):
+            for pk, election_id, timestamp, voter_id, branch, year, candidate_id in chunk:
+                yield dict(zip(VOTE_FIELDS, (pk, election_id, timestamp.isoformat(), voter_id, branch, year,
+                                             candidate_id, candidates.get(candidate_id))))
+        return
+
+    # Votes live in a shard: fetch voter details one chunk at a time instead
+    rows = votes.values_list('pk', 'election_id', 'timestamp', 'voter_id', 'candidate_id')
+    for chunk in _chunks(rows, after, chunk_size):
+        yield from _join_voters(chunk, candidates, using)
+
+
+def _join_voters(chunk, candidates, using):
+    voters = {
+        voter_id: (branch, year)
+        for voter_id, branch, year in VoterProfile.objects.using(using).filter(
+            pk__in={row[3] for row in chunk}
+        ).values_list('pk', 'user__branch', 'user__year_of_study')
+    }
+    for pk, election_id, timestamp, voter_id, candidate_id in chunk:
+        branch, year = voters.get(voter_id, (None, None))
+        yield dict(zip(VOTE_FIELDS, (pk, election_id, timestamp.isoformat(), voter_id, branch, year,
+                                     candidate_id, candidates.get(candidate_id))))
+
+
+def result_rows(election, using='default'):
+    """Yield one dict per candidate with their vote count in `election`."""
+    if archive_of(election):
+        # The votes are gone from the database; the frozen tally is what is left
+        for result in election.final_results.using(using).filter(candidate__isnull=False).order_by('candidate_id'):
+            yield dict(zip(RESULT_FIELDS, (election.pk, result.candidate_id, result.candidate_name, result.votes)))
+        return
+    counts = votes_for(election)
+    if not sharding_enabled():
+        counts = counts.using(using)
+    candidates = _candidate_names(using)
+    for row in counts.values('candidate_id').annotate(votes=Count('pk')).order_by('candidate_id'):
+        yield dict(zip(RESULT_FIELDS, (election.pk, row['candidate_id'], candidates.get(row['candidate_id']),
+                                       row['votes'])))
+
+
+def encode(rows, fields, fmt='csv', compress=False):
+    """Turn an iterable of row dicts into an iterator of bytes chunks."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {fmt}')
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: gzip container
+    buffer = []
+    size = 0
+
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        lines = (writer.writerow([row[field] for field in fields]) for row in rows)
+        lines = _prepend(writer.writerow(fields), lines)
+    else:
+        lines = (json.dumps(row, separators=(',', ':')) + '\n' for row in rows)
+
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            data = ''.join(buffer).encode()
+            buffer, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = ''.join(buffer).encode()
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
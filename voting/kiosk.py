@@ -0,0 +1,345 @@
+"""
+Polling-station kiosks with unreliable connectivity.
+
+A kiosk runs this same app with settings.KIOSK_ID set, against its own
+SQLite database: a snapshot of the server's taken before the election, so
+voter, election and candidate ids match. submit_vote_view then does not cast
+the ballot; it stores a QueuedBallot, signed with an HMAC under the kiosk's
+secret, and tells the voter their ballot id.
+
+`manage.py kiosk_sync` sends the queued ballots to the server's
+kiosk/ballots/ endpoint in batches of up to MAX_BATCH, gzipped, one request
+per batch. ingest() on the server checks every ballot and casts the valid
+ones of each election with one bulk insert, in one transaction that also
+looks for ballots the voters have cast already (online, or at another
+kiosk). Write transactions take the lock when they begin (settings.py), so
+no ballot can slip in between that check and the insert. The answer is a
+reconciliation report listing the outcome of every ballot:
+- accepted: cast;
+- duplicate: the voter had already voted in that election;
+- rejected: a bad signature, an unknown voter or candidate, an ineligible
+  voter, a cast time outside the election, or an election whose ballots
+  have been archived.
+A booth that was offline when its election closed syncs after the scheduler
+has finalised it: ballots cast inside the election are still accepted and
+added to the frozen ElectionResult tally and ballots_cast.
+Every outcome is recorded as a KioskBallot under the ballot's id, so a batch
+sent again (e.g. after a lost response) gets the same answers and nothing is
+cast twice.
+"""
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, When
+from django.utils import timezone
+
+from .models import (
+    Ballot, CandidateProfile, Election, ElectionArchive, ElectionResult, KioskBallot, QueuedBallot, RankedBallot,
+    Vote, VoterProfile,
+)
+
+MAX_BATCH = 5000
+MAX_BODY_BYTES = 50 * 1024 * 1024  # decompressed
+CLOCK_SKEW = timedelta(minutes=5)
+SIGNED_FIELDS = ('ballot_id', 'kiosk', 'election', 'voter', 'candidates', 'ranking', 'cast_at')
+
+
+class KioskError(Exception):
+    pass
+
+
+def sign(ballot, secret):
+    """HMAC-SHA256 of the SIGNED_FIELDS of a ballot payload"""
+    message = json.dumps({field: ballot.get(field) for field in SIGNED_FIELDS}, sort_keys=True,
+                         separators=(',', ':'))
+    return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+# ===============================================
+# On the kiosk
+# ===============================================
+
+def has_queued(voter, election):
+    """Whether `voter` has a ballot waiting at this kiosk (no query when this is not a kiosk)"""
+    return bool(settings.KIOSK_ID) and QueuedBallot.objects.filter(voter=voter, election=election).exists()
+
+
+def queue_ballot(voter, election, candidates, ranking=None):
+    """
+    Store a signed ballot for the next sync. Raises IntegrityError if `voter`
+    already has one queued for `election`.
+    """
+    ballot = QueuedBallot(election=election, voter=voter, candidate_ids=[c.pk for c in candidates],
+                          ranking=list(ranking or []))
+    ballot.signature = sign(payload(ballot), settings.KIOSK_SECRET)
+    with transaction.atomic():
+        ballot.save()
+        VoterProfile.objects.filter(pk=voter.pk, has_voted=False).update(has_voted=True)
+    return ballot
+
+
+def payload(ballot):
+    """What kiosk_sync sends for a QueuedBallot"""
+    return {
+        'ballot_id': str(ballot.ballot_id),
+        'kiosk': settings.KIOSK_ID,
+        'election': ballot.election_id,
+        'voter': ballot.voter_id,
+        'candidates': ballot.candidate_ids,
+        'ranking': ballot.ranking,
+        'cast_at': ballot.cast_at.isoformat(),
+        'signature': ballot.signature,
+    }
+
+
+def record_report(ballots, report):
+    """Store the server's outcome on each QueuedBallot it reported on; returns those left queued."""
+    outcomes = {result['ballot_id']: result for result in report['results']}
+    now = timezone.now()
+    reported = []
+    for ballot in ballots:
+        result = outcomes.get(str(ballot.ballot_id))
+        if result is not None:
+            ballot.status, ballot.detail, ballot.synced_at = result['status'], result['detail'][:255], now
+            reported.append(ballot)
+    QueuedBallot.objects.bulk_update(reported, ['status', 'detail', 'synced_at'], batch_size=500)
+    return [ballot for ballot in ballots if str(ballot.ballot_id) not in outcomes]
+
+
+# ===============================================
+# On the server
+# ===============================================
+
+def read_batch(request):
+    """(kiosk id, ballots) from a sync request body, gzipped or not"""
+    body = request.body
+    if request.headers.get('Content-Encoding') == 'gzip':
+        try:
+            with gzip.GzipFile(fileobj=io.BytesIO(body)) as f:
+                body = f.read(MAX_BODY_BYTES + 1)
+        except (OSError, EOFError):
+            raise KioskError('The body is not valid gzip.')
+        if len(body) > MAX_BODY_BYTES:
+            raise KioskError('The batch is too large.')
+    try:
+        data = json.loads(body)
+        kiosk, ballots = str(data['kiosk']), data['ballots']
+    except (ValueError, KeyError, TypeError):
+        raise KioskError('Expected a JSON object with "kiosk" and "ballots".')
+    if not isinstance(ballots, list) or not all(isinstance(b, dict) for b in ballots):
+        raise KioskError('"ballots" must be a list of objects.')
+    if len(ballots) > MAX_BATCH:
+        raise KioskError(f'At most {MAX_BATCH} ballots per batch.')
+    return kiosk, ballots
+
+
+def ingest(kiosk, ballots):
+    """Cast a batch of ballots from `kiosk` (a key of settings.KIOSK_KEYS); returns the reconciliation report."""
+    batch = uuid.uuid4()
+    secret = settings.KIOSK_KEYS[kiosk]
+    outcomes = {}  # ballot id -> (status, detail)
+    fresh, seen = [], set()
+    for ballot in ballots:
+        try:
+            ballot['ballot_id'] = str(uuid.UUID(str(ballot.get('ballot_id'))))
+        except ValueError:
+            continue  # reported as malformed below; there is no id to record it under
+        if ballot['ballot_id'] not in seen:  # listed twice in one batch: answered once
+            seen.add(ballot['ballot_id'])
+            fresh.append(ballot)
+
+    # Sent before: the answer given then
+    resent = {str(row.ballot_id): row for row in KioskBallot.objects.filter(ballot_id__in=seen)}
+    for ballot_id, row in resent.items():
+        outcomes[ballot_id] = (row.status, row.detail)
+    fresh = [ballot for ballot in fresh if ballot['ballot_id'] not in resent]
+
+    elections = Election.objects.in_bulk({b.get('election') for b in fresh if isinstance(b.get('election'), int)})
+    voters = VoterProfile.objects.select_related('user').in_bulk(
+        {b.get('voter') for b in fresh if isinstance(b.get('voter'), int)}
+    )
+    archived = set(ElectionArchive.objects.filter(election_id__in=elections).values_list('election_id', flat=True))
+    standing = {election_id: {c.pk: c for c in CandidateProfile.for_election(election).only('pk', 'position')}
+                for election_id, election in elections.items()}
+    now = timezone.now()
+    valid = {}  # election id -> checked ballots
+    for ballot in fresh:
+        problem = _check(ballot, secret, kiosk, elections, voters, standing, archived, now)
+        if problem:
+            outcomes[ballot['ballot_id']] = ('rejected', problem)
+        else:
+            valid.setdefault(ballot['election'], []).append(ballot)
+    for election_id, group in valid.items():
+        outcomes.update(_cast(elections[election_id], group, voters, standing[election_id]))
+
+    KioskBallot.objects.bulk_create([
+        KioskBallot(ballot_id=b['ballot_id'], kiosk=kiosk, batch=batch,
+                    election_id=b.get('election') if isinstance(b.get('election'), int) else None,
+                    voter_id=b.get('voter') if isinstance(b.get('voter'), int) else None,
+                    cast_at=_cast_at(b), status=outcomes[b['ballot_id']][0], detail=outcomes[b['ballot_id']][1])
+        for b in fresh
+    ], batch_size=1000, ignore_conflicts=True)  # a batch sent twice at once: the first answer stands
+
+    results = []
+    for ballot in ballots:
+        ballot_id = ballot.get('ballot_id')
+        status, detail = outcomes.get(ballot_id, ('rejected', 'Malformed ballot id.'))
+        results.append({'ballot_id': ballot_id, 'status': status, 'detail': detail})
+    counts = Counter(result['status'] for result in results)
+    return {
+        'batch': str(batch),
+        'kiosk': kiosk,
+        'received': len(ballots),
+        'accepted': counts['accepted'],
+        'duplicate': counts['duplicate'],
+        'rejected': counts['rejected'],
+        'resent': len(resent),
+        'results': results,
+    }
+
+
+def _cast_at(ballot):
+    try:
+        cast_at = datetime.fromisoformat(ballot.get('cast_at'))
+    except (TypeError, ValueError):
+        return None
+    return cast_at if timezone.is_aware(cast_at) else None
+
+
+def _check(ballot, secret, kiosk, elections, voters, standing, archived, now):
+    """Why `ballot` cannot be cast, or None"""
+    if ballot.get('kiosk') != kiosk or not hmac.compare_digest(sign(ballot, secret), str(ballot.get('signature'))):
+        return 'Bad signature.'
+    election, voter = elections.get(ballot.get('election')), voters.get(ballot.get('voter'))
+    if election is None:
+        return 'Unknown election.'
+    if voter is None:
+        return 'Unknown voter.'
+    cast_at = _cast_at(ballot)
+    if cast_at is None:
+        return 'Missing or invalid cast time.'
+    if not election.start_date <= cast_at <= election.end_date or cast_at > now + CLOCK_SKEW:
+        return 'Cast outside the election.'
+    if election.pk in archived:
+        return "The election's ballots have been archived."
+    if not election.is_eligible(voter.user):
+        return 'The voter is not eligible in this election.'
+    candidate_ids, ranking = ballot.get('candidates'), ballot.get('ranking') or []
+    if not isinstance(candidate_ids, list) or not candidate_ids or not isinstance(ranking, list):
+        return 'No candidates.'
+    candidates = [standing[election.pk].get(c) for c in candidate_ids]
+    if None in candidates or len(set(candidate_ids)) != len(candidate_ids):
+        return 'A candidate is not standing in this election.'
+    if len({c.position for c in candidates}) != len(candidates):
+        return 'More than one candidate for a position.'
+    if election.is_ranked():
+        if ranking[:1] != candidate_ids or len(candidate_ids) != 1:
+            return 'The first preference does not match the ranking.'
+        if any(c not in standing[election.pk] for c in ranking):
+            return 'The ranking includes an unknown candidate.'
+        try:
+            RankedBallot.pack(ranking)
+        except Exception as e:
+            return ' '.join(getattr(e, 'messages', [str(e)]))
+    elif ranking:
+        return 'Only ranked elections take a ranking.'
+    ballot['_candidates'] = candidates
+    return None
+
+
+def _cast(election, ballots, voters, standing):
+    """Cast the checked `ballots` of one election; returns {ballot id: (status, detail)}."""
+    from .caching import count_ballot
+    from .sharding import ballots_for, ranked_ballots_for, vote_db
+    from . import leaderboard
+
+    outcomes, accepted = {}, []
+    db = vote_db(election.pk)
+    with transaction.atomic(using=db):
+        # Inside the write transaction, so nothing is cast between the check and the insert
+        taken = set(ballots_for(election).filter(voter_id__in=[b['voter'] for b in ballots])
+                    .values_list('voter_id', flat=True))
+        for ballot in ballots:
+            if ballot['voter'] in taken:
+                outcomes[ballot['ballot_id']] = ('duplicate', 'The voter has already voted in this election.')
+            else:
+                taken.add(ballot['voter'])
+                accepted.append(ballot)
+                outcomes[ballot['ballot_id']] = ('accepted', '')
+        if not accepted:
+            return outcomes
+
+        Ballot.objects.using(db).bulk_create([
+            Ballot(voter=voters[b['voter']], election=election) for b in accepted
+        ], batch_size=1000)
+        Vote.objects.using(db).bulk_create([
+            Vote(voter=voters[b['voter']], election=election, candidate=c, position=c.position)
+            for b in accepted for c in b['_candidates']
+        ], batch_size=1000)
+        if election.is_ranked():
+            ranked_ballots_for(election).bulk_create([
+                RankedBallot(voter=voters[b['voter']], election=election, ranking=RankedBallot.pack(b['ranking']))
+                for b in accepted
+            ], batch_size=1000)
+        per_candidate = Counter(c.pk for b in accepted for c in b['_candidates'])
+        folded = []  # set when the ballots were added to a frozen tally
+
+        def update_counters():
+            # One UPDATE for the voters and one for the candidates, however large the batch
+            VoterProfile.objects.filter(pk__in=[b['voter'] for b in accepted], has_voted=False).update(has_voted=True)
+            CandidateProfile.objects.filter(pk__in=per_candidate).update(votes_received=F('votes_received') + Case(
+                *[When(pk=pk, then=n) for pk, n in per_candidate.items()], output_field=IntegerField()
+            ))
+            # Re-read under the write lock: finalise() either ran before, and froze a
+            # tally without these ballots, or runs after and counts them itself
+            if Election.objects.filter(pk=election.pk, finalised_at__isnull=False).exists():
+                # A candidate finalise() left out (registered since, or moved away and back)
+                # has no row to add to yet
+                frozen = ElectionResult.objects.filter(election=election, candidate_id__in=per_candidate)
+                unfrozen = per_candidate.keys() - set(frozen.values_list('candidate_id', flat=True))
+                ElectionResult.objects.bulk_create([
+                    ElectionResult(
+                        election=election,
+                        candidate=candidate,
+                        candidate_name=f"{candidate.user.first_name} {candidate.user.last_name}".strip()
+                        or candidate.user.username,
+                        position=candidate.position,
+                        votes=0,
+                    )
+                    for candidate in CandidateProfile.objects.select_related('user').filter(pk__in=unfrozen)
+                ])
+                ElectionResult.objects.filter(election=election, candidate_id__in=per_candidate).update(
+                    votes=F('votes') + Case(*[When(candidate_id=pk, then=n) for pk, n in per_candidate.items()],
+                                            output_field=IntegerField())
+                )
+                Election.objects.filter(pk=election.pk).update(ballots_cast=F('ballots_cast') + len(accepted))
+                folded.append(True)
+
+        Vote._after_write(db, update_counters)
+
+        def counted():
+            if folded:
+                _refreeze(election)
+            else:
+                count_ballot(election, len(accepted))
+            for ballot in accepted:
+                leaderboard.record(election, ballot['_candidates'])
+
+        transaction.on_commit(counted, using=db)
+    return outcomes
+
+
+def _refreeze(election):
+    """Drop the caches of a finalised election after late kiosk ballots were added to its frozen tally"""
+    from .caching import bump_version, participation
+    election.refresh_from_db()
+    bump_version(election.pk)
+    participation(election, refresh=True)
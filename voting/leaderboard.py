@@ -0,0 +1,217 @@
+"""
+Live vote counts and ranks for the candidate dashboard.
+
+Each worker keeps an in-memory Standings per race (election, position). A
+Standings holds every candidate's count plus a Fenwick tree indexed by vote
+count that records how many candidates have each count, so the rank of a
+candidate - one more than the number of candidates with strictly more votes
+- is a prefix sum: O(log n) to answer, and O(log n) to update when a ballot
+comes in.
+
+submit_vote_view calls record() once the ballot has committed, so ballots
+cast through this worker show up at once. Ballots cast through other workers
+arrive when the standings are resynced from the shared, single-flight cached
+tally (caching.result_counts), at most every RESYNC_SECONDS. A count only
+ever goes up while an election is open, so a resync keeps the larger of the
+local and the cached count for each candidate. Standings are built on first
+use, so a freshly started worker rebuilds them from the tally. In ranked
+elections the counts are first preferences, as on the Vote rows.
+
+What a candidate may see depends on Election.results_visibility:
+- 'live': the current standings;
+- 'delayed': a snapshot refreshed at most every results_delay minutes;
+- 'closed': nothing until the election has ended.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .caching import result_counts
+from .models import CandidateProfile
+
+RESYNC_SECONDS = 10
+
+
+class FenwickTree:
+    """Prefix sums over 0..size-1 with O(log n) point updates; grows on demand."""
+
+    def __init__(self, size=64):
+        self.tree = [0] * (size + 1)
+
+    def add(self, index, delta):
+        if index + 1 >= len(self.tree):
+            self._grow(index + 1)
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index):
+        """Sum of positions 0..index"""
+        i = min(index + 1, len(self.tree) - 1)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _grow(self, needed):
+        size = len(self.tree) - 1
+        values = [self.prefix(i) - (self.prefix(i - 1) if i else 0) for i in range(size)]
+        while size < needed:
+            size *= 2
+        self.tree = [0] * (size + 1)
+        for index, value in enumerate(values):
+            if value:
+                self.add(index, value)
+
+
+class Standings:
+    """Vote counts of the candidates in one race, with O(log n) rank."""
+
+    def __init__(self, counts):
+        self.counts = dict(counts)
+        self.by_count = FenwickTree(max(64, max(self.counts.values(), default=0) * 2))
+        for votes in self.counts.values():
+            self.by_count.add(votes, 1)
+
+    def set(self, candidate_id, votes):
+        old = self.counts.get(candidate_id)
+        if old == votes:
+            return
+        if old is not None:
+            self.by_count.add(old, -1)
+        self.counts[candidate_id] = votes
+        self.by_count.add(votes, 1)
+
+    def increment(self, candidate_id):
+        self.set(candidate_id, self.counts.get(candidate_id, 0) + 1)
+
+    def rank(self, candidate_id):
+        """1 for the leader; candidates on equal votes share a rank"""
+        votes = self.counts[candidate_id]
+        return len(self.counts) - self.by_count.prefix(votes) + 1
+
+    def table(self):
+        """(candidate id, votes, rank), leader first"""
+        return [(candidate_id, votes, self.rank(candidate_id))
+                for candidate_id, votes in sorted(self.counts.items(), key=lambda item: -item[1])]
+
+
+class _Board:
+    def __init__(self, races, synced_at):
+        self.races = races  # {position: Standings}
+        self.positions = {cid: position for position, s in races.items() for cid in s.counts}
+        self.synced_at = synced_at
+
+
+_boards = {}  # election id -> _Board
+_lock = threading.Lock()
+
+
+def _races(election):
+    """{position: {candidate id: votes}} from the cached tally"""
+    counts = result_counts(election)
+    races = {}
+    for candidate_id, position in CandidateProfile.for_election(election).values_list('pk', 'position'):
+        races.setdefault(position, {})[candidate_id] = counts.get(candidate_id, 0)
+    return races
+
+
+def _board(election):
+    now = time.monotonic()
+    board = _boards.get(election.pk)
+    if board is not None and now - board.synced_at < RESYNC_SECONDS:
+        return board
+    races = _races(election)  # outside the lock: it may query
+    with _lock:
+        board = _boards.get(election.pk)
+        if board is None or set(board.positions) != {cid for race in races.values() for cid in race}:
+            board = _boards[election.pk] = _Board({p: Standings(c) for p, c in races.items()}, now)
+        else:
+            for position, counts in races.items():
+                for candidate_id, votes in counts.items():
+                    standings = board.races[position]
+                    standings.set(candidate_id, max(votes, standings.counts.get(candidate_id, 0)))
+            board.synced_at = now
+    return board
+
+
+def record(election, candidates):
+    """Count a just-committed ballot for `candidates` in this worker's standings, if it has them."""
+    with _lock:
+        board = _boards.get(election.pk)
+        if board is None:
+            return  # built from the tally, which already includes the ballot, on first use
+        for candidate in candidates:
+            position = board.positions.get(candidate.pk)
+            if position is not None:
+                board.races[position].increment(candidate.pk)
+
+
+def forget(election_id=None):
+    """Drop the standings of one election (or all), e.g. in tests."""
+    with _lock:
+        if election_id is None:
+            _boards.clear()
+        else:
+            _boards.pop(election_id, None)
+
+
+def standing(election, candidate):
+    """
+    What `candidate` may see of their race in `election`: None when hidden,
+    else {'votes', 'rank', 'of', 'table', 'as_of'}, where `table` lists
+    (candidate id, votes, rank) leader first and `as_of` is None for live data
+    or the time of a delayed snapshot.
+    """
+    if election.results_visibility == 'closed' and not election.has_ended():
+        return None
+    if election.results_visibility == 'delayed' and not election.has_ended():
+        return _delayed(election, candidate)
+    return _current(election, candidate)
+
+
+def _current(election, candidate):
+    board = _board(election)
+    position = board.positions.get(candidate.pk)
+    if position is None:
+        return None
+    with _lock:
+        standings = board.races[position]
+        return {
+            'votes': standings.counts[candidate.pk],
+            'rank': standings.rank(candidate.pk),
+            'of': len(standings.counts),
+            'table': standings.table(),
+            'as_of': None,
+        }
+
+
+def _snapshot_key(election_id):
+    # Not versioned: edits to the election or its candidates bump its version,
+    # and would otherwise bring the next snapshot forward
+    return f'voting:standings:{election_id}'
+
+
+def _delayed(election, candidate):
+    key = _snapshot_key(election.pk)
+    snapshots = cache.get(key)
+    if snapshots is None:
+        # Shared by every worker, so all candidates see the same snapshot
+        board = _board(election)
+        with _lock:
+            snapshots = {
+                'as_of': timezone.now(),
+                'races': {position: s.table() for position, s in board.races.items()},
+            }
+        if not cache.add(key, snapshots, election.results_delay * 60):
+            snapshots = cache.get(key, snapshots)
+    for table in snapshots['races'].values():
+        for candidate_id, votes, rank in table:
+            if candidate_id == candidate.pk:
+                return {'votes': votes, 'rank': rank, 'of': len(table), 'table': table,
+                        'as_of': snapshots['as_of']}
+    return None
@@ -0,0 +1,188 @@
+"""
+Tamper-evident vote ledger.
+
+Every accepted ballot is hashed into a per-election Merkle tree (RFC 6962
+layout: leaf = SHA-256(0x00 || data), node = SHA-256(0x01 || left || right)).
+LedgerState keeps the "frontier" - the roots of the perfect subtrees along
+the right edge - so an append only touches O(log n) hashes, and every
+completed subtree root is stored as a LedgerNode so inclusion proofs can be
+built without re-reading the leaves.
+
+Voters get their leaf hash as a receipt when they vote. Appends happen in
+batches (manage.py ledger_append), off the request path; verify_ledger
+re-derives the root from the Vote table in O(log n) memory.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .models import DeletionJob, Election, LedgerNode, LedgerState
+from .sharding import votes_for
+
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()
+
+# Only ledger votes at least this old, so a ballot whose transaction is still
+# committing is not skipped over by a higher, already-committed id.
+SETTLE_SECONDS = 2
+
+VOTE_COLUMNS = ('pk', 'election_id', 'voter_id', 'candidate_id', 'timestamp')
+
+
+def hash_leaf(data):
+    return hashlib.sha256(b'\x00' + data).hexdigest()
+
+
+def hash_children(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def ballot_receipt(vote_id, election_id, voter_id, candidate_id, timestamp):
+    """
+    Leaf hash of one ballot. The keyed nonce keeps receipts unguessable, so a
+    receipt cannot be brute-forced back to the candidate chosen.
+    """
+    nonce = salted_hmac('voting.ledger.receipt', str(vote_id)).hexdigest()
+    data = f'{election_id}|{vote_id}|{voter_id}|{candidate_id}|{timestamp.isoformat()}|{nonce}'
+    return hash_leaf(data.encode())
+
+
+def receipt_for_vote(vote):
+    return ballot_receipt(vote.pk, vote.election_id, vote.voter_id, vote.candidate_id, vote.timestamp)
+
+
+class MerkleFrontier:
+    """Right edge of an append-only Merkle tree: O(log n) state, O(log n) per append."""
+
+    def __init__(self, size=0, levels=None):
+        self.size = size
+        self.levels = list(levels or [])
+
+    def append(self, leaf):
+        """Add a leaf hash; return the (level, index, digest) nodes completed by it."""
+        completed = [(0, self.size, leaf)]
+        digest, level, index = leaf, 0, self.size
+        while level < len(self.levels) and self.levels[level] is not None:
+            digest = hash_children(self.levels[level], digest)
+            self.levels[level] = None
+            level += 1
+            index >>= 1
+            completed.append((level, index, digest))
+        if level == len(self.levels):
+            self.levels.append(None)
+        self.levels[level] = digest
+        self.size += 1
+        return completed
+
+    def root(self):
+        root = None
+        for digest in self.levels:
+            if digest is not None:
+                root = digest if root is None else hash_children(digest, root)
+        return root or EMPTY_ROOT
+
+
+def append_pending(election, batch_size=1000):
+    """Append the next batch of not-yet-ledgered votes of `election`. Returns how many were added."""
+    cutoff = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    with transaction.atomic():
+        state, _ = LedgerState.objects.select_for_update().get_or_create(election=election)
+        votes = list(
+            votes_for(election).filter(pk__gt=state.last_vote_id, timestamp__lte=cutoff)
+            .order_by('pk').values_list(*VOTE_COLUMNS)[:batch_size]
+        )
+        if not votes:
+            return 0
+        frontier = MerkleFrontier(state.size, state.frontier)
+        nodes = []
+        for vote in votes:
+            for level, index, digest in frontier.append(ballot_receipt(*vote)):
+                nodes.append(LedgerNode(election=election, level=level, index=index, digest=digest,
+                                        vote_id=vote[0] if level == 0 else None))
+        LedgerNode.objects.bulk_create(nodes, batch_size=1000)
+        state.size = frontier.size
+        state.frontier = frontier.levels
+        state.root = frontier.root()
+        state.last_vote_id = votes[-1][0]
+        state.save()
+    return len(votes)
+
+
+def elections_to_append():
+    """
+    Elections that may have ballots not yet in their ledger: the active ones,
+    and closed ones whose ledger is behind their last vote - ballots cast in
+    the last seconds before close or since the previous run, or synced late
+    from a kiosk. Archived elections and those being deleted are skipped.
+    """
+    elections = Election.objects.filter(archive__isnull=True).exclude(
+        pk__in=DeletionJob.objects.filter(kind='election').values('election_id')
+    )
+    ledgered = dict(LedgerState.objects.values_list('election_id', 'last_vote_id'))
+    for election in elections:
+        if election.is_active or votes_for(election).filter(pk__gt=ledgered.get(election.pk, 0)).exists():
+            yield election
+
+
+def _pieces(start, size):
+    """Split leaves [start, start+size) into aligned perfect subtrees, left to right."""
+    pieces = []
+    while size:
+        level = size.bit_length() - 1
+        pieces.append((level, start >> level))
+        start += 1 << level
+        size -= 1 << level
+    return pieces
+
+
+def inclusion_proof(election, position, tree_size):
+    """Audit path (RFC 6962 PATH) for leaf `position` in the first `tree_size` leaves."""
+    ranges = []
+    start, size = 0, tree_size
+    while size > 1:
+        k = 1 << ((size - 1).bit_length() - 1)  # largest power of two below size
+        if position < start + k:
+            ranges.append((start + k, size - k))
+            size = k
+        else:
+            ranges.append((start, k))
+            start, size = start + k, size - k
+    ranges.reverse()  # the path runs from the leaf up to the root
+
+    wanted = {piece for r in ranges for piece in _pieces(*r)}
+    stored = {
+        (level, index): digest
+        for level, index, digest in LedgerNode.objects.filter(
+            election=election, level__in={level for level, _ in wanted}, index__in={index for _, index in wanted}
+        ).values_list('level', 'index', 'digest')
+    }
+    path = []
+    for r in ranges:
+        digests = [stored[piece] for piece in _pieces(*r)]
+        digest = digests[-1]
+        for left in reversed(digests[:-1]):
+            digest = hash_children(left, digest)
+        path.append(digest)
+    return path
+
+
+def verify_inclusion(leaf, position, tree_size, path, root):
+    """Check an audit path (RFC 9162, section 2.1.3.2)."""
+    if position >= tree_size:
+        return False
+    fn, sn, digest = position, tree_size - 1, leaf
+    for sibling in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            digest = hash_children(sibling, digest)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            digest = hash_children(digest, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and digest == root
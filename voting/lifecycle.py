@@ -0,0 +1,101 @@
+"""
+Automatic election lifecycle, driven by `manage.py run_scheduler`.
+
+Shortly before an election opens its ballot, eligibility and participation
+caches are warmed (voting/caching.py). At start_date it is opened, and at
+end_date it is closed and its tally is frozen into ElectionResult rows, so
+the rush of requests at either edge reads warm data.
+
+Every transition is claimed with a conditional UPDATE, so two schedulers (or
+a scheduler racing an admin) never open or finalise an election twice. An
+election an admin has toggled by hand has opened_at set and is left alone
+until it closes.
+
+Only one election is active at a time, as when an admin toggles one: opening
+an election closes any other that is still active, so when schedules overlap
+the one that started last stays open.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .caching import bump_version, cache_key, participation, warm
+from .models import CandidateProfile, DeletionJob, Election, ElectionResult
+from .sharding import votes_for
+
+WARMUP = timedelta(minutes=5)
+
+
+def tick(now=None, warmup=WARMUP):
+    """Run every transition that is due. Returns {'warmed'|'opened'|'finalised': [elections]}."""
+    now = now or timezone.now()
+    done = {'warmed': [], 'opened': [], 'finalised': []}
+    # Elections queued for deletion (voting/deletion.py) are left alone
+    elections = Election.objects.exclude(
+        pk__in=DeletionJob.objects.filter(kind='election').values('election_id')
+    )
+
+    upcoming = elections.filter(opened_at__isnull=True, start_date__gt=now,
+                                start_date__lte=now + warmup, end_date__gt=now)
+    for election in upcoming:
+        if warm_once(election, timeout=(election.start_date - now + warmup).total_seconds()):
+            done['warmed'].append(election)
+
+    due = elections.filter(opened_at__isnull=True, start_date__lte=now, end_date__gt=now).order_by('start_date')
+    for election in due:
+        with transaction.atomic():
+            opened = Election.objects.filter(pk=election.pk, opened_at__isnull=True).update(is_active=True,
+                                                                                          opened_at=now)
+            if opened:
+                Election.objects.filter(is_active=True).exclude(pk=election.pk).update(is_active=False)
+        if opened:
+            warm_once(election, timeout=warmup.total_seconds())
+            done['opened'].append(election)
+
+    for election in elections.filter(finalised_at__isnull=True, end_date__lte=now):
+        if finalise(election, now):
+            done['finalised'].append(election)
+    return done
+
+
+def warm_once(election, timeout):
+    """Warm an election's caches unless that already happened under its current cache version."""
+    if not cache.add(cache_key('warmed', election.pk), True, timeout):
+        return False
+    warm(election)
+    return True
+
+
+def finalise(election, now=None):
+    """Close `election` and freeze its tally. Returns False if it was already finalised."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        if not Election.objects.filter(pk=election.pk, finalised_at__isnull=True).update(
+            is_active=False, finalised_at=now
+        ):
+            return False
+        counts = dict(
+            votes_for(election).values('candidate_id').annotate(n=Count('pk')).values_list('candidate_id', 'n')
+        )
+        ballots = votes_for(election).values('voter_id').distinct().count()
+        candidates = CandidateProfile.for_election(election) | CandidateProfile.objects.filter(pk__in=counts)
+        ElectionResult.objects.bulk_create([
+            ElectionResult(
+                election=election,
+                candidate=candidate,
+                candidate_name=f"{candidate.user.first_name} {candidate.user.last_name}".strip()
+                or candidate.user.username,
+                position=candidate.position,
+                votes=counts.get(candidate.pk, 0),
+            )
+            for candidate in candidates.select_related('user')
+        ])
+        Election.objects.filter(pk=election.pk).update(ballots_cast=ballots)
+    election.refresh_from_db()
+    # Live tallies cached while the election ran are superseded by the frozen ones
+    bump_version(election.pk)
+    participation(election, refresh=True)
+    return True
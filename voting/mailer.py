@@ -0,0 +1,215 @@
+"""
+Bulk email, e.g. announcing to an election's electorate that voting is open.
+
+A MailingJob names its recipients by filter rather than by list. send() walks
+them in primary-key pages of `batch_size` (keyset pagination: every page is
+one short indexed query, so no read stays open on the database while mail
+goes out) and hands each page to a pool of `workers` threads.
+
+Each worker thread opens one connection with the configured EMAIL_BACKEND
+and reuses it for every message it sends; a dropped SMTP connection is
+reopened and the message retried once. A token bucket shared by the workers
+caps the rate at `rate` messages per second (0: no cap), so the job stays
+under the mail provider's sending limits.
+
+Pages can finish out of order, so last_user_id only advances past a page once
+every page before it is done. Delivery is at least once: a job stopped in the
+middle of a page resends the pages that were in flight when it resumes.
+"""
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.template import Context, Template
+from django.utils import timezone
+
+from .models import MailingJob
+
+STALE_AFTER = timedelta(minutes=5)
+
+DEFAULT_SUBJECT = 'Voting is open: {{ election }}'
+DEFAULT_BODY = """Hi {{ name }},
+
+Voting in {{ election }} is open until {{ election.end_date|date:"M d, Y H:i" }}.
+Log in to the student voting system to cast your ballot.
+"""
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second, with bursts of up to one second's worth."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def announcement(election, created_by=None, **filters):
+    """Queue a MailingJob telling the electorate of `election` that voting is open."""
+    return MailingJob.objects.create(election=election, subject=DEFAULT_SUBJECT, body=DEFAULT_BODY,
+                                     created_by=created_by, **filters)
+
+
+def pages(job, batch_size):
+    """Recipients after job.last_user_id as lists of (id, email, name), in id order"""
+    users = job.recipients().order_by('pk').values_list('pk', 'email', 'first_name', 'last_name', 'username')
+    after = job.last_user_id
+    while True:
+        page = list(users.filter(pk__gt=after)[:batch_size])
+        if not page:
+            return
+        yield [(pk, email, f'{first} {last}'.strip() or username) for pk, email, first, last, username in page]
+        after = page[-1][0]
+
+
+class _Sender:
+    """Renders and sends pages of messages, one reused backend connection per worker thread."""
+
+    def __init__(self, job, rate):
+        self.job = job
+        self.election = job.election  # loaded here, so the workers never query the database
+        self.subject = Template(job.subject)
+        self.body = Template(job.body)
+        self.limiter = RateLimiter(rate)
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.errors = []
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = get_connection()
+            # Opened explicitly: a backend that opens its own connection closes it after every send_messages()
+            connection.open()
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def message(self, email, name):
+        context = Context({'name': name, 'election': self.election})
+        return EmailMessage(self.subject.render(context).strip(), self.body.render(context),
+                            settings.DEFAULT_FROM_EMAIL, [email])
+
+    def send_page(self, page):
+        """Send one page; returns (sent, failed)."""
+        connection = self.connection()
+        sent = failed = 0
+        for _, email, name in page:
+            message = self.message(email, name)
+            self.limiter.acquire()
+            for attempt in range(2):
+                try:
+                    sent += connection.send_messages([message]) or 0
+                    break
+                except smtplib.SMTPServerDisconnected:
+                    connection.close()
+                    if attempt:
+                        failed += 1
+                    else:
+                        connection.open()
+                except (smtplib.SMTPException, OSError) as e:
+                    failed += 1
+                    with self.lock:
+                        if len(self.errors) < 10:
+                            self.errors.append(f'{email}: {e}')
+                    break
+        return sent, failed
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+def send(job, workers=None, rate=None, batch_size=None, log=lambda message: None):
+    """
+    Send (or resume) `job`. Returns it 'done', or 'paused' if an admin paused it
+    meanwhile; marks it 'failed' and raises on an unexpected error.
+    """
+    workers = workers or settings.MAILER_WORKERS
+    rate = settings.MAILER_RATE if rate is None else rate
+    batch_size = batch_size or settings.MAILER_BATCH_SIZE
+    now = timezone.now()
+    # Claimed with a conditional UPDATE; a running job whose sender died is taken over
+    claimable = Q(status__in=['pending', 'paused', 'failed']) | Q(status='running', heartbeat_at__lt=now - STALE_AFTER)
+    if not MailingJob.objects.filter(claimable, pk=job.pk).update(
+        status='running', started_at=job.started_at or now, heartbeat_at=now, error=''
+    ):
+        raise ValueError(f'Mailing {job.pk} is {job.status}, or being sent by another process.')
+    job.refresh_from_db()
+    if job.total is None:
+        job.total = job.recipients().count()
+        job.save(update_fields=['total'])
+
+    sender = _Sender(job, rate)
+    in_flight = deque()  # (last user id of the page, future), in page order
+    running = True
+
+    def record(last_user_id, sent, failed):
+        nonlocal running
+        job.sent += sent
+        job.failed += failed
+        job.last_user_id = last_user_id
+        # Conditional, so a pause from the admin stops the dispatch loop
+        running = bool(MailingJob.objects.filter(pk=job.pk, status='running').update(
+            sent=job.sent, failed=job.failed, last_user_id=last_user_id, heartbeat_at=timezone.now()
+        ))
+        log(f'{job.sent + job.failed:,}/{job.total:,} handled, {job.failed:,} failed')
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mailer') as pool:
+            try:
+                for page in pages(job, batch_size):
+                    in_flight.append((page[-1][0], pool.submit(sender.send_page, page)))
+                    # Keep every worker busy, but never read far ahead of what has been sent
+                    while in_flight and (len(in_flight) >= 2 * workers or in_flight[0][1].done()):
+                        last_user_id, future = in_flight.popleft()
+                        record(last_user_id, *future.result())
+                    if not running:
+                        break
+            finally:
+                for last_user_id, future in in_flight:
+                    if running:
+                        record(last_user_id, *future.result())
+                    else:
+                        future.cancel()
+    except Exception as e:
+        MailingJob.objects.filter(pk=job.pk).update(status='failed', error=f'{type(e).__name__}: {e}',
+                                                    finished_at=timezone.now())
+        raise
+    finally:
+        sender.close()
+
+    job.error = '\n'.join(sender.errors)
+    if running:
+        job.status = 'done'
+        job.finished_at = timezone.now()
+        MailingJob.objects.filter(pk=job.pk).update(status='done', error=job.error, finished_at=job.finished_at)
+    else:
+        job.refresh_from_db(fields=['status'])
+        MailingJob.objects.filter(pk=job.pk).update(error=job.error)
+    return job
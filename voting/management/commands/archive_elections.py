@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from voting.archive import ArchiveError, archive_election
+from voting.models import Election
+
+
+class Command(BaseCommand):
+    help = 'Move the ballots of finalised elections into compressed archive files (see voting/archive.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_ids', nargs='*', type=int,
+                            help='Elections to archive (default: every finalised election older than --days)')
+        parser.add_argument('--days', type=float, default=30,
+                            help='Archive elections finalised at least this many days ago (default: 30)')
+
+    def handle(self, *args, **options):
+        if options['election_ids']:
+            elections = Election.objects.filter(pk__in=options['election_ids'])
+            missing = set(options['election_ids']) - set(elections.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Election(s) not found: {', '.join(map(str, sorted(missing)))}")
+        else:
+            elections = Election.objects.filter(
+                finalised_at__lte=timezone.now() - timedelta(days=options['days']),
+                archive__isnull=True,
+            )
+
+        failed = 0
+        for election in elections.order_by('pk'):
+            try:
+                archive = archive_election(election)
+            except ArchiveError as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'Skipped "{election.name}": {e}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'Archived "{election.name}": {archive.vote_count:,} votes in {archive.size_bytes:,} bytes '
+                f'({archive.votes_file}); their rows are deleted by `manage.py run_deletion_jobs`'
+            ))
+        if failed:
+            raise CommandError(f'{failed} election(s) could not be archived.')
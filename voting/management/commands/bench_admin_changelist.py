@@ -0,0 +1,72 @@
+from datetime import timedelta
+from urllib.parse import quote
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.utils import timezone
+
+from voting import datagen
+from voting.benchmarks import benchmark_database, measure
+from voting.models import CustomUser, LoginToken
+
+
+class Command(BaseCommand):
+    help = 'Benchmark admin changelist load time for Vote, LoginToken and CustomUser on a large dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help='Number of Vote rows (and LoginToken rows) to seed (default: 1,000,000)')
+        parser.add_argument('--elections', type=int, default=1000,
+                            help='Votes are spread over this many elections (default: 1000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per page (default: 5)')
+        parser.add_argument('--seed', type=int, default=2025, help='Dataset seed (see generate_election_data)')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed(options['rows'], options['elections'], options['seed'])
+
+            admin_user = CustomUser.objects.create_superuser(
+                username='bench-admin', email='bench-admin@example.com', password='x', role='admin'
+            )
+            client = Client()
+            client.force_login(admin_user)
+
+            since = quote((timezone.now() - timedelta(days=7)).isoformat())
+            pages = [
+                '/admin/voting/vote/',
+                '/admin/voting/vote/?p=50',
+                '/admin/voting/vote/?election__id__exact=1',
+                f'/admin/voting/vote/?timestamp__gte={since}',
+                '/admin/voting/logintoken/',
+                '/admin/voting/logintoken/?is_used__exact=1',
+                f'/admin/voting/logintoken/?created_at__gte={since}',
+                '/admin/voting/customuser/',
+                '/admin/voting/customuser/?role__exact=voter',
+            ]
+            self.stdout.write(f'{"page":<55} {"median ms":>10} {"queries":>8}')
+            for url in pages:
+                response = client.get(url)
+                if response.status_code != 200:
+                    self.stdout.write(self.style.ERROR(f'{url}: HTTP {response.status_code}'))
+                    continue
+                ms, queries = measure(lambda: client.get(url), repeat=options['repeat'])
+                self.stdout.write(f'{url:<55} {ms:>10.1f} {queries:>8}')
+
+    def seed(self, rows, election_count, seed):
+        voter_count = max(1, rows // election_count)
+        self.stdout.write(f'Seeding {voter_count * election_count:,} votes and tokens '
+                          f'({voter_count} voters x {election_count} elections)...')
+        # Everyone votes in every election, so the Vote table has exactly `rows` rows
+        datagen.generate(end=timezone.now(), elections=election_count, voters=voter_count, candidates=5,
+                         turnout=1.0, hours=24, seed=seed)
+
+        users = list(CustomUser.objects.filter(role='voter').order_by('pk'))
+        batch = []
+        expires = timezone.now() + timedelta(minutes=15)
+        for i in range(voter_count * election_count):
+            batch.append(LoginToken(user=users[i % voter_count], token=f'bench{i:059d}', expires_at=expires,
+                                    is_used=i % 3 == 0))
+            if len(batch) >= 50000:
+                LoginToken.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+        LoginToken.objects.bulk_create(batch, batch_size=5000)
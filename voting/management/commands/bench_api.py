@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.utils import timezone
+
+from voting import datagen
+from voting.benchmarks import benchmark_database, measure
+from voting.models import CustomUser, VoterProfile
+
+
+class Command(BaseCommand):
+    help = 'Compare the throughput of the JSON API with the HTML pages it replaces for mobile and kiosk clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=20_000, help='Voters in the election (default: 20,000)')
+        parser.add_argument('--candidates', type=int, default=12, help='Candidates on the ballot (default: 12)')
+        parser.add_argument('--positions', type=int, default=3, help='Races on the ballot (default: 3)')
+        parser.add_argument('--repeat', type=int, default=50, help='Requests per endpoint (default: 50)')
+        parser.add_argument('--seed', type=int, default=2025, help='Dataset seed (see generate_election_data)')
+
+    def handle(self, *args, **options):
+        original = settings.WAITING_ROOM_CAPACITY
+        settings.WAITING_ROOM_CAPACITY = 0  # the ballot page is measured, not queued for
+        try:
+            with benchmark_database():
+                cache.clear()
+                self.stdout.write(f'Seeding {options["voters"]:,} voters...')
+                dataset = datagen.generate(end=timezone.now(), voters=options['voters'],
+                                           candidates=options['candidates'], positions=options['positions'],
+                                           turnout=0.5, open_latest=True, seed=options['seed'])
+                self.compare(dataset['elections'][0], options['repeat'])
+        finally:
+            settings.WAITING_ROOM_CAPACITY = original
+
+    def compare(self, election, repeat):
+        admin = CustomUser.objects.create_user(username='bench-admin', email='bench-admin@example.com',
+                                               password='!', role='admin')
+        voter = VoterProfile.objects.filter(has_voted=False).select_related('user').first().user
+        clients = {}
+        for role, user in (('admin', admin), ('voter', voter)):
+            clients[role] = Client()
+            clients[role].force_login(user)
+
+        api = f'/api/elections/{election.pk}'
+        # (what a client wants, who asks, the HTML pages it scrapes, the API request that answers it)
+        cases = [
+            ('results', 'admin', [f'/results/{election.pk}/'], f'{api}/results/'),
+            ('ballot', 'voter', ['/vote/'], f'{api}/ballot/'),
+            ('own status', 'voter', ['/dashboard/'], '/api/me/'),
+            ('ballot + status', 'voter', ['/vote/', '/dashboard/'], '/api/batch/?include=active,ballot,me'),
+            ('results + turnout', 'admin', [f'/results/{election.pk}/'], f'/api/batch/?include=results,turnout'),
+        ]
+        self.stdout.write(f'\n{"":<18} {"HTML ms":>8} {"req/s":>7} {"bytes":>8} {"queries":>7}   '
+                          f'{"API ms":>7} {"req/s":>7} {"bytes":>7} {"queries":>7} {"speed-up":>8}')
+        for label, role, pages, endpoint in cases:
+            client = clients[role]
+            html_ms = html_queries = html_bytes = 0
+            for page in pages:
+                response = client.get(page)
+                if response.status_code != 200:
+                    self.stdout.write(self.style.ERROR(f'{page}: HTTP {response.status_code}'))
+                    return
+                ms, queries = measure(lambda: client.get(page), repeat=repeat)
+                html_ms, html_queries, html_bytes = html_ms + ms, html_queries + queries, html_bytes + len(response.content)
+            response = client.get(endpoint)
+            if response.status_code != 200:
+                self.stdout.write(self.style.ERROR(f'{endpoint}: HTTP {response.status_code}'))
+                return
+            api_ms, api_queries = measure(lambda: client.get(endpoint), repeat=repeat)
+            self.stdout.write(
+                f'{label:<18} {html_ms:>8.2f} {1000 / html_ms:>7,.0f} {html_bytes:>8,} {html_queries:>7}   '
+                f'{api_ms:>7.2f} {1000 / api_ms:>7,.0f} {len(response.content):>7,} {api_queries:>7} '
+                f'{html_ms / api_ms:>7.1f}x'
+            )
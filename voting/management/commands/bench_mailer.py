@@ -0,0 +1,134 @@
+import multiprocessing
+import socketserver
+import time
+
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from voting import datagen, mailer
+from voting.benchmarks import benchmark_database
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Local SMTP stand-in: accepts every message and counts it, after `latency` seconds per message."""
+    daemon_threads = True
+
+    def __init__(self, latency, messages, connections):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.latency = latency
+        self.messages = messages  # multiprocessing.Value counters, read by the benchmark
+        self.connections = connections
+
+
+def _serve(latency, messages, connections, ports):
+    # In its own process, so the stand-in does not compete with the mailer for the GIL
+    sink = SMTPSink(latency, messages, connections)
+    ports.put(sink.server_address[1])
+    sink.serve_forever()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True  # replies are tiny; don't hold them back for the client's delayed ACK
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.connections.get_lock():
+            server.connections.value += 1
+        self.reply('220 sink ESMTP')
+        while line := self.rfile.readline():
+            command = line[:4].upper()
+            if command == b'EHLO':
+                self.reply('250-sink\r\n250 8BITMIME')
+            elif command == b'DATA':
+                self.reply('354 end with <CRLF>.<CRLF>')
+                while (line := self.rfile.readline()) and line != b'.\r\n':
+                    pass
+                if server.latency:
+                    time.sleep(server.latency)
+                with server.messages.get_lock():
+                    server.messages.value += 1
+                self.reply('250 queued')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:  # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply('250 ok')
+
+
+class Command(BaseCommand):
+    help = 'Mail a generated electorate through a local SMTP stand-in: one send_mail per voter vs voting/mailer.py'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=50_000, help='Eligible voters to mail (default: 50,000)')
+        parser.add_argument('--workers', type=int, default=8, help='Mailer worker threads (default: 8)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Recipients per batch (default: 200)')
+        parser.add_argument('--rate', type=float, default=0, help='Mailer rate cap per second (default: none)')
+        parser.add_argument('--smtp-latency', type=float, default=10,
+                            help='Milliseconds the stand-in server spends accepting each message (default: 10)')
+        parser.add_argument('--baseline', type=int, default=2000,
+                            help='Voters mailed one send_mail at a time, to extrapolate from (default: 2000)')
+        parser.add_argument('--seed', type=int, default=2025, help='Dataset seed (see generate_election_data)')
+
+    def handle(self, *args, **options):
+        self.messages, self.connections = multiprocessing.Value('l'), multiprocessing.Value('l')
+        ports = multiprocessing.Queue()
+        sink = multiprocessing.Process(target=_serve, daemon=True, args=(
+            options['smtp_latency'] / 1000, self.messages, self.connections, ports
+        ))
+        sink.start()
+        self.port = ports.get(timeout=10)
+        try:
+            with benchmark_database(), override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.port, EMAIL_USE_TLS=False, EMAIL_TIMEOUT=10,
+            ):
+                self.run(options)
+        finally:
+            sink.terminate()
+            sink.join()
+
+    def run(self, options):
+        started = time.perf_counter()
+        dataset = datagen.generate(end=timezone.now(), voters=options['voters'], candidates=1, turnout=0,
+                                   open_latest=True, seed=options['seed'])
+        election = dataset['elections'][0]
+        electorate = election.eligible_voters().count()
+        self.stdout.write(f'{electorate:,} eligible voters generated in {time.perf_counter() - started:.1f}s; '
+                          f'SMTP stand-in on port {self.port} taking {options["smtp_latency"]:g} ms per message')
+
+        # Before: what a view looping over send_mail does, a new connection per message
+        emails = list(election.eligible_voters().order_by('pk').values_list('email', flat=True)[:options['baseline']])
+        self.reset()
+        started = time.perf_counter()
+        for email in emails:
+            send_mail('Voting is open', 'Log in to cast your ballot.', None, [email])
+        baseline = time.perf_counter() - started
+        baseline_rate = len(emails) / baseline
+        self.stdout.write(self.style.MIGRATE_HEADING('send_mail per voter'))
+        self.stdout.write(f'  {self.messages.value:,} messages over {self.connections.value:,} connections in {baseline:.2f}s '
+                          f'({baseline_rate:,.0f}/s); all {electorate:,} would take {electorate / baseline_rate:.0f}s')
+
+        # After: the bulk mailer
+        job = mailer.announcement(election)
+        self.reset()
+        started = time.perf_counter()
+        job = mailer.send(job, workers=options['workers'], rate=options['rate'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"bulk mailer ({options['workers']} workers, batches of {options['batch_size']}, "
+            f"rate cap {options['rate'] or 'none'})"
+        ))
+        self.stdout.write(f'  {job.sent:,} sent, {job.failed:,} failed; the stand-in received {self.messages.value:,} '
+                          f'messages over {self.connections.value:,} connections')
+        self.stdout.write(f'  {elapsed:.2f}s ({job.sent / elapsed:,.0f}/s), '
+                          f'{electorate / baseline_rate / elapsed:.1f}x faster than send_mail per voter')
+        if job.sent != electorate or self.messages.value != electorate:
+            self.stdout.write(self.style.ERROR('  not every voter was mailed exactly once'))
+
+    def reset(self):
+        self.messages.value = self.connections.value = 0
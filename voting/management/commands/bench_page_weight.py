@@ -0,0 +1,142 @@
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+from collections import Counter
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from voting import datagen
+from voting.benchmarks import benchmark_database
+from voting.models import CustomUser, VoterProfile
+
+PAGES = [
+    (None, '/login/'),
+    (None, '/register/'),
+    ('voter', '/dashboard/'),
+    ('voter', '/vote/'),
+    ('candidate', '/candidate/dashboard/'),
+    ('candidate', '/candidate/profile/'),
+    ('admin', '/results/'),  # voters only see results once the election has ended
+    ('admin', '/admin-panel/'),
+    ('admin', '/manage-elections/'),
+]
+
+
+class PageParser(HTMLParser):
+    """Inline <style>/<script> bytes and the stylesheets, scripts and images a page loads"""
+
+    def __init__(self):
+        super().__init__()
+        self.inline = Counter()
+        self.resources = []
+        self.current = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'link' and 'stylesheet' in (attrs.get('rel') or '').split():
+            self.resources.append(attrs.get('href'))
+        elif tag in ('script', 'img') and attrs.get('src'):
+            self.resources.append(attrs['src'])
+        elif tag in ('style', 'script'):
+            self.current = tag
+
+    def handle_endtag(self, tag):
+        if tag == self.current:
+            self.current = None
+
+    def handle_data(self, data):
+        if self.current:
+            self.inline[self.current] += len(data.encode())
+
+
+class Command(BaseCommand):
+    help = ('Report what each page weighs: its HTML, inline CSS/JS, the static assets it loads (as WhiteNoise '
+            'serves them after collectstatic) and its third-party requests')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=200, help='Voters in the election (default: 200)')
+        parser.add_argument('--seed', type=int, default=2025, help='Dataset seed (see generate_election_data)')
+
+    def handle(self, *args, **options):
+        static_root = tempfile.mkdtemp(prefix='bench-page-weight-')
+        request_log = logging.getLogger('django.request')
+        request_log.disabled = True
+        try:
+            # Collect into a scratch STATIC_ROOT, so the assets are fingerprinted,
+            # compressed and cached exactly as a deployment (DEBUG off) serves them
+            with override_settings(STATIC_ROOT=static_root, DEBUG=False), benchmark_database():
+                call_command('collectstatic', interactive=False, verbosity=0)
+                clients = self.clients(options)
+                self.report(clients, static_root)
+        finally:
+            request_log.disabled = False
+            shutil.rmtree(static_root, ignore_errors=True)
+
+    def clients(self, options):
+        dataset = datagen.generate(end=timezone.now(), voters=options['voters'], candidates=4, turnout=0.5,
+                                   open_latest=True, seed=options['seed'])
+        election = dataset['elections'][0]
+        users = {
+            'voter': VoterProfile.objects.filter(has_voted=False).select_related('user').first().user,
+            'candidate': dataset['candidates'][election.pk][0].user,
+            'admin': CustomUser.objects.create_user(username='bench-admin', email='bench-admin@example.com',
+                                                    password='!', role='admin'),
+        }
+        clients = {None: Client()}
+        for role, user in users.items():
+            clients[role] = Client()
+            clients[role].force_login(user)
+        return clients
+
+    def report(self, clients, static_root):
+        assets = {}
+        external = Counter()
+        self.stdout.write(f'{"page":<24} {"HTML":>8} {"gzip":>7} {"inline CSS":>11} {"inline JS":>10} '
+                          f'{"assets":>7} {"3rd-party":>10}')
+        html_total = html_gzip_total = pages = 0
+        for role, url in PAGES:
+            response = clients[role].get(url)
+            if response.status_code != 200:
+                self.stdout.write(self.style.ERROR(f'{url}: HTTP {response.status_code}'))
+                continue
+            parser = PageParser()
+            parser.feed(response.content.decode())
+            local = [src for src in parser.resources if src.startswith(settings.STATIC_URL)]
+            third_party = [src for src in parser.resources if urlsplit(src).netloc]
+            for src in local:
+                assets.setdefault(src, clients[None])
+            external.update(urlsplit(src).netloc for src in third_party)
+            html, html_gzip = len(response.content), len(gzip.compress(response.content))
+            pages += 1
+            html_total += html
+            html_gzip_total += html_gzip
+            self.stdout.write(f'{url:<24} {html:>8,} {html_gzip:>7,} {parser.inline["style"]:>11,} '
+                              f'{parser.inline["script"]:>10,} {len(local):>7} {len(third_party):>10}')
+
+        asset_total = 0
+        if assets:
+            self.stdout.write(f'\n{"asset":<60} {"bytes":>8} {"sent":>7}  cache-control')
+        for src, client in sorted(assets.items()):
+            response = client.get(src, HTTP_ACCEPT_ENCODING='gzip, br')
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            asset_total += len(body)
+            raw = os.path.getsize(os.path.join(static_root, src[len(settings.STATIC_URL):]))
+            self.stdout.write(f'{src:<60} {raw:>8,} {len(body):>7,}  {response.get("Cache-Control", "-")}')
+
+        self.stdout.write(f'\nFirst visit to every page: {html_gzip_total + asset_total:,} bytes from this server '
+                          f'({html_gzip_total:,} of HTML, gzipped, and {asset_total:,} of assets)')
+        self.stdout.write(f'Every later page view: {html_gzip_total // max(pages, 1):,} bytes on average '
+                          f'(the HTML; {html_total // max(pages, 1):,} uncompressed)')
+        if external:
+            hosts = ', '.join(f'{host} x{count}' for host, count in external.most_common())
+            self.stdout.write(self.style.WARNING(f'Third-party requests: {sum(external.values())} ({hosts})'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Third-party requests: none'))
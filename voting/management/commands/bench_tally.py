@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from voting import datagen
+from voting.models import RankedBallot
+from voting.tally import count, decode_rankings, to_columns
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the NumPy instant-runoff/STV tally on synthetic ranked ballots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ballots', type=int, default=1_000_000, help='Ballots to generate (default: 1,000,000)')
+        parser.add_argument('--candidates', type=int, default=12, help='Candidates on the ballot (default: 12)')
+        parser.add_argument('--seats', type=int, default=3, help='Seats for the STV run (default: 3)')
+        parser.add_argument('--seed', type=int, default=2025)
+        parser.add_argument('--skip-python', action='store_true',
+                            help='Skip the per-ballot pure Python instant-runoff baseline')
+
+    def handle(self, *args, **options):
+        n, k = options['ballots'], min(options['candidates'], RankedBallot.MAX_RANKS)
+        candidate_ids = list(range(101, 101 + k))
+        self.stdout.write(f'Generating {n:,} ballots over {k} candidates...')
+        # Same preference model as generate_election_data's ranked elections
+        blobs = datagen.ranked_blobs(np.random.default_rng(options['seed']), n, candidate_ids)
+
+        started = time.perf_counter()
+        ballots = to_columns(decode_rankings(blobs), candidate_ids)
+        decode_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        irv = count(ballots, k, majority=True)
+        irv_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        stv = count(ballots, k, seats=options['seats'])
+        stv_ms = (time.perf_counter() - started) * 1000
+
+        self.stdout.write(f'{"step":<34} {"ms":>10} {"rounds":>7}')
+        self.stdout.write(f'{"decode ranking blobs":<34} {decode_ms:>10.1f} {"":>7}')
+        self.stdout.write(f'{"instant runoff (NumPy)":<34} {irv_ms:>10.1f} {len(irv["rounds"]):>7}')
+        self.stdout.write(f'{"STV, " + str(options["seats"]) + " seats (NumPy)":<34} {stv_ms:>10.1f} '
+                          f'{len(stv["rounds"]):>7}')
+
+        if not options['skip_python']:
+            started = time.perf_counter()
+            winner = self.python_irv(ballots.tolist(), k)
+            python_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'{"instant runoff (Python loop)":<34} {python_ms:>10.1f}')
+            if winner != irv['elected'][0]:
+                self.stdout.write(self.style.ERROR(f'Winner mismatch: NumPy {irv["elected"]}, Python {winner}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Same winner; NumPy is {python_ms / irv_ms:.0f}x faster'))
+
+    def python_irv(self, ballots, k):
+        """Textbook per-ballot instant runoff, for comparison."""
+        eliminated = set()
+        while True:
+            tallies = dict.fromkeys(set(range(k)) - eliminated, 0)
+            for ballot in ballots:
+                for column in ballot:
+                    if column == -1:
+                        break
+                    if column in tallies:
+                        tallies[column] += 1
+                        break
+            total = sum(tallies.values())
+            leader = max(tallies, key=tallies.get)
+            if tallies[leader] * 2 > total or len(tallies) == 1:
+                return leader
+            eliminated.add(min(tallies, key=lambda c: (tallies[c], -c)))
@@ -0,0 +1,137 @@
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+from voting import datagen
+from voting.benchmarks import benchmark_database
+from voting.models import VoterProfile, Vote, LoginToken
+from voting.sharding import drop_shard, vote_db
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent ballot throughput on one SQLite file against per-election shards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--elections', type=int, default=4, help='Concurrent elections (default: 4)')
+        parser.add_argument('--voters', type=int, default=500, help='Ballots per election (default: 500)')
+        parser.add_argument('--threads', type=int, default=4, help='Ballot threads per election (default: 4)')
+        parser.add_argument('--seed', type=int, default=2025, help='Dataset seed (see generate_election_data)')
+        parser.add_argument('--token-threads', type=int, default=2,
+                            help='Threads issuing login tokens meanwhile (default: 2)')
+
+    def handle(self, *args, **options):
+        original_shard_dir = settings.VOTE_SHARD_DIR
+        workdir = tempfile.mkdtemp(prefix='bench-shards-')
+        try:
+            for layout in ('single file', 'sharded'):
+                settings.VOTE_SHARD_DIR = os.path.join(workdir, 'shards') if layout == 'sharded' else ''
+                db_name = os.path.join(workdir, f"{layout.replace(' ', '_')}.sqlite3")
+                with benchmark_database(name=db_name):
+                    stats = self.run_layout(options)
+                    for election_id in stats.pop('election_ids'):
+                        drop_shard(election_id)
+                self.report(layout, stats)
+        finally:
+            settings.VOTE_SHARD_DIR = original_shard_dir
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run_layout(self, options):
+        per_election = options['voters']
+        # The electorate only: the benchmark casts the ballots itself
+        dataset = datagen.generate(end=timezone.now(), elections=options['elections'],
+                                   voters=per_election * options['elections'], candidates=1, turnout=0,
+                                   open_latest=True, seed=options['seed'])
+        elections = dataset['elections']
+        candidates = {election_id: profiles[0] for election_id, profiles in dataset['candidates'].items()}
+        voters = list(VoterProfile.objects.select_related('user').order_by('pk'))
+        users = [voter.user for voter in voters]
+        for election in elections:
+            vote_db(election.id)  # create shards up front so migrations are not timed
+
+        latencies, lock_retries, token_count = [], [0], [0]
+        guard = threading.Lock()
+        stop_tokens = threading.Event()
+
+        def cast(election, voter_slice):
+            try:
+                for voter in voter_slice:
+                    committed = []
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            with transaction.atomic(using=vote_db(election.id)):
+                                # Registered first, so it runs right at commit and
+                                # before Vote.save()'s own counter updates
+                                transaction.on_commit(lambda: committed.append(time.perf_counter()),
+                                                      using=vote_db(election.id))
+                                Vote(voter=voter, candidate=candidates[election.id], election=election).save()
+                            break
+                        except OperationalError:
+                            with guard:
+                                lock_retries[0] += 1
+                            time.sleep(0.005)
+                    finished = time.perf_counter()
+                    with guard:
+                        latencies.append(((committed[-1] - started) * 1000, (finished - started) * 1000))
+            finally:
+                connections.close_all()
+
+        def issue_tokens():
+            try:
+                i = 0
+                while not stop_tokens.is_set():
+                    try:
+                        LoginToken.create_token(users[i % len(users)])
+                        with guard:
+                            token_count[0] += 1
+                    except OperationalError:
+                        with guard:
+                            lock_retries[0] += 1
+                    i += 1
+            finally:
+                connections.close_all()
+
+        ballot_threads = []
+        for n, election in enumerate(elections):
+            mine = voters[n * per_election:(n + 1) * per_election]
+            for t in range(options['threads']):
+                ballot_threads.append(threading.Thread(target=cast, args=(election, mine[t::options['threads']])))
+        token_threads = [threading.Thread(target=issue_tokens) for _ in range(options['token_threads'])]
+
+        started = time.perf_counter()
+        for thread in token_threads + ballot_threads:
+            thread.start()
+        for thread in ballot_threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop_tokens.set()
+        for thread in token_threads:
+            thread.join()
+
+        return {
+            'ballots': len(latencies),
+            'elapsed': elapsed,
+            'latencies': latencies,
+            'lock_retries': lock_retries[0],
+            'tokens': token_count[0],
+            'election_ids': [e.id for e in elections],
+        }
+
+    def report(self, layout, stats):
+        self.stdout.write(self.style.MIGRATE_HEADING(layout))
+        self.stdout.write(f"  ballots:        {stats['ballots']} in {stats['elapsed']:.2f}s "
+                          f"({stats['ballots'] / stats['elapsed']:.0f}/s)")
+        for label, column in (('ballot commit', 0), ('incl. counters', 1)):
+            latencies = sorted(row[column] for row in stats['latencies'])
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(f"  {label + ':':<15} median {statistics.median(latencies):.1f} ms, p95 {p95:.1f} ms")
+        self.stdout.write(f"  token writes:   {stats['tokens']} ({stats['tokens'] / stats['elapsed']:.0f}/s)")
+        self.stdout.write(f"  lock retries:   {stats['lock_retries']}")
@@ -0,0 +1,130 @@
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.utils import timezone
+
+from voting import admission
+from voting import datagen
+from voting.benchmarks import benchmark_database
+from voting.models import CustomUser, Vote
+
+
+class Command(BaseCommand):
+    help = 'Simulate an election-open rush on the ballot pages with and without the waiting room'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=300, help='Voters arriving at once (default: 300)')
+        parser.add_argument('--capacity', type=int, default=16,
+                            help='Starting waiting room capacity (default: 16)')
+        parser.add_argument('--target-p95', type=int, default=250,
+                            help='Target p95 latency of ballot requests in ms (default: 250)')
+        parser.add_argument('--seed', type=int, default=2025, help='Dataset seed (see generate_election_data)')
+        parser.add_argument('--poll', type=float, default=0.05,
+                            help='Seconds between a waiting voter\'s status polls (default: 0.05)')
+
+    def handle(self, *args, **options):
+        original = settings.WAITING_ROOM_CAPACITY, settings.WAITING_ROOM_TARGET_P95_MS
+        settings.WAITING_ROOM_TARGET_P95_MS = options['target_p95']
+        workdir = tempfile.mkdtemp(prefix='bench-waiting-room-')
+        request_log = logging.getLogger('django.request')
+        request_log.disabled = True  # the failures are counted, not printed
+        try:
+            for label, capacity in (('no waiting room', 0), ('waiting room', options['capacity'])):
+                settings.WAITING_ROOM_CAPACITY = capacity
+                cache.clear()
+                with benchmark_database(name=os.path.join(workdir, f"{label.replace(' ', '_')}.sqlite3")):
+                    stats = self.rush(options)
+                self.report(label, stats)
+        finally:
+            settings.WAITING_ROOM_CAPACITY, settings.WAITING_ROOM_TARGET_P95_MS = original
+            request_log.disabled = False
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def rush(self, options):
+        dataset = datagen.generate(end=timezone.now(), voters=options['voters'], candidates=1, turnout=0,
+                                   open_latest=True, seed=options['seed'])
+        election = dataset['elections'][0]
+        candidate = dataset['candidates'][election.pk][0]
+        users = CustomUser.objects.filter(role='voter').order_by('pk')
+        clients = []
+        for user in users:
+            # Failed requests come back as 500s to count, not exceptions
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            clients.append(client)
+        connections.close_all()
+
+        ballot_ms, waits, failures, polls, inside = [], [], [0], [0], [0, 0]  # inside: now, peak
+        guard = threading.Lock()
+        gate = threading.Barrier(len(clients))
+
+        def vote(client):
+            try:
+                gate.wait()
+                arrived = time.perf_counter()
+                response = client.get('/vote/')
+                while self.waiting(response):
+                    time.sleep(options['poll'])
+                    with guard:
+                        polls[0] += 1
+                    if client.get('/waiting-room/status/').json()['admitted']:
+                        response = client.get('/vote/')
+                admitted = time.perf_counter()
+                with guard:
+                    inside[0] += 1
+                    inside[1] = max(inside)
+                response = client.post('/submit-vote/', {'candidate_1': candidate.id})
+                finished = time.perf_counter()
+                with guard:
+                    inside[0] -= 1
+                    waits.append((admitted - arrived) * 1000)
+                    ballot_ms.append((finished - admitted) * 1000)
+                    if response.status_code != 200:
+                        failures[0] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=vote, args=(client,)) for client in clients]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'ballots': Vote.objects.filter(election=election).count(),
+            'elapsed': elapsed,
+            'ballot_ms': ballot_ms,
+            'waits': waits,
+            'failures': failures[0],
+            'polls': polls[0],
+            'peak_inside': inside[1],
+            'room': admission.stats() if admission.enabled() else None,
+        }
+
+    def waiting(self, response):
+        return any(t.name == 'voting/waiting_room.html' for t in response.templates)
+
+    def report(self, label, stats):
+        def summary(samples):
+            return f"median {statistics.median(samples):.1f} ms, p95 {admission.percentile(samples, 95):.1f} ms"
+
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(f"  ballots:        {stats['ballots']} in {stats['elapsed']:.2f}s "
+                          f"({stats['ballots'] / stats['elapsed']:.0f}/s), {stats['failures']} failed")
+        self.stdout.write(f"  ballot pages:   {summary(stats['ballot_ms'])}")
+        self.stdout.write(f"  queue wait:     {summary(stats['waits'])} ({stats['polls']} status polls)")
+        self.stdout.write(f"  peak on ballot: {stats['peak_inside']} voters")
+        if stats['room']:
+            self.stdout.write(f"  capacity now:   {stats['room']['capacity']}")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.bundles import BUNDLES, SOURCE_DIR, build, output_dir, stale
+
+
+class Command(BaseCommand):
+    help = 'Build the minified CSS and JavaScript bundles in static/voting/ from their sources in assets/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report whether the built bundles are up to date; exit 1 if not')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            outdated = stale()
+            if outdated:
+                raise CommandError(f'Out of date: {", ".join(outdated)}. Run manage.py build_assets.')
+            self.stdout.write(self.style.SUCCESS('All bundles are up to date.'))
+            return
+
+        for bundle, sources in BUNDLES.items():
+            content = build(bundle)
+            path = output_dir() / bundle
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content, encoding='utf-8')
+            source_bytes = sum((SOURCE_DIR / source).stat().st_size for source in sources)
+            self.stdout.write(f'{bundle}: {len(sources)} source(s), {source_bytes:,} -> '
+                              f'{len(content.encode()):,} bytes')
+        self.stdout.write(self.style.SUCCESS('Run collectstatic to fingerprint and compress them for deployment.'))
@@ -17,12 +17,11 @@ class Command(BaseCommand):
 
         # Create an active election
         election = Election.objects.create(
-            title='Student Council Election 2025',
-            description='Vote for your student representatives for the academic year 2025-26',
+            name='Student Council Election 2025',
             start_date=timezone.now(),
             end_date=timezone.now() + timedelta(days=3)
         )
-        self.stdout.write(self.style.SUCCESS(f'✓ Created election: {election.title}'))
+        self.stdout.write(self.style.SUCCESS(f'✓ Created election: {election.name}'))
 
         # Create candidate users and profiles
         candidates_data = [
@@ -77,22 +76,24 @@ class Command(BaseCommand):
                 last_name=data['last_name']
             )
             
-            # Create candidate profile
-            CandidateProfile.objects.create(
+            # The post_save signal already created the profile; fill in the race
+            CandidateProfile.objects.update_or_create(
                 user=user,
-                election=election,
-                position=data['position'],
-                slogan=data['slogan'],
-                manifesto=data['manifesto']
+                defaults={
+                    'election': election,
+                    'position': data['position'],
+                    'slogan': data['slogan'],
+                    'manifesto': data['manifesto'],
+                }
             )
             
             self.stdout.write(self.style.SUCCESS(f'✓ Created candidate: {data["first_name"]} {data["last_name"]} ({data["position"]})'))
 
         # Create sample voters
         voters_data = [
-            {'name': 'John Doe', 'email': 'john.doe@student.edu', 'branch': 'Computer Science', 'year': 2},
-            {'name': 'Jane Smith', 'email': 'jane.smith@student.edu', 'branch': 'Mechanical Engineering', 'year': 3},
-            {'name': 'Mike Brown', 'email': 'mike.brown@student.edu', 'branch': 'Electronics', 'year': 1},
+            {'name': 'John Doe', 'email': 'john.doe@student.edu', 'branch': 'CSE', 'year': '2'},
+            {'name': 'Jane Smith', 'email': 'jane.smith@student.edu', 'branch': 'ME', 'year': '3'},
+            {'name': 'Mike Brown', 'email': 'mike.brown@student.edu', 'branch': 'ECE', 'year': '1'},
         ]
 
         for data in voters_data:
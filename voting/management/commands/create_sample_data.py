@@ -47,10 +47,8 @@ class Command(BaseCommand):
             if created:
                 user.set_password('password123')
                 user.save()
-                voter_profile = VoterProfile.objects.create(
-                    user=user,
-                    email_verified=True
-                )
+                # The post_save signal already created the profile
+                VoterProfile.objects.update_or_create(user=user, defaults={'email_verified': True})
                 self.stdout.write(f'Created voter: {email} / password123')
         
         # Create sample candidates
@@ -73,10 +71,7 @@ class Command(BaseCommand):
             if created:
                 user.set_password('password123')
                 user.save()
-                candidate_profile = CandidateProfile.objects.create(
-                    user=user,
-                    manifesto=manifesto
-                )
+                CandidateProfile.objects.update_or_create(user=user, defaults={'manifesto': manifesto})
                 self.stdout.write(f'Created candidate: {email} / password123')
         
         # Create sample election
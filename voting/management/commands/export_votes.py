@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.exports import EXPORT_FORMATS, RESULT_FIELDS, VOTE_FIELDS, encode, result_rows, vote_rows
+from voting.models import Election
+
+
+class Command(BaseCommand):
+    help = 'Stream an audit export of the votes (or results) of one election'
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_id', type=int)
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--results', action='store_true', help='Export per-candidate totals instead of votes')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output on the fly')
+        parser.add_argument('--after', type=int, default=None,
+                            help='Resume after this vote id (the last vote_id of a previous export)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per query (default: 2000)')
+        parser.add_argument('--database', default='default',
+                            help='Database to read voters and candidates from, e.g. replica (default: default)')
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            election = Election.objects.get(id=options['election_id'])
+        except Election.DoesNotExist:
+            raise CommandError(f"Election {options['election_id']} not found.")
+
+        if options['results']:
+            rows, fields = result_rows(election, using=options['database']), RESULT_FIELDS
+        else:
+            rows = vote_rows(election, after=options['after'], using=options['database'],
+                             chunk_size=options['chunk_size'])
+            fields = VOTE_FIELDS
+
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in encode(rows, fields, fmt=options['format'], compress=options['gzip']):
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written:,} bytes to {options['output']}"))
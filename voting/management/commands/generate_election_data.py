@@ -0,0 +1,64 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from voting import datagen
+from voting.models import CustomUser, Election
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic, production-sized synthetic election dataset (see voting/datagen.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--elections', type=int, default=1, help='Elections, run back to back (default: 1)')
+        parser.add_argument('--voters', type=int, default=10_000, help='Voters (default: 10,000)')
+        parser.add_argument('--candidates', type=int, default=4, help='Candidates per election (default: 4)')
+        parser.add_argument('--positions', type=int, default=1,
+                            help='Races per election; candidates are spread over them (default: 1)')
+        parser.add_argument('--method', choices=[m for m, _ in Election.VOTING_METHOD_CHOICES], default='fptp')
+        parser.add_argument('--seats', type=int, default=1, help='Seats, for --method stv (default: 1)')
+        parser.add_argument('--turnout', type=float, default=0.6,
+                            help='Share of voters casting a ballot in each election (default: 0.6)')
+        parser.add_argument('--curve', choices=sorted(datagen.CURVES), default='rush',
+                            help='When in the voting window ballots are cast (default: rush)')
+        parser.add_argument('--hours', type=float, default=48, help='Length of each election (default: 48)')
+        parser.add_argument('--branches', help='Branch mix, e.g. CSE=40,ECE=30,ME=30 (default: a typical intake)')
+        parser.add_argument('--years', help='Year of study mix, e.g. 1=30,2=25,3=25,4=20')
+        parser.add_argument('--open', action='store_true', help='Leave the newest election open')
+        parser.add_argument('--end', help='When the newest election ends, as ISO 8601 (default: the current hour). '
+                                          'Fix it to reproduce the exact same timestamps.')
+        parser.add_argument('--seed', type=int, default=2025)
+        parser.add_argument('--prefix', default='gen', help='Username/email prefix of generated users (default: gen)')
+
+    def handle(self, *args, **options):
+        if options['end']:
+            end = datetime.fromisoformat(options['end'])
+            if timezone.is_naive(end):
+                end = timezone.make_aware(end)
+        else:
+            end = timezone.now().replace(minute=0, second=0, microsecond=0)
+        if CustomUser.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users prefixed {options['prefix']!r} already exist; pass another --prefix.")
+
+        try:
+            branches = (datagen.parse_distribution(options['branches'], CustomUser.BRANCH_CHOICES)
+                        if options['branches'] else datagen.BRANCHES)
+            years = (datagen.parse_distribution(options['years'], CustomUser.YEAR_CHOICES)
+                     if options['years'] else datagen.YEARS)
+            started = time.perf_counter()
+            dataset = datagen.generate(
+                end=end, elections=options['elections'], voters=options['voters'],
+                candidates=options['candidates'], positions=options['positions'], method=options['method'],
+                seats=options['seats'], turnout=options['turnout'], curve=options['curve'], hours=options['hours'],
+                branches=branches, years=years, open_latest=options['open'], seed=options['seed'],
+                prefix=options['prefix'], log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(dataset['elections'])} election(s), {dataset['voters']:,} voters and "
+            f"{dataset['ballots']:,} ballots in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,83 @@
+import gzip
+import json
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.kiosk import MAX_BATCH, payload, record_report
+from voting.models import QueuedBallot
+
+
+class Command(BaseCommand):
+    help = "Send this kiosk's queued ballots to the election server in bulk and record its reconciliation report"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help=f'Ballots per request (default: 2000, at most {MAX_BATCH})')
+        parser.add_argument('--url', default='', help='Server to sync to (default: settings.KIOSK_SERVER_URL)')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds between attempts while the server is unreachable or ballots keep '
+                                 'coming (default: 30)')
+        parser.add_argument('--once', action='store_true', help='Sync what is queued and exit')
+
+    def handle(self, *args, **options):
+        if not settings.KIOSK_ID or not settings.KIOSK_SECRET:
+            raise CommandError('Set KIOSK_ID and KIOSK_SECRET on the kiosk first.')
+        url = (options['url'] or settings.KIOSK_SERVER_URL).rstrip('/')
+        if not url:
+            raise CommandError('Set KIOSK_SERVER_URL or pass --url.')
+        batch_size = min(options['batch_size'], MAX_BATCH)
+        while True:
+            try:
+                self.sync(f'{url}/kiosk/ballots/', batch_size)
+            except (urllib.error.URLError, OSError) as e:
+                if options['once']:
+                    raise CommandError(f'Server unreachable: {e}; the ballots stay queued.')
+                self.stdout.write(self.style.WARNING(f'Server unreachable: {e}; retrying in {options["interval"]:g}s'))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, url, batch_size):
+        after = 0
+        while True:
+            ballots = list(QueuedBallot.objects.filter(status='queued', pk__gt=after).order_by('pk')[:batch_size])
+            if not ballots:
+                return
+            after = ballots[-1].pk
+            body = gzip.compress(json.dumps({
+                'kiosk': settings.KIOSK_ID, 'ballots': [payload(ballot) for ballot in ballots],
+            }).encode())
+            started = time.perf_counter()
+            report = self.post(url, body)
+            elapsed = time.perf_counter() - started
+            missing = record_report(ballots, report)
+            line = (f"batch {report['batch']}: {report['received']:,} sent in {elapsed:.2f}s; "
+                    f"{report['accepted']:,} accepted, {report['duplicate']:,} duplicate, "
+                    f"{report['rejected']:,} rejected ({report['resent']:,} already synced before)")
+            self.stdout.write(self.style.SUCCESS(line) if not missing else self.style.WARNING(line))
+            for result in report['results']:
+                if result['status'] != 'accepted':
+                    self.stdout.write(f"  {result['ballot_id']}: {result['status']}, {result['detail']}")
+            if missing:
+                self.stdout.write(self.style.WARNING(f'  {len(missing)} ballot(s) missing from the report stay queued'))
+
+    def post(self, url, body):
+        """The server's report for one gzipped batch"""
+        request = urllib.request.Request(url, data=body, method='POST', headers={
+            'Content-Type': 'application/json', 'Content-Encoding': 'gzip',
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code >= 500:
+                raise  # retried like an unreachable server
+            try:
+                error = json.load(e)['error']
+            except (ValueError, KeyError):
+                error = e.reason
+            raise CommandError(f'The server refused the batch ({e.code}): {error}')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from voting.ledger import append_pending, elections_to_append
+from voting.models import Election
+
+
+class Command(BaseCommand):
+    help = 'Append newly accepted ballots to the election vote ledgers in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--election', type=int,
+                            help='Only this election (default: active elections, and closed ones whose ledger is behind)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Ballots per ledger transaction (default: 1000)')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, polling every INTERVAL seconds (default: run once)')
+
+    def handle(self, *args, **options):
+        while True:
+            if options['election']:
+                elections = Election.objects.filter(id=options['election'])
+            else:
+                elections = elections_to_append()
+            for election in elections:
+                total = 0
+                while True:
+                    added = append_pending(election, batch_size=options['batch_size'])
+                    total += added
+                    if added < options['batch_size']:
+                        break
+                if total:
+                    self.stdout.write(f'{election.name}: appended {total} ballots')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.models import CustomUser
+from voting.profiling import TOKEN_TIMEOUT, make_token
+
+
+class Command(BaseCommand):
+    help = 'Print an X-Profile header value that makes requests get profiled (see voting/profiling.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the admin the profiles are recorded for')
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.filter(email=options['email']).first()
+        if user is None or user.role != 'admin':
+            raise CommandError(f"No admin with email {options['email']}.")
+        token = make_token(user)
+        self.stdout.write(f'X-Profile: {token}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Valid for {TOKEN_TIMEOUT // 60} minutes, e.g. curl -H "X-Profile: {token}" ...; '
+            'profiles appear under Request profiles in the admin.'
+        ))
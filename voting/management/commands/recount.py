@@ -0,0 +1,132 @@
+import json
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max, Min, Sum
+
+from voting.models import CandidateProfile, Election, ElectionArchive, ElectionResult, Vote
+from voting.recount import parallel_tally
+from voting.sharding import vote_databases, votes_for
+
+
+class Command(BaseCommand):
+    help = 'Independently recount an election in parallel and diff it against the live tally, final results and snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_id', type=int)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (default: number of CPU cores)')
+        parser.add_argument('--ranges', type=int, default=None,
+                            help='Primary-key ranges to split the votes into (default: 4 per worker)')
+        parser.add_argument('--snapshot', help='JSON snapshot of an earlier tally to diff against')
+        parser.add_argument('--write-snapshot', help='Save this recount as a JSON snapshot')
+
+    def handle(self, *args, **options):
+        try:
+            election = Election.objects.get(id=options['election_id'])
+        except Election.DoesNotExist:
+            raise CommandError(f"Election {options['election_id']} not found.")
+        if ElectionArchive.objects.filter(election=election).exists():
+            raise CommandError(f'"{election.name}" is archived: its ballots are no longer in the database. '
+                               f'Check the archive with `manage.py verify_ledger {election.id}`.')
+
+        workers = max(1, options['workers'])
+        ranges = options['ranges'] or workers * 4
+        bounds = votes_for(election).aggregate(low=Min('pk'), high=Max('pk'))
+        candidates = {
+            c.pk: c for c in CandidateProfile.objects.select_related('user')
+        }
+
+        started = time.perf_counter()
+        if bounds['low'] is None:
+            recount, rows = {}, 0
+        else:
+            recount, rows = parallel_tally(election.id, list(candidates), bounds['low'], bounds['high'],
+                                           workers, ranges)
+        elapsed = time.perf_counter() - started
+
+        live = dict(
+            votes_for(election).values('candidate_id').annotate(n=Count('pk')).values_list('candidate_id', 'n')
+        )
+        snapshot = self.load_snapshot(options['snapshot'], election) if options['snapshot'] else None
+        # Tally frozen when the election closed (voting/lifecycle.py)
+        final = None
+        if election.finalised_at:
+            final = dict(election.final_results.filter(candidate__isnull=False).values_list('candidate_id', 'votes'))
+        ids = set(recount) | set(live) | set(final or {})
+        totals = self.counter_totals(ids)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Recount of "{election.name}"'))
+        self.stdout.write(f'{rows:,} ballots in {elapsed:.2f}s with {workers} workers over {ranges} ranges '
+                          f'({rows / elapsed if elapsed else 0:,.0f} ballots/s)')
+        header = f'{"candidate":<30} {"recount":>9} {"live":>9} {"counter*":>9}'
+        if final is not None:
+            header += f' {"final":>9}'
+        if snapshot is not None:
+            header += f' {"snapshot":>9}'
+        self.stdout.write(header)
+
+        discrepancies = 0
+        for candidate_id in sorted(ids | set(snapshot or {})):
+            counted = recount.get(candidate_id, 0)
+            candidate = candidates.get(candidate_id)
+            name = candidate.user.username if candidate else f'<unknown {candidate_id}>'
+            counter = candidate.votes_received if candidate else None
+            line = f'{name:<30} {counted:>9} {self.cell(live.get(candidate_id, 0), counted)}'
+            line += f' {self.cell(counter, totals[candidate_id])}'
+            if final is not None:
+                line += f' {self.cell(final.get(candidate_id, 0), counted)}'
+            if snapshot is not None:
+                line += f' {self.cell(snapshot.get(candidate_id, 0), counted)}'
+            expected = [live.get(candidate_id, 0)]
+            if final is not None:
+                expected.append(final.get(candidate_id, 0))
+            if snapshot is not None:
+                expected.append(snapshot.get(candidate_id, 0))
+            # The counter spans every election the candidate stood in, so it
+            # is held against their votes in all of them rather than the recount
+            tampered = counter is not None and counter != totals[candidate_id]
+            if tampered or any(value != counted for value in expected):
+                discrepancies += 1
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        self.stdout.write("* CandidateProfile.votes_received, checked against the candidate's votes in every election")
+
+        if options['write_snapshot']:
+            with open(options['write_snapshot'], 'w') as f:
+                json.dump({'election': election.id, 'ballots': rows,
+                           'tally': {str(k): v for k, v in recount.items()}}, f, indent=2)
+            self.stdout.write(f"Snapshot written to {options['write_snapshot']}")
+
+        if discrepancies:
+            raise CommandError(f'{discrepancies} candidate(s) differ from the recount.')
+        self.stdout.write(self.style.SUCCESS('Recount matches.'))
+
+    def counter_totals(self, candidate_ids):
+        """
+        What votes_received should read for each candidate: their votes in
+        every vote database, plus the frozen results of archived elections,
+        whose ballots are no longer in the database.
+        """
+        archived = list(ElectionArchive.objects.values_list('election_id', flat=True))
+        totals = Counter()
+        for db in vote_databases():
+            votes = Vote.objects.using(db).filter(candidate_id__in=candidate_ids).exclude(election_id__in=archived)
+            totals.update(dict(votes.values('candidate_id').annotate(n=Count('pk')).values_list('candidate_id', 'n')))
+        results = ElectionResult.objects.filter(election_id__in=archived, candidate_id__in=candidate_ids)
+        totals.update(dict(results.values('candidate_id').annotate(n=Sum('votes')).values_list('candidate_id', 'n')))
+        return totals
+
+    def cell(self, value, expected):
+        if value is None:
+            return f'{"-":>9}'
+        return f'{value:>9}' if value == expected else f'{value:>8}!'
+
+    def load_snapshot(self, path, election):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('election') != election.id:
+            raise CommandError(f"Snapshot {path} is for election {data.get('election')}, not {election.id}.")
+        return {int(k): v for k, v in data['tally'].items()}
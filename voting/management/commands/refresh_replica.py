@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from voting.replica import REPLICA_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Refresh the local SQLite read replica with a consistent snapshot of the default database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep refreshing every INTERVAL seconds (default: refresh once and exit)'
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA_DB_ALIAS not in connections.settings:
+            raise CommandError('No replica configured. Set REPLICA_DB_NAME to the snapshot path.')
+        source = connections.settings[DEFAULT_DB_ALIAS]
+        target = connections.settings[REPLICA_DB_ALIAS]
+        if source['ENGINE'] != 'django.db.backends.sqlite3' or target['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('refresh_replica only snapshots SQLite databases.')
+
+        while True:
+            started = time.time()
+            self.snapshot(str(source['NAME']), str(target['NAME']), started)
+            self.stdout.write(f'Replica refreshed in {time.time() - started:.2f}s')
+            if not options['interval']:
+                break
+            time.sleep(max(0.0, options['interval'] - (time.time() - started)))
+
+    def snapshot(self, source_path, target_path, started):
+        tmp_path = f'{target_path}.tmp'
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.backup(target)  # online backup: a consistent copy no older than `started`
+        finally:
+            target.close()
+            source.close()
+        # The replica's age is read from its mtime; stamp it with the snapshot
+        # start so lag is never under-reported, then swap it in atomically.
+        os.utime(tmp_path, (started, started))
+        os.replace(tmp_path, target_path)
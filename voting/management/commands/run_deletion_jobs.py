@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from voting.deletion import BATCH_SIZE, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Delete queued elections and archived ballots in small batches (see voting/deletion.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Rows deleted per transaction (default: {BATCH_SIZE})')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to wait between batches, leaving the database to other writers '
+                                 '(default: 0.05)')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between checks (default: 5)')
+        parser.add_argument('--once', action='store_true', help='Run the queued jobs and exit')
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options['verbosity'] > 1 else lambda message: None
+        while True:
+            for job in run_pending(options['batch_size'], options['pause'], log):
+                if job.status == 'done':
+                    self.stdout.write(self.style.SUCCESS(f'{job}: {job.deleted:,} rows deleted'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'{job}: {job.error}'))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
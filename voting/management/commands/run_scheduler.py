@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from voting.lifecycle import WARMUP, tick
+
+
+class Command(BaseCommand):
+    help = 'Open, close and finalise elections on their start/end dates, warming caches just before they open'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between checks (default: 5)')
+        parser.add_argument('--warmup', type=float, default=WARMUP.total_seconds(),
+                            help=f'Warm caches this many seconds before an election opens '
+                                 f'(default: {WARMUP.total_seconds():.0f})')
+        parser.add_argument('--once', action='store_true', help='Run the due transitions once and exit')
+
+    def handle(self, *args, **options):
+        warmup = timedelta(seconds=options['warmup'])
+        while True:
+            started = time.time()
+            done = tick(warmup=warmup)
+            for election in done['warmed']:
+                self.stdout.write(f'Warmed caches for "{election.name}" (opens {election.start_date:%Y-%m-%d %H:%M})')
+            for election in done['opened']:
+                self.stdout.write(self.style.SUCCESS(f'Opened "{election.name}"'))
+            for election in done['finalised']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Closed and finalised "{election.name}": {election.ballots_cast} ballots'
+                ))
+            if options['once']:
+                break
+            time.sleep(max(0.0, options['interval'] - (time.time() - started)))
@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from voting import mailer
+from voting.models import CustomUser, Election, MailingJob
+
+
+class Command(BaseCommand):
+    help = ('Email every matching user (by default the electorate of an election) in batches over reused '
+            'connections, with a worker pool and a rate cap (see voting/mailer.py)')
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--election', type=int, help='Announce this election to its eligible voters')
+        target.add_argument('--everyone', action='store_true', help='Mail every user matching the filters below')
+        target.add_argument('--resume', type=int, metavar='JOB_ID', help='Resume a stopped or paused mailing')
+        target.add_argument('--queued', action='store_true', help='Send the mailings queued from the admin')
+        parser.add_argument('--role', choices=[r for r, _ in CustomUser.ROLE_CHOICES])
+        parser.add_argument('--branch', action='append', default=[], choices=[b for b, _ in CustomUser.BRANCH_CHOICES],
+                            help='Only this branch (repeatable)')
+        parser.add_argument('--year', action='append', default=[], choices=[y for y, _ in CustomUser.YEAR_CHOICES],
+                            help='Only this year of study (repeatable)')
+        parser.add_argument('--subject', help='Subject template (default: the voting-is-open announcement)')
+        parser.add_argument('--body-file', help='File holding the body template; {{ name }} and {{ election }} '
+                                                'are filled in')
+        parser.add_argument('--workers', type=int, help='Sending threads, one connection each '
+                                                        '(default: settings.MAILER_WORKERS)')
+        parser.add_argument('--rate', type=float, help='Most messages per second, 0 for no cap '
+                                                       '(default: settings.MAILER_RATE)')
+        parser.add_argument('--batch-size', type=int, help='Recipients read per query '
+                                                           '(default: settings.MAILER_BATCH_SIZE)')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='With --queued, keep polling every INTERVAL seconds (default: run once)')
+
+    def handle(self, *args, **options):
+        if options['queued']:
+            while True:
+                for job in MailingJob.objects.filter(status='pending').order_by('pk'):
+                    self.send(job, options)
+                if not options['interval']:
+                    return
+                time.sleep(options['interval'])
+
+        if options['resume']:
+            try:
+                job = MailingJob.objects.get(pk=options['resume'])
+            except MailingJob.DoesNotExist:
+                raise CommandError(f"Mailing {options['resume']} not found.")
+        else:
+            job = self.create(options)
+            self.stdout.write(f'Mailing {job.pk} created; resume it with --resume {job.pk} if it stops.')
+        self.send(job, options)
+
+    def create(self, options):
+        election = None
+        if options['election']:
+            try:
+                election = Election.objects.get(pk=options['election'])
+            except Election.DoesNotExist:
+                raise CommandError(f"Election {options['election']} not found.")
+        elif not (options['subject'] and options['body_file']):
+            raise CommandError('Give --subject and --body-file when not announcing an election.')
+        body = mailer.DEFAULT_BODY
+        if options['body_file']:
+            with open(options['body_file']) as f:
+                body = f.read()
+        return MailingJob.objects.create(
+            election=election, role=options['role'] or '', branches=options['branch'], years=options['year'],
+            subject=options['subject'] or mailer.DEFAULT_SUBJECT, body=body,
+        )
+
+    def send(self, job, options):
+        log = self.stdout.write if options['verbosity'] > 1 else lambda message: None
+        started = time.perf_counter()
+        try:
+            job = mailer.send(job, workers=options['workers'], rate=options['rate'],
+                              batch_size=options['batch_size'], log=log)
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+        summary = (f'Mailing {job.pk} "{job.subject}": {job.sent:,} sent, {job.failed:,} failed in {elapsed:.1f}s '
+                   f'({job.status})')
+        if job.error:
+            summary += f'\n{job.error}'
+        self.stdout.write(self.style.SUCCESS(summary) if job.status == 'done' and not job.failed
+                          else self.style.WARNING(summary))
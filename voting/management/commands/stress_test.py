@@ -0,0 +1,225 @@
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.utils import timezone
+
+from voting import admission, datagen
+from voting.benchmarks import benchmark_database
+from voting.models import CandidateProfile, CustomUser, Election, Vote
+from voting.stress import LockStats, check_invariants
+
+# What the views tell the user, to classify each response
+OUTCOMES = [
+    ('You have already voted', 'already voted'),
+    ('No active elections', 'election closed'),
+    ('Only voters', 'no longer a voter'),
+    ('UNIQUE constraint', 'duplicate rejected by the database'),
+    ('locked', 'database locked'),
+]
+
+
+class Command(BaseCommand):
+    help = ('Fire contending ballots, role promotions and election toggles at a file-backed test database '
+            'from several processes, then check that no voter voted twice and the counters match the Vote table')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=300, help='Voters (default: 300)')
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes (default: 4)')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per process (default: 4)')
+        parser.add_argument('--positions', type=int, default=3,
+                            help='Races on the ballot, each with two candidates (default: 3)')
+        parser.add_argument('--duplicates', type=int, default=3,
+                            help='Simultaneous submissions per voter, from different processes (default: 3)')
+        parser.add_argument('--toggles', type=int, default=20,
+                            help='Election activations/deactivations during the burst (default: 20)')
+        parser.add_argument('--promotions', type=int, default=20,
+                            help='Voters promoted to candidate during the burst (default: 20)')
+        parser.add_argument('--retries', type=int, default=3,
+                            help='Times a submission that hit a locked database is retried (default: 3)')
+        parser.add_argument('--seed', type=int, default=2025, help='Dataset seed (see generate_election_data)')
+
+    def handle(self, *args, **options):
+        if options['duplicates'] > options['processes']:
+            raise CommandError('--duplicates cannot exceed --processes: each copy of a ballot is sent by another process.')
+        original = settings.WAITING_ROOM_CAPACITY
+        settings.WAITING_ROOM_CAPACITY = 0  # its counters are per process; the views are what is under test
+        workdir = tempfile.mkdtemp(prefix='stress-')
+        request_log = logging.getLogger('django.request')
+        request_log.disabled = True  # the failures are counted, not printed
+        try:
+            with benchmark_database(name=os.path.join(workdir, 'stress.sqlite3')):
+                stats, violations = self.run(options)
+        finally:
+            settings.WAITING_ROOM_CAPACITY = original
+            request_log.disabled = False
+            shutil.rmtree(workdir, ignore_errors=True)
+        self.report(stats, violations)
+        if violations:
+            raise CommandError(f'{len(violations)} invariant(s) violated.')
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        # Two open elections, so toggles move voters between them; the candidates stand in both
+        dataset = datagen.generate(end=timezone.now(), elections=2, voters=options['voters'],
+                                   candidates=options['positions'], positions=options['positions'], turnout=0,
+                                   open_latest=True, seed=options['seed'], prefix='stress')
+        elections = dataset['elections']
+        Election.objects.update(start_date=elections[-1].start_date, end_date=elections[-1].end_date)
+        CandidateProfile.objects.update(election=None)
+        races = {}
+        for pk, position in CandidateProfile.objects.order_by('pk').values_list('pk', 'position'):
+            races.setdefault(position, []).append(pk)
+
+        voters = list(CustomUser.objects.filter(role='voter').order_by('pk'))
+        clients = [self.client(user) for user in voters]
+        admin = CustomUser.objects.create(username='stress-admin', email='stress-admin@example.com',
+                                          password='!', role='admin')
+        admin_clients = [self.client(admin) for _ in range(options['processes'] * options['threads'])]
+
+        # Copy k of a voter's ballot goes to process (voter + k), and every
+        # process works through its voters in the same order, so the copies
+        # arrive together. Each copy is a whole ballot, one choice per race
+        processes = options['processes']
+        plans = [[] for _ in range(processes)]
+        for n, client in enumerate(clients):
+            for k in range(options['duplicates']):
+                ballot = {f'candidate_{r}': rng.choice(ids) for r, ids in enumerate(races.values(), start=1)}
+                plans[(n + k) % processes].append(('vote', n, ballot))
+        promoted = rng.sample(range(len(voters)), min(options['promotions'], len(voters)))
+        admin_tasks = ([('toggle', rng.choice(elections).pk, None) for _ in range(options['toggles'])]
+                       + [('promote', voters[n].pk, None) for n in promoted])
+        rng.shuffle(admin_tasks)
+        for i, task in enumerate(admin_tasks):
+            plan = plans[i % processes]
+            plan.insert(rng.randrange(len(plan) + 1), task)
+
+        context = multiprocessing.get_context('fork')
+        gate = context.Barrier(processes)
+        results = context.Queue()
+        connections.close_all()  # never share a SQLite connection with the children
+        workers = [context.Process(target=self.work, args=(
+            plan, clients, admin_clients[p * options['threads']:(p + 1) * options['threads']],
+            gate, results, options,
+        )) for p, plan in enumerate(plans)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        stats = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - started
+        for worker in workers:
+            worker.join()
+
+        merged = {'elapsed': elapsed, 'outcomes': Counter(), 'write_ms': [], 'locked': 0,
+                  'integrity_errors': 0, 'retries': 0}
+        for part in stats:
+            merged['outcomes'].update(part['outcomes'])
+            merged['write_ms'] += part['write_ms']
+            for key in ('locked', 'integrity_errors', 'retries'):
+                merged[key] += part[key]
+        merged['votes'] = Vote.objects.count()
+        merged['voted'] = Vote.objects.values('voter_id', 'election_id').distinct().count()
+        return merged, check_invariants(accepted=merged['outcomes']['accepted'])
+
+    def client(self, user):
+        # Failed requests come back as error responses to count, not exceptions
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        return client
+
+    def work(self, plan, clients, admin_clients, gate, results, options):
+        """One worker process: `options['threads']` threads sharing its plan."""
+        lock_stats = LockStats()
+        outcomes, retries = Counter(), [0]
+        guard = threading.Lock()
+        tasks = iter(plan)
+
+        def next_task():
+            with guard:
+                return next(tasks, None)
+
+        def loop(admin):
+            try:
+                with connection.execute_wrapper(lock_stats):
+                    while (task := next_task()) is not None:
+                        outcome, tries = self.attempt(task, clients, admin, options['retries'])
+                        with guard:
+                            outcomes[outcome] += 1
+                            retries[0] += tries
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=loop, args=(admin,)) for admin in admin_clients]
+        gate.wait()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results.put({'outcomes': outcomes, 'retries': retries[0], **lock_stats.as_dict()})
+
+    def attempt(self, task, clients, admin, retries):
+        """Send one task; returns (outcome, retries it took)."""
+        kind, target, data = task
+        for attempt in range(retries + 1):
+            if kind == 'vote':
+                response = clients[target].post('/submit-vote/', data)
+            elif kind == 'toggle':
+                response = admin.post(f'/toggle-election/{target}/')
+            else:
+                response = admin.post('/promote-candidate/', {'user_ids': [target]})
+            outcome = self.outcome(kind, response)
+            if outcome != 'database locked':
+                return outcome, attempt
+            time.sleep(0.01 * 2 ** attempt)
+        return 'database locked (gave up)', retries
+
+    def outcome(self, kind, response):
+        if response.status_code >= 400:
+            return f'failed (HTTP {response.status_code})'
+        if kind == 'vote' and response.status_code == 200:
+            return 'accepted'
+        text = ' '.join(str(m) for m in get_messages(response.wsgi_request))
+        for needle, outcome in OUTCOMES:
+            if needle in text:
+                return outcome
+        if kind != 'vote' and 'Error' not in text:
+            return {'toggle': 'toggled', 'promote': 'promoted'}[kind]
+        return f'other: {text[:60]}'
+
+    def report(self, stats, violations):
+        outcomes = stats['outcomes']
+        submissions = sum(outcomes.values())
+        self.stdout.write(self.style.MIGRATE_HEADING('requests'))
+        self.stdout.write(f"  {submissions:,} in {stats['elapsed']:.2f}s ({submissions / stats['elapsed']:,.0f}/s), "
+                          f"{stats['retries']:,} retried after a lock error")
+        for outcome, count in outcomes.most_common():
+            self.stdout.write(f'  {outcome + ":":<36} {count:,}')
+        self.stdout.write(f"  votes stored: {stats['votes']:,} from {stats['voted']:,} voter/election pairs")
+
+        write_ms = sorted(stats['write_ms'])
+        self.stdout.write(self.style.MIGRATE_HEADING('write statements (lock waits included)'))
+        if write_ms:
+            self.stdout.write(f'  {len(write_ms):,} statements, median {statistics.median(write_ms):.1f} ms, '
+                              f'p95 {admission.percentile(write_ms, 95):.1f} ms, max {write_ms[-1]:.0f} ms, '
+                              f'{sum(write_ms) / 1000:.1f}s in total')
+        self.stdout.write(f"  'database is locked': {stats['locked']:,}; integrity errors: {stats['integrity_errors']:,}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING('invariants'))
+        if not violations:
+            self.stdout.write(self.style.SUCCESS('  one ballot per voter per election, counters match the Vote table'))
+        for violation in violations[:20]:
+            self.stdout.write(self.style.ERROR(f'  {violation}'))
+        if len(violations) > 20:
+            self.stdout.write(self.style.ERROR(f'  ... and {len(violations) - 20} more'))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.archive import archive_of, ledger_rows
+from voting.ledger import VOTE_COLUMNS, MerkleFrontier, ballot_receipt
+from voting.models import Election, LedgerNode, LedgerState
+from voting.sharding import votes_for
+
+
+class Command(BaseCommand):
+    help = 'Recompute an election ledger root from the Vote table (or its archive) and compare it with the stored one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched per query (default: 5000)')
+
+    def handle(self, *args, **options):
+        try:
+            election = Election.objects.get(id=options['election_id'])
+        except Election.DoesNotExist:
+            raise CommandError(f"Election {options['election_id']} not found.")
+        state = LedgerState.objects.filter(election=election).first()
+        if state is None or not state.size:
+            self.stdout.write('Nothing has been ledgered for this election yet.')
+            return
+
+        chunk_size = options['chunk_size']
+        archive = archive_of(election)
+        if archive:
+            # Every archived vote was ledgered first (voting/archive.py)
+            votes = ledger_rows(archive)
+        else:
+            votes = votes_for(election).filter(pk__lte=state.last_vote_id).order_by('pk').values_list(
+                *VOTE_COLUMNS
+            ).iterator(chunk_size=chunk_size)
+        source = 'archive' if archive else 'Vote table'
+        leaves = LedgerNode.objects.filter(election=election, level=0).order_by('index').values_list(
+            'digest', 'vote_id'
+        ).iterator(chunk_size=chunk_size)
+
+        # Only the O(log n) frontier is kept in memory while streaming
+        frontier = MerkleFrontier()
+        first_mismatch = None
+        for leaf, vote in zip(leaves, votes):  # leaves first, so no vote is dropped when they run out
+            digest = ballot_receipt(*vote)
+            if first_mismatch is None and (digest != leaf[0] or vote[0] != leaf[1]):
+                first_mismatch = (frontier.size, leaf[1], vote[0])
+            frontier.append(digest)
+        for vote in votes:  # rows the ledger does not know about
+            frontier.append(ballot_receipt(*vote))
+
+        root = frontier.root()
+        self.stdout.write(f'Ledger:      {state.size} ballots, root {state.root}')
+        self.stdout.write(f'{source.capitalize() + ":":<12} {frontier.size} ballots, root {root}')
+        if frontier.size == state.size and root == state.root:
+            self.stdout.write(self.style.SUCCESS(f'OK: the {source} matches the ledger.'))
+            return
+        if first_mismatch:
+            position, ledger_vote, table_vote = first_mismatch
+            self.stdout.write(self.style.ERROR(
+                f'First difference at ledger position {position}: ledger has vote {ledger_vote}, '
+                f'{source} has vote {table_vote} (edited, deleted or inserted ballot).'
+            ))
+        raise CommandError(f'Ledger verification FAILED: the {source} does not match the ledger.')
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0007_logintoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='logintoken',
+            index=models.Index(fields=['created_at'], name='voting_logi_created_927a4a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['timestamp'], name='voting_vote_timesta_1e3967_idx'),
+        ),
+    ]
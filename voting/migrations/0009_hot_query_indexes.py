@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('voting', '0008_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'year_of_study'], name='voting_cust_role_b45748_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='election',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['start_date', 'end_date'], name='voting_election_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['election', 'candidate'], name='voting_vote_electio_05e886_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['election', 'timestamp'], name='voting_vote_electio_d098cf_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.BigIntegerField(default=0)),
+                ('root', models.CharField(blank=True, max_length=64)),
+                ('frontier', models.JSONField(default=list)),
+                ('last_vote_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to='voting.election')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('index', models.BigIntegerField()),
+                ('digest', models.CharField(max_length=64)),
+                ('vote_id', models.BigIntegerField(blank=True, null=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_nodes', to='voting.election')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['digest'], name='voting_ledg_digest_a518a7_idx')],
+                'unique_together': {('election', 'level', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0010_vote_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='election',
+            name='seats',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Number of winners (STV only)'),
+        ),
+        migrations.AddField(
+            model_name='election',
+            name='voting_method',
+            field=models.CharField(choices=[('fptp', 'First past the post'), ('irv', 'Instant runoff (ranked choice)'), ('stv', 'Single transferable vote')], default='fptp', max_length=4),
+        ),
+        migrations.CreateModel(
+            name='RankedBallot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking', models.BinaryField(max_length=64)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.election')),
+                ('voter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.voterprofile')),
+            ],
+            options={
+                'unique_together': {('voter', 'election')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0011_ranked_ballots'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='election',
+            field=models.ForeignKey(blank=True, help_text='Leave empty to stand in every election', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='candidates', to='voting.election'),
+        ),
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='position',
+            field=models.CharField(blank=True, help_text='Post contested, e.g. President', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='position',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together={('voter', 'election', 'position')},
+        ),
+    ]
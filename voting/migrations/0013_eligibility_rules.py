@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:17
+
+import django.db.models.deletion
+from django.db import migrations, models, router
+
+
+def count_electorates(apps, schema_editor):
+    # Existing elections have no rules yet: every voter is eligible
+    Election = apps.get_model('voting', 'Election')
+    CustomUser = apps.get_model('voting', 'CustomUser')
+    db = schema_editor.connection.alias
+    if not router.allow_migrate_model(db, Election):
+        return  # vote shards only hold the ballot tables
+    voters = CustomUser.objects.using(db).filter(role='voter').count()
+    Election.objects.using(db).update(eligible_voter_count=voters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0012_election_positions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='election',
+            name='eligible_voter_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='EligibilityRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('branch', 'Branch'), ('year_of_study', 'Year of study')], max_length=20)),
+                ('values', models.JSONField(default=list, help_text='Allowed values, e.g. ["CSE", "ECE"] or ["3", "4"]')),
+                ('exclude', models.BooleanField(default=False, help_text='Exclude these values instead of allowing only them')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eligibility_rules', to='voting.election')),
+            ],
+        ),
+        migrations.RunPython(count_electorates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0015_request_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElectionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('votes_file', models.CharField(max_length=255)),
+                ('ranked_file', models.CharField(blank=True, max_length=255)),
+                ('vote_count', models.PositiveIntegerField()),
+                ('ranked_count', models.PositiveIntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField()),
+                ('sha256', models.CharField(help_text='Checksum of the votes file', max_length=64)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='voting.election')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('election_id', models.PositiveIntegerField()),
+                ('election_name', models.CharField(max_length=255)),
+                ('kind', models.CharField(choices=[('votes', 'Archived ballots'), ('election', 'Whole election')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('total', models.PositiveIntegerField(blank=True, help_text='Rows to delete, counted when the job starts', null=True)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='voting_dele_status_c7cb50_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0016_archive_and_deletion_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(blank=True, choices=[('voter', 'Voter'), ('candidate', 'Candidate'), ('admin', 'Admin')], help_text='Blank: any role', max_length=10)),
+                ('branches', models.JSONField(blank=True, default=list, help_text='Branch codes; empty: every branch')),
+                ('years', models.JSONField(blank=True, default=list, help_text='Years of study; empty: every year')),
+                ('subject', models.CharField(max_length=200)),
+                ('body', models.TextField(help_text='Django template; {{ name }} and {{ election }} are filled in')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('paused', 'Paused'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('total', models.PositiveIntegerField(blank=True, null=True)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('last_user_id', models.BigIntegerField(default=0, help_text='Every recipient up to this user id has been handled')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mailing_jobs', to=settings.AUTH_USER_MODEL)),
+                ('election', models.ForeignKey(blank=True, help_text='Send to its eligible voters, and fill in {{ election }}', null=True, on_delete=django.db.models.deletion.SET_NULL, to='voting.election')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0017_mailing_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='election',
+            name='results_delay',
+            field=models.PositiveSmallIntegerField(default=15, help_text='Minutes between updates when delayed'),
+        ),
+        migrations.AddField(
+            model_name='election',
+            name='results_visibility',
+            field=models.CharField(choices=[('live', 'Live'), ('delayed', 'Delayed'), ('closed', 'After the election ends')], default='live', max_length=7),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:11
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0018_results_visibility'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KioskBallot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ballot_id', models.UUIDField(unique=True)),
+                ('kiosk', models.CharField(max_length=50)),
+                ('batch', models.UUIDField(help_text='The sync request it arrived in')),
+                ('election_id', models.PositiveIntegerField(null=True)),
+                ('voter_id', models.PositiveIntegerField(null=True)),
+                ('cast_at', models.DateTimeField(null=True)),
+                ('status', models.CharField(choices=[('accepted', 'Accepted'), ('duplicate', 'Duplicate'), ('rejected', 'Rejected')], max_length=10)),
+                ('detail', models.CharField(blank=True, max_length=255)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kiosk', 'received_at'], name='voting_kios_kiosk_2c232f_idx'), models.Index(fields=['batch'], name='voting_kios_batch_77225d_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QueuedBallot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ballot_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('candidate_ids', models.JSONField()),
+                ('ranking', models.JSONField(blank=True, default=list, help_text='Full preference order of a ranked ballot')),
+                ('cast_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('signature', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('accepted', 'Accepted'), ('duplicate', 'Duplicate'), ('rejected', 'Rejected')], default='queued', max_length=10)),
+                ('detail', models.CharField(blank=True, max_length=255)),
+                ('synced_at', models.DateTimeField(blank=True, null=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.election')),
+                ('voter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.voterprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='voting_queu_status_6a5e6d_idx')],
+                'unique_together': {('voter', 'election')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0019_kiosk_ballots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='election',
+            name='changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
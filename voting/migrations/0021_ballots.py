@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_cast_ballots(apps, schema_editor):
+    # Every voter with a Vote in an election has cast its ballot; run on the
+    # shards too, which hold those elections' votes
+    Vote = apps.get_model('voting', 'Vote')
+    Ballot = apps.get_model('voting', 'Ballot')
+    db = schema_editor.connection.alias
+    cast = Vote.objects.using(db).values_list('voter_id', 'election_id').distinct().order_by()
+    Ballot.objects.using(db).bulk_create(
+        (Ballot(voter_id=voter_id, election_id=election_id) for voter_id, election_id in cast.iterator()),
+        batch_size=1000, ignore_conflicts=True)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0020_election_changed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ballot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cast_at', models.DateTimeField(auto_now_add=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.election')),
+                ('voter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.voterprofile')),
+            ],
+            options={
+                'unique_together': {('voter', 'election')},
+            },
+        ),
+        migrations.RunPython(mark_cast_ballots, migrations.RunPython.noop, hints={'model_name': 'ballot'}),
+    ]
@@ -1,9 +1,15 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import F
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.functional import cached_property
 from datetime import timedelta
 import secrets
+import struct
+import uuid
+from .eligibility import Eligibility
+from .sharding import vote_databases, vote_db
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -35,9 +41,35 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['role', 'year_of_study']),  # admin panel voter list
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.role})"
 
+    @classmethod
+    def promote_to_candidates(cls, user_ids):
+        """
+        Promote many voters at once: one UPDATE for the role and one bulk insert
+        of CandidateProfile rows. update()/bulk_create() do not send post_save,
+        so the per-user profile and electorate signals are bypassed.
+        Returns the number of users promoted.
+        """
+        with transaction.atomic():
+            ids = list(cls.objects.filter(id__in=user_ids, role='voter').values_list('id', flat=True))
+            if not ids:
+                return 0
+            cls.objects.filter(id__in=ids).update(role='candidate')
+            CandidateProfile.objects.bulk_create(
+                [CandidateProfile(user_id=user_id) for user_id in ids],
+                ignore_conflicts=True,
+            )
+            # update() skipped the signals that keep electorate sizes current
+            Election.refresh_eligible_counts()
+        return len(ids)
+
 
 class VoterProfile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
@@ -50,6 +82,10 @@ class VoterProfile(models.Model):
 
 class CandidateProfile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
+    election = models.ForeignKey('Election', on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='candidates',
+                                 help_text="Leave empty to stand in every election")
+    position = models.CharField(max_length=100, blank=True, help_text="Post contested, e.g. President")
     manifesto = models.TextField(blank=True, help_text="Your campaign manifesto and promises")
     slogan = models.CharField(max_length=200, blank=True, help_text="Campaign slogan or motto")
     votes_received = models.IntegerField(default=0)
@@ -57,16 +93,57 @@ class CandidateProfile(models.Model):
     def __str__(self):
         return f"Candidate: {self.user.username}"
     
+    @classmethod
+    def for_election(cls, election):
+        """Candidates on the ballot of `election`, ordered by position"""
+        return cls.objects.filter(
+            models.Q(election=election) | models.Q(election__isnull=True)
+        ).order_by('position', 'pk')
+    
     def update_vote_count(self):
-        """Update the vote count from the Vote table"""
-        self.votes_received = Vote.objects.filter(candidate=self).count()
+        """Update the vote count from the Vote table (every shard, if votes are sharded)"""
+        self.votes_received = sum(
+            Vote.objects.using(db).filter(candidate=self).count() for db in vote_databases()
+        )
         self.save()
 
 class Election(models.Model):
+    VOTING_METHOD_CHOICES = [
+        ('fptp', 'First past the post'),
+        ('irv', 'Instant runoff (ranked choice)'),
+        ('stv', 'Single transferable vote'),
+    ]
+    RESULTS_VISIBILITY_CHOICES = [
+        ('live', 'Live'),
+        ('delayed', 'Delayed'),
+        ('closed', 'After the election ends'),
+    ]
+
     name = models.CharField(max_length=255)
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    voting_method = models.CharField(max_length=4, choices=VOTING_METHOD_CHOICES, default='fptp')
+    seats = models.PositiveSmallIntegerField(default=1, help_text="Number of winners (STV only)")
+    # What candidates see of their count and rank while voting runs (see voting/leaderboard.py)
+    results_visibility = models.CharField(max_length=7, choices=RESULTS_VISIBILITY_CHOICES, default='live')
+    results_delay = models.PositiveSmallIntegerField(default=15, help_text="Minutes between updates when delayed")
+    # Size of the electorate, kept up to date by voting/signals.py while the election runs
+    eligible_voter_count = models.PositiveIntegerField(default=0, editable=False)
+    # Lifecycle, driven by `manage.py run_scheduler` (see voting/lifecycle.py)
+    opened_at = models.DateTimeField(null=True, blank=True, editable=False)
+    finalised_at = models.DateTimeField(null=True, blank=True, editable=False)
+    ballots_cast = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Moved by caching.bump_version(); read by the HTTP validators (voting/conditional.py)
+    changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Partial index: `filter(is_active=True)` compiles to a bare boolean
+            # column test, which SQLite can only serve from a matching partial index.
+            models.Index(fields=['start_date', 'end_date'], condition=models.Q(is_active=True),
+                         name='voting_election_active_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -82,27 +159,249 @@ class Election(models.Model):
     def has_ended(self):
         return timezone.now() > self.end_date
 
+    def is_ranked(self):
+        return self.voting_method in ('irv', 'stv')
+
+    @cached_property
+    def eligibility(self):
+        from .caching import eligibility_rules
+        return Eligibility(eligibility_rules(self))
+
+    def is_eligible(self, user):
+        """Whether `user` may vote in this election (no query once the rules are loaded)"""
+        return user.role == 'voter' and self.eligibility.allows(user)
+
+    def eligible_voters(self):
+        return CustomUser.objects.filter(self.eligibility.q(), role='voter')
+
+    @classmethod
+    def refresh_eligible_counts(cls, election_ids=None):
+        """
+        Recount the electorate of the given elections (default: every election
+        that has not ended), e.g. after rules change or a bulk update that
+        bypassed the signals.
+        """
+        if election_ids is None:
+            elections = cls.objects.filter(end_date__gt=timezone.now())
+        else:
+            elections = cls.objects.filter(pk__in=election_ids)
+        for election in elections:
+            # Read the rules from the database, not the cache: this is the authoritative recount
+            eligibility = Eligibility.from_rules(election.eligibility_rules.all())
+            count = CustomUser.objects.filter(eligibility.q(), role='voter').count()
+            cls.objects.filter(pk=election.pk).update(eligible_voter_count=count)
+
+
+class ElectionResult(models.Model):
+    """
+    Final tally of one candidate, written once when the election closes.
+    The name and position are copied so the record outlives the candidate.
+    """
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='final_results')
+    candidate = models.ForeignKey(CandidateProfile, on_delete=models.SET_NULL, null=True, blank=True)
+    candidate_name = models.CharField(max_length=255)
+    position = models.CharField(max_length=100, blank=True)
+    votes = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('election', 'candidate')
+
+    def __str__(self):
+        return f"{self.candidate_name}: {self.votes} votes in {self.election.name}"
+
+
+class EligibilityRule(models.Model):
+    """
+    Restricts who may vote in an election. All of an election's rules must
+    hold; see voting/eligibility.py.
+    """
+    FIELD_CHOICES = [
+        ('branch', 'Branch'),
+        ('year_of_study', 'Year of study'),
+    ]
+
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='eligibility_rules')
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    values = models.JSONField(default=list, help_text='Allowed values, e.g. ["CSE", "ECE"] or ["3", "4"]')
+    exclude = models.BooleanField(default=False, help_text="Exclude these values instead of allowing only them")
+
+    def __str__(self):
+        return f"{'Not ' if self.exclude else ''}{self.get_field_display()} in {', '.join(map(str, self.values))}"
+
+    def clean(self):
+        choices = dict(CustomUser.BRANCH_CHOICES if self.field == 'branch' else CustomUser.YEAR_CHOICES)
+        if not isinstance(self.values, list) or not self.values:
+            raise ValidationError("Give at least one value.")
+        unknown = [value for value in self.values if value not in choices]
+        if unknown:
+            raise ValidationError(f"Unknown {self.get_field_display().lower()}: {', '.join(map(str, unknown))}")
+
 class Vote(models.Model):
     voter = models.ForeignKey(VoterProfile, on_delete=models.CASCADE)
     candidate = models.ForeignKey(CandidateProfile, on_delete=models.CASCADE)
     election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    position = models.CharField(max_length=100, blank=True, default='')
     timestamp = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        unique_together = ('voter', 'election')  # Prevent multiple votes in same election
+        unique_together = ('voter', 'election', 'position')  # One vote per race in each election
+        indexes = [
+            models.Index(fields=['timestamp']),  # admin date filter
+            # Equality on both columns, so this also serves (candidate, election)
+            # filters; the election prefix covers per-election scans and GROUP BYs.
+            models.Index(fields=['election', 'candidate']),
+            models.Index(fields=['election', 'timestamp']),
+        ]
     
     def __str__(self):
         return f"{self.voter.user.username} voted for {self.candidate.user.username}"
     
     def save(self, *args, **kwargs):
-        # Update voter's has_voted status
-        self.voter.has_voted = True
-        self.voter.save()
-        
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        
-        # Update candidate's vote count
-        self.candidate.update_vote_count()
+        if adding:
+            Ballot.objects.using(self._state.db).get_or_create(voter_id=self.voter_id, election_id=self.election_id)
+
+        def update_counters():
+            # Update voter's has_voted status
+            if not self.voter.has_voted:
+                self.voter.has_voted = True
+                self.voter.save(update_fields=['has_voted'])
+
+            # Update candidate's vote count: a new ballot is a single increment,
+            # edits recount (across every shard when votes are sharded)
+            if adding:
+                CandidateProfile.objects.filter(pk=self.candidate_id).update(votes_received=F('votes_received') + 1)
+            else:
+                self.candidate.update_vote_count()
+
+        self._after_write(self._state.db, update_counters)
+
+    @classmethod
+    def cast_ballot(cls, voter, election, candidates):
+        """
+        Record a whole ballot - one vote per position - with a single bulk
+        insert into the election's vote database, then flag the voter and bump
+        every chosen candidate with one UPDATE each. The caller wraps this in
+        transaction.atomic(using=vote_db(...)); if the voter has already cast a
+        ballot in the election, their Ballot row makes this raise IntegrityError.
+        Returns the saved votes.
+        """
+        db = vote_db(election.pk)
+        Ballot.objects.using(db).create(voter=voter, election=election)
+        votes = cls.objects.using(db).bulk_create([
+            cls(voter=voter, election=election, candidate=candidate, position=candidate.position)
+            for candidate in candidates
+        ])
+
+        def update_counters():
+            VoterProfile.objects.filter(pk=voter.pk, has_voted=False).update(has_voted=True)
+            CandidateProfile.objects.filter(pk__in=[c.pk for c in candidates]).update(
+                votes_received=F('votes_received') + 1
+            )
+
+        cls._after_write(db, update_counters)
+        return votes
+
+    @staticmethod
+    def _after_write(db, update_counters):
+        if db == DEFAULT_DB_ALIAS:
+            update_counters()
+        else:
+            # Sharded ballot: the shard transaction holds only the ballot rows;
+            # the default database is touched once it has committed.
+            transaction.on_commit(transaction.atomic(update_counters), using=db)
+
+
+class Ballot(models.Model):
+    """
+    One row per voter who has cast a ballot in an election, written in the
+    same transaction as the ballot's Vote rows and stored alongside them.
+    Vote is unique per race only; this unique key is what keeps a voter to one
+    ballot per election, whichever code writes it (the web, a kiosk sync).
+    """
+    voter = models.ForeignKey(VoterProfile, on_delete=models.CASCADE)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    cast_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('voter', 'election')
+
+    def __str__(self):
+        return f"Ballot of {self.voter_id} in election {self.election_id}"
+
+
+class RankedBallot(models.Model):
+    """
+    Full preference order of a ranked-choice ballot (the matching Vote row holds
+    the first preference). `ranking` is a fixed-width array of MAX_RANKS
+    little-endian int32 candidate ids, zero padded, so a whole election can be
+    loaded into a NumPy matrix with one frombuffer() (see voting/tally.py).
+    """
+    MAX_RANKS = 16
+    RANKING_FORMAT = f'<{MAX_RANKS}i'
+
+    voter = models.ForeignKey(VoterProfile, on_delete=models.CASCADE)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    ranking = models.BinaryField(max_length=struct.calcsize(RANKING_FORMAT))
+
+    class Meta:
+        unique_together = ('voter', 'election')
+
+    def __str__(self):
+        return f"Ranked ballot of {self.voter_id} in election {self.election_id}"
+
+    @classmethod
+    def pack(cls, candidate_ids):
+        """Encode candidate ids, most preferred first, as a ranking blob."""
+        candidate_ids = list(candidate_ids)
+        if not candidate_ids or len(candidate_ids) > cls.MAX_RANKS:
+            raise ValidationError(f"Rank between 1 and {cls.MAX_RANKS} candidates.")
+        if len(set(candidate_ids)) != len(candidate_ids):
+            raise ValidationError("Each candidate can only be ranked once.")
+        return struct.pack(cls.RANKING_FORMAT, *candidate_ids, *[0] * (cls.MAX_RANKS - len(candidate_ids)))
+
+    def preferences(self):
+        """Candidate ids in order of preference."""
+        return [c for c in struct.unpack(self.RANKING_FORMAT, bytes(self.ranking)) if c]
+
+
+class LedgerState(models.Model):
+    """
+    Head of an election's append-only vote ledger (see voting/ledger.py).
+    `frontier` holds the roots of the perfect subtrees on the tree's right edge.
+    """
+    election = models.OneToOneField(Election, on_delete=models.CASCADE, related_name='ledger')
+    size = models.BigIntegerField(default=0)
+    root = models.CharField(max_length=64, blank=True)
+    frontier = models.JSONField(default=list)
+    last_vote_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ledger for {self.election.name}: {self.size} ballots"
+
+
+class LedgerNode(models.Model):
+    """
+    A completed Merkle subtree root; level 0 rows are ballot leaves (receipts).
+    vote_id is deliberately not a foreign key: the ledger must survive edits
+    and deletions of the Vote rows it attests to.
+    """
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='ledger_nodes')
+    level = models.PositiveSmallIntegerField()
+    index = models.BigIntegerField()
+    digest = models.CharField(max_length=64)
+    vote_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('election', 'level', 'index')
+        indexes = [
+            models.Index(fields=['digest']),  # receipt lookups
+        ]
+
+    def __str__(self):
+        return f"Ledger node {self.level}/{self.index} of election {self.election_id}"
 
 
 class LoginToken(models.Model):
@@ -122,6 +421,7 @@ class LoginToken(models.Model):
         indexes = [
             models.Index(fields=['token', 'is_used']),
             models.Index(fields=['expires_at']),
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
@@ -161,3 +461,224 @@ class LoginToken(models.Model):
             models.Q(expires_at__lt=timezone.now()) | models.Q(is_used=True),
             created_at__lt=cutoff_date
         ).delete()
+
+
+class RequestProfile(models.Model):
+    """
+    A profiled request (voting/profiling.py): timings, every SQL statement
+    with the code that issued it, and cProfile stats to download.
+    """
+    TRIGGER_CHOICES = [
+        ('header', 'Signed header'),
+        ('sample', 'Sampling'),
+    ]
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    sql_count = models.PositiveIntegerField()
+    sql_ms = models.FloatField()
+    # [{'alias', 'sql', 'ms', 'origin'}] in execution order; parameters are not kept
+    queries = models.JSONField(default=list)
+    # Marshalled pstats data, the format of cProfile's dump_stats()
+    stats = models.BinaryField()
+    summary = models.TextField(help_text="Top functions by cumulative time")
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class ElectionArchive(models.Model):
+    """
+    Ballots of a finalised election moved out of the Vote table into gzipped
+    NDJSON files under settings.ARCHIVE_DIR (see voting/archive.py).
+    """
+    election = models.OneToOneField(Election, on_delete=models.CASCADE, related_name='archive')
+    votes_file = models.CharField(max_length=255)
+    ranked_file = models.CharField(max_length=255, blank=True)
+    vote_count = models.PositiveIntegerField()
+    ranked_count = models.PositiveIntegerField(default=0)
+    size_bytes = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64, help_text="Checksum of the votes file")
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archive of {self.election.name} ({self.vote_count} votes)"
+
+
+class DeletionJob(models.Model):
+    """
+    Background removal of an election's rows in small primary-key batches,
+    run by `manage.py run_deletion_jobs` (see voting/deletion.py).
+    """
+    KIND_CHOICES = [
+        ('votes', 'Archived ballots'),
+        ('election', 'Whole election'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Not a foreign key: the job outlives the election it deletes
+    election_id = models.PositiveIntegerField()
+    election_name = models.CharField(max_length=255)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    total = models.PositiveIntegerField(null=True, blank=True, help_text="Rows to delete, counted when the job starts")
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Bumped after every batch; a running job that stops bumping it is picked up again
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Delete {self.get_kind_display().lower()} of {self.election_name} ({self.status})"
+
+    def progress(self):
+        """Percentage of rows deleted, or None before the job has counted them"""
+        if self.status == 'done':
+            return 100
+        if not self.total:
+            return None
+        return min(100, round(self.deleted / self.total * 100))
+
+
+class MailingJob(models.Model):
+    """
+    A bulk email to every user matching its filters (by default the electorate
+    of `election`), sent by `manage.py send_announcement` (see voting/mailer.py).
+    Recipients are walked in primary-key order and last_user_id is saved after
+    every batch, so a stopped job resumes where it left off.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('paused', 'Paused'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    election = models.ForeignKey(Election, on_delete=models.SET_NULL, null=True, blank=True,
+                                 help_text="Send to its eligible voters, and fill in {{ election }}")
+    role = models.CharField(max_length=10, choices=CustomUser.ROLE_CHOICES, blank=True,
+                            help_text="Blank: any role")
+    branches = models.JSONField(default=list, blank=True, help_text="Branch codes; empty: every branch")
+    years = models.JSONField(default=list, blank=True, help_text="Years of study; empty: every year")
+    subject = models.CharField(max_length=200)
+    body = models.TextField(help_text="Django template; {{ name }} and {{ election }} are filled in")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total = models.PositiveIntegerField(null=True, blank=True)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    last_user_id = models.BigIntegerField(default=0, help_text="Every recipient up to this user id has been handled")
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='mailing_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+    def recipients(self):
+        users = self.election.eligible_voters() if self.election_id else CustomUser.objects.all()
+        users = users.filter(is_active=True).exclude(email='')
+        if self.role:
+            users = users.filter(role=self.role)
+        if self.branches:
+            users = users.filter(branch__in=self.branches)
+        if self.years:
+            users = users.filter(year_of_study__in=self.years)
+        return users
+
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        if not self.total:
+            return None
+        return min(100, round((self.sent + self.failed) / self.total * 100))
+
+
+class QueuedBallot(models.Model):
+    """
+    A ballot cast at a polling-station kiosk (settings.KIOSK_ID set) and kept in
+    the kiosk's own database until `manage.py kiosk_sync` delivers it to the
+    central server (see voting/kiosk.py). `signature` is an HMAC of the
+    ballot under the kiosk's secret; the outcome the server reported is kept.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('accepted', 'Accepted'),
+        ('duplicate', 'Duplicate'),
+        ('rejected', 'Rejected'),
+    ]
+
+    ballot_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    voter = models.ForeignKey(VoterProfile, on_delete=models.CASCADE)
+    candidate_ids = models.JSONField()
+    ranking = models.JSONField(default=list, blank=True, help_text="Full preference order of a ranked ballot")
+    cast_at = models.DateTimeField(default=timezone.now)
+    signature = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    detail = models.CharField(max_length=255, blank=True)
+    synced_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('voter', 'election')  # one ballot per voter at this kiosk, as in Vote
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Kiosk ballot {self.ballot_id} ({self.status})"
+
+
+class KioskBallot(models.Model):
+    """
+    The central server's record of every ballot a kiosk has synced, by its
+    ballot id, so a batch sent again (e.g. after a lost response) gets the same
+    answers without casting anything twice.
+    """
+    STATUS_CHOICES = [
+        ('accepted', 'Accepted'),
+        ('duplicate', 'Duplicate'),
+        ('rejected', 'Rejected'),
+    ]
+
+    ballot_id = models.UUIDField(unique=True)
+    kiosk = models.CharField(max_length=50)
+    batch = models.UUIDField(help_text="The sync request it arrived in")
+    # Not foreign keys: rejected ballots may name an unknown election or voter
+    election_id = models.PositiveIntegerField(null=True)
+    voter_id = models.PositiveIntegerField(null=True)
+    cast_at = models.DateTimeField(null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    detail = models.CharField(max_length=255, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kiosk', 'received_at']),
+            models.Index(fields=['batch']),
+        ]
+
+    def __str__(self):
+        return f"{self.kiosk}: {self.ballot_id} ({self.status})"
@@ -0,0 +1,31 @@
+"""
+Keyset (seek) pagination helpers.
+Pages are addressed by the last primary key seen instead of an OFFSET, so
+fetching page 500 costs the same index seek as fetching page 1.
+"""
+
+
+def parse_cursor(value):
+    """Turn a ?after= query value into a primary key, ignoring junk."""
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def keyset_page(queryset, after=None, page_size=50):
+    """
+    Return (rows, next_cursor) for the page that starts after primary key `after`.
+    next_cursor is None on the last page. A values() queryset must include 'id'.
+    """
+    queryset = queryset.order_by('pk')
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    # Fetch one extra row to learn whether another page exists without a COUNT
+    rows = list(queryset[:page_size + 1])
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        return rows, last['id'] if isinstance(last, dict) else last.pk
+    return rows, None
@@ -0,0 +1,161 @@
+"""
+On-demand request profiling.
+
+RequestProfilingMiddleware sits first in MIDDLEWARE, so a profiled request
+covers the rest of the middleware, the view, the ORM and template rendering.
+A request is profiled when:
+- it carries an X-Profile header holding a token from
+  `manage.py profile_token <admin email>` (signed, valid for TOKEN_TIMEOUT,
+  and only while its user is still an active admin), or
+- its path starts with one of settings.PROFILE_SAMPLE_PATHS and it is picked
+  at settings.PROFILE_SAMPLE_RATE.
+
+The whole request runs under cProfile. Every SQL statement on every
+configured database is recorded with its duration and the first frame
+outside Django that issued it. The result is stored as a RequestProfile,
+listed in the admin with a .prof download (snakeviz, pstats). Only the path
+is stored, never the query string, so ballots and login tokens do not end up
+in profiles.
+
+Requests that are not profiled pay for one header lookup, plus one random()
+call when sampling is configured.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+HEADER = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'voting.profiling'
+TOKEN_TIMEOUT = 60 * 60
+# Profiles kept; older ones are deleted as new ones come in
+KEEP = 200
+SUMMARY_LINES = 40
+
+_DJANGO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(signing.__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def make_token(user):
+    """Header value that lets `user` (an admin) profile their requests for TOKEN_TIMEOUT."""
+    return signing.dumps({'user': user.pk}, salt=TOKEN_SALT)
+
+
+def read_token(value):
+    """The admin user id in a token, or None if it is forged or expired."""
+    try:
+        return signing.loads(value, salt=TOKEN_SALT, max_age=TOKEN_TIMEOUT)['user']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def is_admin(user_id):
+    """Whether the user a token was issued to may still profile: demoted or deactivated admins may not."""
+    from .models import CustomUser
+    return CustomUser.objects.filter(pk=user_id, role='admin', is_active=True).exists()
+
+
+def _origin():
+    """The innermost caller outside Django and this module, as 'path:line in function'."""
+    frame = sys._getframe(2)
+    while frame:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if (filename != _THIS_FILE and not filename.startswith(_DJANGO_DIR)
+                and 'site-packages' not in filename):
+            return f"{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return ''
+
+
+class _QueryRecorder:
+    """Database execute wrapper collecting each statement's time and origin."""
+
+    def __init__(self, alias, queries):
+        self.alias = alias
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': self.alias,
+                'sql': sql,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+                'origin': _origin(),
+            })
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger, user_id = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return self.profile(request, trigger, user_id)
+
+    def trigger(self, request):
+        token = request.META.get(HEADER)
+        if token:
+            user_id = read_token(token)
+            if user_id is not None and is_admin(user_id):
+                return 'header', user_id
+        elif settings.PROFILE_SAMPLE_RATE and request.path.startswith(tuple(settings.PROFILE_SAMPLE_PATHS)):
+            if random.random() < settings.PROFILE_SAMPLE_RATE:
+                return 'sample', None
+        return None, None
+
+    def profile(self, request, trigger, user_id):
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            queries = []  # shared, so statements on every database stay in order
+            for alias in list(connections.settings):
+                stack.enter_context(connections[alias].execute_wrapper(_QueryRecorder(alias, queries)))
+            started = time.perf_counter()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is already running in this thread
+                return self.get_response(request)
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration_ms = (time.perf_counter() - started) * 1000
+
+        if user_id is None and getattr(request, 'user', None) is not None and request.user.is_authenticated:
+            user_id = request.user.pk
+        self.save(request, response, trigger, user_id, duration_ms, queries, profiler)
+        return response
+
+    def save(self, request, response, trigger, user_id, duration_ms, queries, profiler):
+        from .models import RequestProfile
+
+        profiler.create_stats()
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        profile = RequestProfile.objects.create(
+            user_id=user_id,
+            trigger=trigger,
+            method=request.method,
+            path=request.path[:500],
+            status_code=response.status_code,
+            duration_ms=round(duration_ms, 3),
+            sql_count=len(queries),
+            sql_ms=round(sum(q['ms'] for q in queries), 3),
+            queries=queries,
+            stats=marshal.dumps(profiler.stats),
+            summary=summary.getvalue(),
+        )
+        RequestProfile.objects.filter(pk__lte=profile.pk - KEEP).delete()
@@ -0,0 +1,73 @@
+"""
+Independent parallel recount of an election.
+
+The election's vote ids are split into primary-key ranges, and each range is
+tallied in a worker process. Workers read the raw candidate ids and count
+them into a flat array('q'); they do not use the database's own COUNT.
+The parent process adds the arrays together.
+"""
+import multiprocessing
+import os
+from array import array
+
+from django.db import connections
+
+UNKNOWN = -1  # slot key for candidate ids that no longer exist
+
+
+def _init_worker():
+    # Only needed with the spawn start method (macOS/Windows): set Django up in the child
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'voting_system.settings')
+        django.setup()
+
+
+def tally_range(election_id, low, high, slots, chunk_size=10000):
+    """Count the votes with low <= pk < high. Returns (counts array, rows read)."""
+    from .sharding import votes_for
+
+    counts = array('q', bytes(8 * len(slots)))
+    unknown = slots[UNKNOWN]
+    rows = 0
+    candidate_ids = votes_for(election_id).filter(pk__gte=low, pk__lt=high).values_list(
+        'candidate_id', flat=True
+    ).iterator(chunk_size=chunk_size)
+    for candidate_id in candidate_ids:
+        counts[slots.get(candidate_id, unknown)] += 1
+        rows += 1
+    connections.close_all()
+    return counts, rows
+
+
+def split_ranges(low, high, parts):
+    """Split [low, high] into at most `parts` half-open pk ranges."""
+    span = high - low + 1
+    parts = max(1, min(parts, span))
+    step = -(-span // parts)  # ceiling division
+    return [(start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+
+
+def parallel_tally(election_id, candidate_ids, low, high, workers, ranges):
+    """Tally votes low..high of an election across `workers` processes. Returns ({candidate_id: votes}, rows)."""
+    slots = {candidate_id: i for i, candidate_id in enumerate(candidate_ids)}
+    slots[UNKNOWN] = len(candidate_ids)
+    jobs = [(election_id, start, stop, slots) for start, stop in split_ranges(low, high, ranges)]
+
+    # Forked children must not share the parent's open database handles
+    connections.close_all()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+    totals = array('q', bytes(8 * len(slots)))
+    rows = 0
+    with context.Pool(processes=workers, initializer=_init_worker) as pool:
+        for counts, read in pool.starmap(tally_range, jobs, chunksize=1):
+            for i, value in enumerate(counts):
+                totals[i] += value
+            rows += read
+
+    tally = {candidate_id: totals[slot] for candidate_id, slot in slots.items()}
+    if not tally[UNKNOWN]:
+        del tally[UNKNOWN]
+    return tally, rows
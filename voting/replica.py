@@ -0,0 +1,74 @@
+"""
+Read-replica support.
+
+Views decorated with @read_replica send their ORM reads for voting models to
+the 'replica' database alias, unless:
+- no replica is configured (DATABASES has no 'replica' entry),
+- the replica is older than settings.REPLICA_LAG_TOLERANCE seconds, or
+- the session wrote something recently (pin_to_primary), so it could read
+  its own writes back stale.
+
+Locally the replica is a SQLite snapshot of db.sqlite3 refreshed by
+`manage.py refresh_replica --interval N`.
+"""
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+PIN_SESSION_KEY = 'pin_primary_until'
+
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in connections.settings
+
+
+def replica_lag():
+    """Seconds since the replica snapshot was taken (0 if the backend can't tell)."""
+    config = connections.settings[REPLICA_DB_ALIAS]
+    if config['ENGINE'] != 'django.db.backends.sqlite3':
+        return 0
+    try:
+        return max(0.0, time.time() - os.path.getmtime(config['NAME']))
+    except OSError:
+        return float('inf')
+
+
+def pin_to_primary(request):
+    """
+    Keep this session on the primary for one lag window after a write.
+    Any replica that is fresh enough to be used after that already has the write.
+    """
+    if hasattr(request, 'session'):
+        request.session[PIN_SESSION_KEY] = time.time() + settings.REPLICA_LAG_TOLERANCE
+
+
+def use_replica_for(request):
+    if not replica_configured():
+        return False
+    if hasattr(request, 'session') and request.session.get(PIN_SESSION_KEY, 0) > time.time():
+        return False
+    return replica_lag() <= settings.REPLICA_LAG_TOLERANCE
+
+
+def reading_from_replica():
+    return _reading_from_replica.get()
+
+
+def read_replica(view_func):
+    """Decorator: serve this view's reads from the replica when it is safe to."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = _reading_from_replica.set(use_replica_for(request))
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _reading_from_replica.reset(token)
+    return wrapper
@@ -0,0 +1,71 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from .replica import REPLICA_DB_ALIAS, reading_from_replica
+from .sharding import SHARDED_MODELS, is_shard_alias, sharding_enabled, vote_db
+
+
+class ElectionShardRouter:
+    """
+    Route Vote rows to their election's SQLite shard (see voting/sharding.py).
+    Everything else - users, sessions, login tokens, elections - stays on the
+    default database.
+    """
+
+    def _is_sharded(self, model):
+        return model._meta.app_label == 'voting' and model._meta.model_name in SHARDED_MODELS
+
+    def _route(self, model, hints):
+        if not sharding_enabled():
+            return None
+        instance = hints.get('instance')
+        if self._is_sharded(model):
+            election_id = getattr(instance, 'election_id', None)
+            return vote_db(election_id) if election_id else None
+        if instance is not None and self._is_sharded(type(instance)):
+            # Related lookups from a Vote (vote.voter, prefetches) would otherwise
+            # follow the Vote into its shard.
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if sharding_enabled() and (self._is_sharded(type(obj1)) or self._is_sharded(type(obj2))):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if is_shard_alias(db):
+            return app_label == 'voting' and model_name in SHARDED_MODELS
+        return None
+
+
+class ReplicaRouter:
+    """
+    Send reads of voting models to the read replica inside @read_replica views
+    (see voting/replica.py). Writes, sessions and everything outside those
+    views use the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'voting' and reading_from_replica():
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        primary = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in primary and obj2._state.db in primary:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DB_ALIAS:
+            return False  # the replica is a copy of the default database
+        return None
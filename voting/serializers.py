@@ -0,0 +1,75 @@
+"""
+Serializers of the read-only JSON API (voting/api.py).
+
+They read plain dicts, from values() querysets or the per-election caches in
+voting/caching.py, never model instances. A serializer whose rows come from
+the database lists the columns it reads in VALUES, so the view asks for
+exactly those: no model is built and nothing is loaded lazily per row.
+"""
+from rest_framework import serializers
+
+
+class ElectionSerializer(serializers.Serializer):
+    VALUES = ('id', 'name', 'start_date', 'end_date', 'is_active', 'voting_method', 'seats')
+
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    start_date = serializers.DateTimeField()
+    end_date = serializers.DateTimeField()
+    is_active = serializers.BooleanField()
+    voting_method = serializers.CharField()
+    seats = serializers.IntegerField()
+
+
+class CandidateSerializer(serializers.Serializer):
+    """A candidate on the ballot, as caching.ballot_candidates() keeps them"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    party = serializers.CharField()
+    position = serializers.CharField()
+    slogan = serializers.CharField()
+    manifesto = serializers.CharField()
+
+
+class ResultSerializer(serializers.Serializer):
+    VALUES = ('id', 'position', 'user__first_name', 'user__last_name', 'user__username')
+
+    candidate = serializers.IntegerField()
+    name = serializers.CharField()
+    position = serializers.CharField()
+    votes = serializers.IntegerField()
+    percentage = serializers.FloatField()
+    leading = serializers.BooleanField()
+
+
+class RoundRowSerializer(serializers.Serializer):
+    candidate = serializers.IntegerField()
+    votes = serializers.FloatField()
+    elected = serializers.BooleanField()
+    eliminated = serializers.BooleanField()
+
+
+class RoundSerializer(serializers.Serializer):
+    number = serializers.IntegerField()
+    quota = serializers.FloatField()
+    exhausted = serializers.FloatField()
+    rows = RoundRowSerializer(many=True)
+
+
+class TurnoutSerializer(serializers.Serializer):
+    """One branch or year of study, as caching.turnout_breakdown() keeps them"""
+    label = serializers.CharField()
+    ballots = serializers.IntegerField()
+    eligible = serializers.IntegerField()
+    turnout = serializers.FloatField()
+
+
+class VoterStatusSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    role = serializers.CharField()
+    branch = serializers.CharField(allow_null=True)
+    year_of_study = serializers.CharField(allow_null=True)
+    election = serializers.IntegerField(allow_null=True)
+    eligible = serializers.BooleanField()
+    has_voted = serializers.BooleanField()
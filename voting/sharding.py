@@ -0,0 +1,147 @@
+"""
+Per-election SQLite shards for ballot storage.
+
+When settings.VOTE_SHARD_DIR is set, the Vote, RankedBallot and Ballot rows of
+each election live in their own SQLite file (<VOTE_SHARD_DIR>/election_<id>.sqlite3),
+so ballots for one election never wait on the writer lock held by logins,
+sessions or other elections. Shards are registered, created and migrated the first time they
+are used. With VOTE_SHARD_DIR unset everything stays in the default database.
+
+Code that touches votes should go through votes_for()/ranked_ballots_for()/
+ballots_for()/vote_db() rather than Vote.objects, because a plain Vote.objects.filter()
+carries no election hint the router could use.
+"""
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.migrations.executor import MigrationExecutor
+
+# Models (by model_name) whose rows are stored in the election's shard
+SHARDED_MODELS = {'vote', 'rankedballot', 'ballot'}
+
+SHARD_PREFIX = 'election_'
+
+_ready = set()
+_lock = threading.Lock()
+
+
+def sharding_enabled():
+    return bool(getattr(settings, 'VOTE_SHARD_DIR', ''))
+
+
+def is_shard_alias(alias):
+    return alias.startswith(SHARD_PREFIX)
+
+
+def shard_path(election_id):
+    return Path(settings.VOTE_SHARD_DIR) / f'{SHARD_PREFIX}{election_id}.sqlite3'
+
+
+def vote_db(election_id):
+    """
+    Return the database alias holding the votes of `election_id`, creating and
+    migrating the shard on first use.
+    """
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    alias = f'{SHARD_PREFIX}{int(election_id)}'
+    if alias not in _ready:
+        with _lock:
+            if alias not in _ready:
+                _register(alias, election_id)
+                _migrate(alias)
+                _ready.add(alias)
+    return alias
+
+
+def votes_for(election):
+    """Vote queryset for one election (an Election or its id), on the right database."""
+    return _for_election(_model('Vote'), election)
+
+
+def ranked_ballots_for(election):
+    """RankedBallot queryset for one election, stored alongside its votes."""
+    return _for_election(_model('RankedBallot'), election)
+
+
+def ballots_for(election):
+    """Ballot queryset (one row per voter who voted) for one election, stored alongside its votes."""
+    return _for_election(_model('Ballot'), election)
+
+
+def _for_election(model, election):
+    election_id = getattr(election, 'pk', election)
+    rows = model.objects.filter(election_id=election_id)
+    if sharding_enabled():
+        return rows.using(vote_db(election_id))
+    return rows  # leave default/replica to the routers
+
+
+def vote_databases():
+    """Every database alias that may hold Vote rows."""
+    if not sharding_enabled():
+        return [DEFAULT_DB_ALIAS]
+    shard_dir = Path(settings.VOTE_SHARD_DIR)
+    if not shard_dir.is_dir():
+        return []
+    return [vote_db(path.stem[len(SHARD_PREFIX):]) for path in sorted(shard_dir.glob(f'{SHARD_PREFIX}*.sqlite3'))]
+
+
+def drop_shard(election_id):
+    """Delete an election's shard file (used once the election itself is deleted)."""
+    if not sharding_enabled():
+        return
+    alias = f'{SHARD_PREFIX}{int(election_id)}'
+    with _lock:
+        if alias in connections.settings:
+            connections[alias].close()
+        _ready.discard(alias)
+        path = shard_path(election_id)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(f'{path}{suffix}'):
+                os.remove(f'{path}{suffix}')
+
+
+def _model(name):
+    from django.apps import apps
+    return apps.get_model('voting', name)
+
+
+def _register(alias, election_id):
+    if alias in connections.settings:
+        return
+    os.makedirs(settings.VOTE_SHARD_DIR, exist_ok=True)
+    default = connections.settings[DEFAULT_DB_ALIAS]
+    connections.settings[alias] = {
+        **default,
+        'NAME': str(shard_path(election_id)),
+        'OPTIONS': {
+            **default.get('OPTIONS', {}),
+            # Voters, candidates and elections live in the default database, so
+            # the shard cannot enforce the Vote foreign keys itself.
+            'init_command': 'PRAGMA foreign_keys = OFF; PRAGMA journal_mode = WAL; PRAGMA synchronous = NORMAL',
+        },
+        'TEST': {**default.get('TEST', {}), 'NAME': None},
+    }
+
+
+def _migrate(alias):
+    from django.core.management import call_command
+
+    connection = connections[alias]
+    executor = MigrationExecutor(connection)
+    if not executor.migration_plan(executor.loader.graph.leaf_nodes()):
+        return
+    try:
+        call_command('migrate', database=alias, interactive=False, verbosity=0)
+    except OperationalError:
+        # Another worker migrated the same shard at the same moment
+        executor = MigrationExecutor(connection)
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            raise
+    # The schema editor turns foreign key enforcement back on when it exits;
+    # reconnect so the shard's init_command applies again.
+    connection.close()
@@ -1,10 +1,18 @@
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import VoterProfile, CandidateProfile
+from django.utils import timezone
+from .models import VoterProfile, CandidateProfile, Election, EligibilityRule
+from .caching import bump_version
 
 User = get_user_model()
 
+# User fields that decide which elections a voter is eligible for
+ELIGIBILITY_FIELDS = ('role', 'branch', 'year_of_study')
+
+_UNCHANGED = object()
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     """Create profile when user role is assigned"""
@@ -20,4 +28,75 @@ def save_user_profile(sender, instance, **kwargs):
     if instance.role == 'voter':
         VoterProfile.objects.get_or_create(user=instance)
     elif instance.role == 'candidate':
-        CandidateProfile.objects.get_or_create(user=instance)
\ No newline at end of file
+        CandidateProfile.objects.get_or_create(user=instance)
+
+# ===============================================
+# Electorate sizes (Election.eligible_voter_count)
+# ===============================================
+
+def _adjust_electorates(before, after):
+    """Move one user from the electorates `before` admits to those `after` admits (None = nobody)."""
+    joined, left = [], []
+    for election in Election.objects.filter(end_date__gt=timezone.now()):
+        was = before is not None and election.is_eligible(before)
+        now = after is not None and election.is_eligible(after)
+        if now and not was:
+            joined.append(election.pk)
+        elif was and not now:
+            left.append(election.pk)
+    if joined:
+        Election.objects.filter(pk__in=joined).update(eligible_voter_count=F('eligible_voter_count') + 1)
+    if left:
+        Election.objects.filter(pk__in=left).update(eligible_voter_count=F('eligible_voter_count') - 1)
+
+@receiver(pre_save, sender=User)
+def remember_eligibility_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the user's old role/branch/year so post_save can tell which electorates changed"""
+    instance._eligibility_before = None
+    if raw or (update_fields is not None and not set(update_fields) & set(ELIGIBILITY_FIELDS)):
+        instance._eligibility_before = _UNCHANGED  # e.g. the last_login update on every login
+    elif not instance._state.adding:
+        old = User.objects.filter(pk=instance.pk).values(*ELIGIBILITY_FIELDS).first()
+        instance._eligibility_before = User(**old) if old else None
+
+@receiver(post_save, sender=User)
+def update_electorates_on_save(sender, instance, raw=False, **kwargs):
+    before = getattr(instance, '_eligibility_before', None)
+    if raw or before is _UNCHANGED:
+        return
+    if before is not None and all(getattr(before, f) == getattr(instance, f) for f in ELIGIBILITY_FIELDS):
+        return
+    _adjust_electorates(before, instance)
+
+@receiver(post_delete, sender=User)
+def update_electorates_on_delete(sender, instance, **kwargs):
+    if instance.role == 'voter':
+        _adjust_electorates(instance, None)
+
+@receiver(post_save, sender=Election)
+def count_new_electorate(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Election.refresh_eligible_counts([instance.pk])
+
+@receiver(post_save, sender=EligibilityRule)
+@receiver(post_delete, sender=EligibilityRule)
+def recount_electorate(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        bump_version(instance.election_id)
+        Election.refresh_eligible_counts([instance.election_id])
+
+# ===============================================
+# Cache invalidation (voting/caching.py)
+# ===============================================
+
+@receiver(post_save, sender=Election)
+@receiver(post_delete, sender=Election)
+def invalidate_election_caches(sender, instance, **kwargs):
+    bump_version(instance.pk)
+
+@receiver(post_save, sender=CandidateProfile)
+@receiver(post_delete, sender=CandidateProfile)
+def invalidate_ballots(sender, instance, **kwargs):
+    # A candidate may have moved between elections or stand in all of them
+    for election_id in Election.objects.filter(end_date__gt=timezone.now()).values_list('pk', flat=True):
+        bump_version(election_id)
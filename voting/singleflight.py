@@ -0,0 +1,170 @@
+"""
+Single-flight computation of expensive cache entries.
+
+When a hot entry expires at peak, only one caller recomputes it. Everyone
+else either waits for that result or gets the previous value:
+
+- Within a process, concurrent callers for the same key share one
+  computation through a threading.Event.
+- Across workers, the caller that wins cache.add() on a short-lived lock key
+  computes. The others return the stale copy kept under "<key>:stale", or,
+  if there is none, poll the cache until the fresh value appears. Should the
+  computation fail or stall past LOCK_TIMEOUT, its lock goes away and the
+  next poll to win cache.add() on it takes over; nobody computes without it.
+
+Each outcome (hit, computed, coalesced, stale) is counted per process, and
+the counts are added to shared ones in the cache in batches, so a hit costs
+no extra cache round trip. stats() shows how many requests were coalesced.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+# Seconds a computation may hold the cross-worker lock
+LOCK_TIMEOUT = 10
+# Seconds a caller waits on the computation in its own process before
+# turning to the cross-worker lock
+WAIT_TIMEOUT = 5
+POLL_INTERVAL = 0.05
+# How long the stale copy outlives the fresh value
+STALE_GRACE = 10 * 60
+
+OUTCOMES = ('hit', 'computed', 'coalesced', 'stale')
+# Outcomes counted in this process are added to the shared counts once this
+# many are pending, or when a count comes in this many seconds after the last flush
+FLUSH_EVERY = 100
+FLUSH_INTERVAL = 5
+
+_counts = Counter()
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flushed_at = time.monotonic()
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+def fetch(key, compute, timeout, refresh=False):
+    """
+    Return the cached value of `key`, calling compute() on a miss - at most
+    once at a time per key. refresh=True recomputes unconditionally (used
+    to warm caches).
+    """
+    if not refresh:
+        value = cache.get(key)
+        if value is not None:
+            _count('hit')
+            return value
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if flight.done.wait(WAIT_TIMEOUT) and not flight.failed:
+            _count('coalesced')
+            return flight.value
+        return _coordinate(key, compute, timeout)  # the leader failed or stalled
+
+    try:
+        flight.value = _lead(key, compute, timeout, refresh)
+        return flight.value
+    except BaseException:
+        flight.failed = True
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _lead(key, compute, timeout, refresh):
+    if refresh:
+        return _compute(key, compute, timeout)
+    return _coordinate(key, compute, timeout)
+
+
+def _coordinate(key, compute, timeout):
+    """Compute `key` holding the cross-worker lock, or wait for whoever holds it."""
+    lock = f'{key}:lock'
+    if cache.add(lock, True, LOCK_TIMEOUT):
+        return _compute_locked(key, compute, timeout, lock)
+
+    # Another worker is computing this key
+    stale = cache.get(f'{key}:stale')
+    if stale is not None:
+        _count('stale')
+        return stale
+    # The lock expires, or is deleted if the computation fails, so one of the
+    # callers polling here gets it within LOCK_TIMEOUT
+    while True:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            _count('coalesced')
+            return value
+        if cache.add(lock, True, LOCK_TIMEOUT):
+            return _compute_locked(key, compute, timeout, lock)
+
+
+def _compute_locked(key, compute, timeout, lock):
+    try:
+        return _compute(key, compute, timeout)
+    finally:
+        cache.delete(lock)
+
+
+def _compute(key, compute, timeout):
+    value = compute()
+    cache.set(key, value, timeout)
+    cache.set(f'{key}:stale', value, timeout + STALE_GRACE)
+    _count('computed')
+    return value
+
+
+def _count(outcome):
+    with _pending_lock:
+        _counts[outcome] += 1
+        _pending[outcome] += 1
+        due = _pending.total() >= FLUSH_EVERY or time.monotonic() - _flushed_at >= FLUSH_INTERVAL
+    if due:
+        _flush()
+
+
+def _flush():
+    """Add this process's pending outcome counts to the shared ones."""
+    global _flushed_at
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    for outcome, n in pending.items():
+        key = f'voting:singleflight:{outcome}'
+        try:
+            cache.incr(key, n)
+        except ValueError:
+            if not cache.add(key, n, None):
+                cache.incr(key, n)
+
+
+def stats():
+    """
+    Outcome counts for this process and for every worker sharing the cache.
+    Other workers' counts lag by up to FLUSH_EVERY outcomes or FLUSH_INTERVAL seconds.
+    """
+    _flush()
+    shared = cache.get_many([f'voting:singleflight:{outcome}' for outcome in OUTCOMES])
+    return {
+        'process': {outcome: _counts[outcome] for outcome in OUTCOMES},
+        'all_workers': {outcome: shared.get(f'voting:singleflight:{outcome}', 0) for outcome in OUTCOMES},
+    }
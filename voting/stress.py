@@ -0,0 +1,120 @@
+"""
+Invariants and lock statistics for `manage.py stress_test`.
+
+The ballot path relies on a check-then-insert in submit_vote_view, backed by
+Ballot's unique (voter, election) row, and on counters (VoterProfile.has_voted,
+CandidateProfile.votes_received) bumped in the same transaction as the
+ballot. stress_test fires contending submissions, role promotions and
+election toggles at a file-backed database from several processes, then
+calls check_invariants() to confirm that none of them left the data
+inconsistent.
+
+LockStats is installed on a thread's connection with execute_wrapper(). It
+times every write statement: SQLite waits out a lock held by another
+connection inside the statement (up to the busy timeout), so the time a
+write takes under contention is, in the main, time spent waiting for the
+lock. It also counts the statements that failed with 'database is locked'
+and with integrity errors.
+"""
+import threading
+import time
+
+from django.db import IntegrityError, OperationalError
+from django.db.models import Count
+
+from .models import Ballot, CandidateProfile, CustomUser, Election, RankedBallot, Vote, VoterProfile
+from .sharding import vote_databases
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'BEGIN')
+
+
+class LockStats:
+    """Write timings and lock errors of the connections it wraps; safe to share between threads."""
+
+    def __init__(self):
+        self.write_ms = []
+        self.locked = 0
+        self.integrity_errors = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip()[:6].upper().startswith(WRITES):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if 'locked' in str(e):
+                with self.lock:
+                    self.locked += 1
+            raise
+        except IntegrityError:
+            with self.lock:
+                self.integrity_errors += 1
+            raise
+        finally:
+            with self.lock:
+                self.write_ms.append((time.perf_counter() - started) * 1000)
+
+    def as_dict(self):
+        return {'write_ms': self.write_ms, 'locked': self.locked, 'integrity_errors': self.integrity_errors}
+
+
+def check_invariants(accepted=None):
+    """
+    Every way the ballot data can disagree with itself, as a list of
+    human-readable violations; empty when it is consistent. `accepted` is the
+    number of ballots the views accepted, when known: each must have gone to
+    a different voter/election pair.
+    """
+    violations = []
+    # Votes are read from every shard; counters live on the default database
+    per_candidate, voted, pairs = {}, set(), 0
+    for db in vote_databases():
+        votes = Vote.objects.using(db)
+        ballots = Ballot.objects.using(db)
+        for row in ballots.values('voter_id', 'election_id').annotate(n=Count('pk')).filter(n__gt=1):
+            violations.append(f"voter {row['voter_id']} has {row['n']} ballots in election {row['election_id']}")
+        with_vote = set(votes.values_list('voter_id', 'election_id').distinct())
+        with_ballot = set(ballots.values_list('voter_id', 'election_id'))
+        for voter_id, election_id in sorted(with_vote ^ with_ballot):
+            violations.append(f'voter {voter_id} has votes without a ballot (or the reverse) in election {election_id}')
+        pairs += len(with_vote)
+        for row in (votes.values('voter_id', 'election_id', 'position')
+                    .annotate(n=Count('pk')).filter(n__gt=1)):
+            violations.append(f"voter {row['voter_id']} has {row['n']} votes for "
+                              f"{row['position'] or 'the race'} in election {row['election_id']}")
+        for row in votes.values('candidate_id').annotate(n=Count('pk')):
+            per_candidate[row['candidate_id']] = per_candidate.get(row['candidate_id'], 0) + row['n']
+        voted.update(votes.values_list('voter_id', flat=True).distinct())
+
+        ranked = RankedBallot.objects.using(db)
+        for row in ranked.values('voter_id', 'election_id').annotate(n=Count('pk')).filter(n__gt=1):
+            violations.append(f"voter {row['voter_id']} has {row['n']} ranked ballots in election {row['election_id']}")
+        ranked_elections = Election.objects.exclude(voting_method='fptp').values_list('pk', flat=True)
+        with_vote = set(votes.filter(election_id__in=ranked_elections).values_list('voter_id', 'election_id'))
+        with_ranking = set(ranked.values_list('voter_id', 'election_id'))
+        for voter_id, election_id in sorted(with_vote ^ with_ranking):
+            violations.append(f'voter {voter_id} has a first preference without a ranking (or the reverse) '
+                              f'in election {election_id}')
+
+    for candidate_id, votes_received in CandidateProfile.objects.values_list('pk', 'votes_received'):
+        if votes_received != per_candidate.get(candidate_id, 0):
+            violations.append(f'candidate {candidate_id} counts {votes_received} votes; '
+                              f'the Vote table has {per_candidate.get(candidate_id, 0)}')
+
+    if accepted is not None and accepted != pairs:
+        violations.append(f'{accepted} ballots were accepted, but votes were stored for {pairs} voter/election pairs')
+
+    not_flagged = VoterProfile.objects.filter(pk__in=voted, has_voted=False).values_list('pk', flat=True)
+    for voter_id in not_flagged:
+        violations.append(f'voter {voter_id} has voted but has_voted is False')
+
+    without_profile = CustomUser.objects.filter(role='candidate', candidateprofile__isnull=True)
+    for user_id in without_profile.values_list('pk', flat=True):
+        violations.append(f'user {user_id} is a candidate without a CandidateProfile')
+
+    active = list(Election.objects.filter(is_active=True).values_list('pk', flat=True))
+    if len(active) > 1:
+        violations.append(f'{len(active)} elections are active at once: {active}')
+    return violations
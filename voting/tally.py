@@ -0,0 +1,193 @@
+"""
+Ranked-choice tallies (instant runoff and STV) over a NumPy ballot matrix.
+
+An election's ranked ballots are loaded as one (ballots x MAX_RANKS) matrix
+of candidate columns. Each ballot carries a pointer to its highest-ranked
+continuing candidate and a weight. A round is a single bincount over the
+pointed-at columns, and a transfer advances the pointers of every affected
+ballot at once, so no step loops over individual ballots in Python.
+
+STV uses the Droop quota and Gregory surplus transfers: when a candidate is
+elected, every ballot counting for them keeps surplus / total of its current
+weight. Instant runoff is the one-seat case, won by a majority of the votes
+still in play.
+"""
+import numpy as np
+
+from .archive import archive_of, ranking_blobs
+from .models import RankedBallot
+from .sharding import ranked_ballots_for
+
+CHUNK_SIZE = 20000
+
+# Column values in the ballot matrix besides real candidates
+NO_PREFERENCE = -1
+
+# Float tolerance when comparing weighted tallies
+EPSILON = 1e-9
+
+
+def decode_rankings(blobs):
+    """Turn an iterable of RankedBallot.ranking blobs into an int32 matrix of candidate ids."""
+    return np.frombuffer(b''.join(blobs), dtype='<i4').reshape(-1, RankedBallot.MAX_RANKS)
+
+
+def to_columns(rankings, candidate_ids):
+    """
+    Map a matrix of candidate ids to column numbers (positions in candidate_ids).
+    Padding becomes NO_PREFERENCE; ids not in candidate_ids (withdrawn or
+    deleted candidates) become len(candidate_ids), a column that never
+    continues, so those preferences are skipped rather than ending the ballot.
+    """
+    # A lookup table indexed by candidate id: one gather instead of a search per cell
+    top_id = max(candidate_ids, default=0)
+    lookup = np.full(top_id + 2, len(candidate_ids), dtype=np.int32)
+    lookup[np.asarray(candidate_ids, dtype=np.intp)] = np.arange(len(candidate_ids), dtype=np.int32)
+    lookup[0] = NO_PREFERENCE
+    # Ids outside the table (deleted candidates) land on its last, withdrawn slot
+    return lookup[np.clip(rankings, 0, top_id + 1)]
+
+
+def load_ballots(election, candidate_ids, chunk_size=CHUNK_SIZE):
+    """Ranked ballots of `election` as a column matrix for count()."""
+    archive = archive_of(election)
+    if archive:
+        blobs = ranking_blobs(archive)
+    else:
+        blobs = ranked_ballots_for(election).values_list('ranking', flat=True).iterator(chunk_size=chunk_size)
+    return to_columns(decode_rankings(blobs), candidate_ids)
+
+
+def count(ballots, candidate_count, seats=1, majority=False):
+    """
+    Run elimination rounds over a column matrix from to_columns().
+
+    With majority=True (instant runoff) a candidate wins with more than half
+    of the continuing votes; otherwise candidates are elected on the Droop
+    quota of the first-round votes. Returns a dict with the elected columns
+    in order of election, the quota and one entry per round. Counting stops
+    once no votes are left in play, so an election without ballots (or whose
+    ballots are all exhausted) elects no one rather than whoever is left.
+    """
+    n, width = ballots.shape
+    k = candidate_count
+    # An extra NO_PREFERENCE column, so advancing past the last rank is safe
+    matrix = np.full((n, width + 1), NO_PREFERENCE, dtype=np.int32)
+    matrix[:, :width] = ballots
+
+    # continuing[k] is the withdrawn column; continuing[-1] is what NO_PREFERENCE indexes
+    continuing = np.zeros(k + 2, dtype=bool)
+    continuing[:k] = True
+    pointer = np.zeros(n, dtype=np.intp)
+    top = matrix[:, 0].copy()
+    weights = np.ones(n)
+
+    def advance(rows):
+        rows = rows[(top[rows] != NO_PREFERENCE) & ~continuing[top[rows]]]
+        while rows.size:
+            pointer[rows] += 1
+            top[rows] = matrix[rows, pointer[rows]]
+            rows = rows[(top[rows] != NO_PREFERENCE) & ~continuing[top[rows]]]
+
+    advance(np.arange(n))
+    quota = None
+    if not majority:
+        quota = np.floor(weights[top != NO_PREFERENCE].sum() / (seats + 1)) + 1
+
+    elected = []
+    rounds = []
+    while len(elected) < seats:
+        live = top != NO_PREFERENCE
+        if weights[live].sum() <= EPSILON:
+            break
+        tallies = np.bincount(top[live], weights=weights[live], minlength=k + 1)[:k]
+        hopeful = np.flatnonzero(continuing[:k])
+        record = {
+            'hopeful': hopeful,
+            'tallies': tallies,
+            'exhausted': float(weights[~live].sum()),
+            'quota': float(quota) if quota is not None else float(tallies[hopeful].sum() / 2),
+            'elected': [],
+            'eliminated': [],
+        }
+        rounds.append(record)
+        remaining = seats - len(elected)
+
+        if hopeful.size <= remaining:
+            # No more candidates than seats: everyone left is elected
+            winners = hopeful[np.argsort(-tallies[hopeful], kind='stable')]
+            record['elected'] = winners.tolist()
+            elected.extend(record['elected'])
+            break
+
+        if majority:
+            reached = tallies[hopeful] > record['quota'] + EPSILON
+        else:
+            reached = tallies[hopeful] >= quota - EPSILON
+        winners = hopeful[reached]
+        if winners.size:
+            winners = winners[np.argsort(-tallies[winners], kind='stable')][:remaining]
+            for column in winners:
+                if quota is not None and tallies[column] > 0:
+                    holders = live & (top == column)
+                    weights[holders] *= (tallies[column] - quota) / tallies[column]
+                continuing[column] = False
+            record['elected'] = winners.tolist()
+            elected.extend(record['elected'])
+            advance(np.flatnonzero(np.isin(top, winners)))
+        else:
+            loser = _lowest(hopeful, tallies, rounds[:-1])
+            continuing[loser] = False
+            record['eliminated'] = [loser]
+            advance(np.flatnonzero(top == loser))
+
+    return {'elected': elected, 'quota': None if quota is None else float(quota), 'rounds': rounds}
+
+
+def _lowest(hopeful, tallies, previous_rounds):
+    """
+    Candidate to eliminate: the lowest tally, ties broken by the most recent
+    earlier round in which the tied candidates differed, then by list order.
+    """
+    tied = hopeful[np.isclose(tallies[hopeful], tallies[hopeful].min(), rtol=0, atol=EPSILON)]
+    for previous in reversed(previous_rounds):
+        if tied.size == 1:
+            break
+        earlier = previous['tallies'][tied]
+        tied = tied[np.isclose(earlier, earlier.min(), rtol=0, atol=EPSILON)]
+    return int(tied[-1])
+
+
+def ranked_results(election, candidates):
+    """
+    Tally a ranked election for results.html. `candidates` is a list of
+    CandidateProfile; returns the winners and the rounds with candidates
+    attached, each round's rows sorted by votes.
+    """
+    ballots = load_ballots(election, [c.pk for c in candidates])
+    result = count(ballots, len(candidates), seats=election.seats if election.voting_method == 'stv' else 1,
+                   majority=election.voting_method == 'irv')
+    rounds = []
+    for number, record in enumerate(result['rounds'], start=1):
+        rows = [
+            {
+                'candidate': candidates[column],
+                'votes': round(float(record['tallies'][column]), 2),
+                'elected': column in record['elected'],
+                'eliminated': column in record['eliminated'],
+            }
+            for column in record['hopeful']
+        ]
+        rows.sort(key=lambda row: row['votes'], reverse=True)
+        rounds.append({
+            'number': number,
+            'rows': rows,
+            'quota': round(record['quota'], 2),
+            'exhausted': round(record['exhausted'], 2),
+        })
+    return {
+        'ballots': len(ballots),
+        'winners': [candidates[column] for column in result['elected']],
+        'quota': result['quota'],
+        'rounds': rounds,
+    }
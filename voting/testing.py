@@ -0,0 +1,25 @@
+"""
+Test runner for `manage.py test`.
+
+Tests render pages without running collectstatic first, so there is no
+manifest for the fingerprinting storage in settings.STORAGES to look names
+up in. The suite runs with the plain storage, which links the unhashed names;
+StaticAssetTests switches the manifest storage back on to check collectstatic.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.storages = override_settings(STORAGES={
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        })
+        self.storages.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.storages.disable()
+        super().teardown_test_environment(**kwargs)
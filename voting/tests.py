@@ -1,3 +1,1829 @@
-from django.test import TestCase
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (Ballot, CustomUser, VoterProfile, CandidateProfile, Election, EligibilityRule, Vote, LoginToken,
+                     LedgerState, RankedBallot)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Run EXPLAIN QUERY PLAN on the hot queries in voting/views.py and fail if
+    any of them would scan a whole table instead of using an index.
+    """
+    # SQLite reports "SCAN <table>" for a full table scan and
+    # "SCAN <table> USING [COVERING] INDEX ..." for an index walk.
+    FULL_SCAN = re.compile(r'\bSCAN (\w+)\b(?! USING)')
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.user = CustomUser.objects.create_user(
+            username='voter', email='voter@example.com', password='x', role='voter', year_of_study='3'
+        )
+        cls.voter = VoterProfile.objects.get(user=cls.user)
+        candidate_user = CustomUser.objects.create_user(
+            username='candidate', email='candidate@example.com', password='x', role='candidate'
+        )
+        cls.candidate = CandidateProfile.objects.get(user=candidate_user)
+        cls.election = Election.objects.create(
+            name='Council', start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1)
+        )
+        Vote.objects.create(voter=cls.voter, candidate=cls.candidate, election=cls.election)
+        cls.token = LoginToken.create_token(cls.user)
+
+    def hot_queries(self):
+        now = timezone.now()
+        return {
+            'login by email': lambda: CustomUser.objects.get(email=self.user.email),
+            'username uniqueness': lambda: CustomUser.objects.filter(username='voter').exists(),
+            'token lookup': lambda: LoginToken.objects.get(token=self.token.token),
+            'voter profile': lambda: VoterProfile.objects.get(user=self.user),
+            'candidate profile': lambda: CandidateProfile.objects.get(user_id=self.candidate.user_id),
+            'active elections': lambda: list(Election.objects.filter(is_active=True)),
+            'active election': lambda: Election.objects.filter(is_active=True).order_by('-start_date').first(),
+            'open election': lambda: Election.objects.filter(
+                is_active=True, start_date__lte=now, end_date__gte=now
+            ).order_by('-start_date').first(),
+            'ballot candidates': lambda: list(CandidateProfile.for_election(self.election)),
+            'already voted': lambda: Vote.objects.filter(voter=self.voter, election=self.election).exists(),
+            'candidate votes': lambda: Vote.objects.filter(candidate=self.candidate).count(),
+            'candidate votes in election': lambda: Vote.objects.filter(
+                candidate=self.candidate, election=self.election
+            ).count(),
+            'election votes by time': lambda: list(
+                Vote.objects.filter(election=self.election, timestamp__gte=now - timedelta(hours=1))
+            ),
+            'senior voters page': lambda: list(
+                CustomUser.objects.filter(role='voter', year_of_study__in=['3', '4'], pk__gt=0).order_by('pk')[:51]
+            ),
+        }
+
+    def assertUsesIndexes(self, name, query):
+        with CaptureQueriesContext(connection) as ctx:
+            query()
+        self.assertTrue(ctx.captured_queries, f'{name}: no SQL captured')
+        for captured in ctx.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {captured['sql']}")
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+            scans = self.FULL_SCAN.findall(plan)
+            self.assertFalse(scans, f'{name}: full scan of {", ".join(scans)}\n{captured["sql"]}\n{plan}')
+
+    def test_hot_queries_use_indexes(self):
+        for name, query in self.hot_queries().items():
+            with self.subTest(name):
+                self.assertUsesIndexes(name, query)
+
+
+class ShardedVoteTests(TestCase):
+    """Votes stored in per-election SQLite shards (VOTE_SHARD_DIR)."""
+    databases = '__all__'
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        shard_dir = tempfile.mkdtemp(prefix='shards-test-')
+        shard_settings = self.settings(VOTE_SHARD_DIR=shard_dir)
+        shard_settings.enable()
+        self.addCleanup(shutil.rmtree, shard_dir, ignore_errors=True)
+        self.addCleanup(shard_settings.disable)
+        self.addCleanup(self.forget_shards)
+
+        now = timezone.now()
+        self.elections = [
+            Election.objects.create(name=name, start_date=now - timedelta(hours=hours),
+                                    end_date=now + timedelta(hours=1), is_active=False)
+            for name, hours in (('Council', 2), ('Sports', 1))
+        ]
+        # Shards are registered on first use, after the test case listed its databases
+        self.addCleanup(setattr, type(self), 'databases', type(self).databases)
+        type(self).databases = type(self).databases | {f'election_{e.pk}' for e in self.elections}
+        self.candidates = [
+            CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+                username=f'candidate{i}', email=f'candidate{i}@example.com', password='x', role='candidate'
+            ))
+            for i in range(2)
+        ]
+        self.voters = [
+            VoterProfile.objects.get(user=CustomUser.objects.create_user(
+                username=f'voter{i}', email=f'voter{i}@example.com', password='x'
+            ))
+            for i in range(3)
+        ]
+
+    def forget_shards(self):
+        # Election ids repeat between tests, so a shard alias must not outlive its directory
+        from django.db import connections
+        from .sharding import drop_shard, is_shard_alias
+        for alias in [alias for alias in connections.settings if is_shard_alias(alias)]:
+            drop_shard(alias.split('_', 1)[1])
+            del connections.settings[alias]
+            del connections[alias]
+
+    def cast(self, voter, election, candidate):
+        from django.db import transaction
+        from .sharding import vote_db
+        with transaction.atomic(using=vote_db(election.pk)):
+            Vote.cast_ballot(voter, election, [candidate])
+
+    def test_votes_go_to_their_elections_shard_and_counters_follow(self):
+        from .sharding import shard_path, vote_databases, votes_for
+        Election.objects.filter(pk=self.elections[1].pk).update(is_active=True)
+        self.client.force_login(self.voters[0].user)
+        self.assertEqual(self.client.post('/submit-vote/', {'candidate_1': self.candidates[0].pk}).status_code, 200)
+        self.cast(self.voters[1], self.elections[0], self.candidates[1])
+        self.cast(self.voters[2], self.elections[0], self.candidates[1])
+
+        self.assertTrue(shard_path(self.elections[0].pk).exists())
+        self.assertFalse(Vote.objects.using('default').exists())
+        self.assertEqual([votes_for(e).count() for e in self.elections], [2, 1])
+        self.assertEqual(sorted(vote_databases()), sorted(f'election_{e.pk}' for e in self.elections))
+        self.assertEqual([CandidateProfile.objects.get(pk=c.pk).votes_received for c in self.candidates], [1, 2])
+        self.assertTrue(all(VoterProfile.objects.get(pk=v.pk).has_voted for v in self.voters))
+
+    def test_drop_shard_deletes_the_file(self):
+        from .sharding import drop_shard, shard_path, votes_for
+        self.cast(self.voters[0], self.elections[0], self.candidates[0])
+        drop_shard(self.elections[0].pk)
+        self.assertFalse(shard_path(self.elections[0].pk).exists())
+        self.assertEqual(votes_for(self.elections[0]).count(), 0)  # recreated, empty, on next use
+
+    def test_admin_lists_and_edits_votes_from_the_shards(self):
+        from .sharding import votes_for
+        self.cast(self.voters[0], self.elections[0], self.candidates[0])
+        self.cast(self.voters[1], self.elections[1], self.candidates[1])
+        self.client.force_login(CustomUser.objects.create_superuser(username='admin', email='admin@example.com',
+                                                                    password='x', role='admin'))
+        response = self.client.get('/admin/voting/vote/')
+        self.assertRedirects(response, f'/admin/voting/vote/?election__id__exact={self.elections[1].pk}')
+        response = self.client.get(f'/admin/voting/vote/?election__id__exact={self.elections[0].pk}')
+        self.assertEqual([v.voter for v in response.context['cl'].result_list], [self.voters[0]])
+
+        vote = votes_for(self.elections[0]).get()
+        response = self.client.get(f'/admin/voting/vote/{vote.pk}/change/?_changelist_filters='
+                                   f'election__id__exact%3D{self.elections[0].pk}')
+        self.assertEqual(response.context['original'].candidate, self.candidates[0])
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """Filtered admin changelists stop counting at count_cap but keep paging."""
+
+    @classmethod
+    def setUpTestData(cls):
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'voter{i:02}', email=f'voter{i}@example.com', password='!') for i in range(9)
+        ])
+
+    def setUp(self):
+        from unittest import mock
+        from .admin import EstimatedCountPaginator
+        patcher = mock.patch.object(EstimatedCountPaginator, 'count_cap', 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pages_past_the_cap_are_served(self):
+        from django.core.paginator import EmptyPage
+        from .admin import EstimatedCountPaginator
+        paginator = EstimatedCountPaginator(CustomUser.objects.filter(role='voter').order_by('pk'), 2)
+        self.assertEqual(paginator.count, 4)
+        self.assertTrue(paginator.capped)
+        self.assertTrue(paginator.page(2).has_next())
+        page = paginator.page(4)
+        self.assertEqual([u.username for u in page], ['voter06', 'voter07'])
+        self.assertTrue(page.has_next())
+        page = paginator.page(5)
+        self.assertEqual([u.username for u in page], ['voter08'])
+        self.assertFalse(page.has_next())
+        with self.assertRaises(EmptyPage):
+            paginator.page(6)
+
+        # Under the cap, counts are exact and paging is the stock one
+        paginator = EstimatedCountPaginator(CustomUser.objects.filter(username__lt='voter03').order_by('pk'), 2)
+        self.assertEqual((paginator.count, paginator.capped, paginator.num_pages), (3, False, 2))
+        with self.assertRaises(EmptyPage):
+            paginator.page(3)
+
+    def test_changelist_shows_capped_count_and_next_page(self):
+        from unittest import mock
+        from .admin import CustomUserAdmin
+        self.client.force_login(CustomUser.objects.create_superuser(username='admin', email='admin@example.com',
+                                                                    password='x', role='admin'))
+        with mock.patch.object(CustomUserAdmin, 'list_per_page', 2):
+            response = self.client.get('/admin/voting/customuser/?role__exact=voter&p=3')
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, '4+ users')
+            self.assertContains(response, '?p=4&amp;role__exact=voter')
+            response = self.client.get('/admin/voting/customuser/?role__exact=voter&p=5')
+            self.assertContains(response, 'voter08')
+
+
+class AdminPanelTests(TestCase):
+    """Search, keyset paging and bulk promotion on the admin panel."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x',
+                                                   role='admin')
+        people = [('Ada', 'Lovelace', 'CSE', '3'), ('Alan', 'Turing', 'CSE', '4'), ('Grace', 'Hopper', 'ME', '3'),
+                  ('Edsger', 'Dijkstra', 'CSE', '3'), ('Barbara', 'Liskov', 'EE', '1')]
+        cls.voters = [
+            CustomUser.objects.create_user(username=first.lower(), email=f'{first.lower()}@example.com',
+                                           password='x', first_name=first, last_name=last, branch=branch,
+                                           year_of_study=year)
+            for first, last, branch, year in people
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def listed(self, response):
+        return [voter.username for voter in response.context['voters']]
+
+    def test_search_matches_every_term(self):
+        response = self.client.get('/admin-panel/', {'q': 'computer'})
+        self.assertEqual(self.listed(response), ['ada', 'alan', 'edsger'])
+        response = self.client.get('/admin-panel/', {'q': 'computer ing'})
+        self.assertEqual(self.listed(response), ['alan'])
+        response = self.client.get('/admin-panel/', {'q': 'liskov'})
+        self.assertEqual(self.listed(response), [])  # first years are not listed
+
+    def test_after_pages_by_primary_key(self):
+        from unittest import mock
+        with mock.patch('voting.views.ADMIN_PANEL_PAGE_SIZE', 2):
+            response = self.client.get('/admin-panel/')
+            self.assertEqual(self.listed(response), ['ada', 'alan'])
+            self.assertEqual(response.context['next_cursor'], self.voters[1].pk)
+            response = self.client.get('/admin-panel/', {'after': response.context['next_cursor']})
+            self.assertEqual(self.listed(response), ['grace', 'edsger'])
+            self.assertFalse(response.context['is_first_page'])
+            response = self.client.get('/admin-panel/', {'after': self.voters[3].pk})
+            self.assertEqual(self.listed(response), [])
+            self.assertIsNone(response.context['next_cursor'])
+            response = self.client.get('/admin-panel/', {'after': 'junk'})
+            self.assertEqual(self.listed(response), ['ada', 'alan'])
+
+    def test_bulk_promotion(self):
+        ids = [self.voters[0].pk, self.voters[2].pk, self.admin.pk]
+        response = self.client.post('/promote-candidate/', {'user_ids': ids, 'q': 'a'})
+        self.assertRedirects(response, '/admin-panel/?q=a')
+        self.assertEqual(set(CustomUser.objects.filter(role='candidate').values_list('username', flat=True)),
+                         {'ada', 'grace'})
+        self.assertEqual(CandidateProfile.objects.filter(user_id__in=ids).count(), 2)
+        self.assertEqual(CustomUser.objects.get(pk=self.admin.pk).role, 'admin')
+        # Already candidates: nothing left to promote
+        self.client.post('/promote-candidate/', {'user_ids': ids[:2]})
+        self.assertEqual(CandidateProfile.objects.filter(user_id__in=ids).count(), 2)
+
+
+class ReadReplicaTests(TestCase):
+    """@read_replica routing, read-your-writes pinning and the lag fallback."""
+
+    def setUp(self):
+        from unittest import mock
+        from django.test import RequestFactory
+        from . import replica
+        self.lag = 1.0
+        for name, patched in (('replica_configured', lambda: True), ('replica_lag', lambda: self.lag)):
+            patcher = mock.patch.object(replica, name, side_effect=patched)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.request = RequestFactory().get('/results/')
+        self.request.session = {}
+
+    def routed(self, request):
+        """Where a @read_replica view's reads and writes of votes go"""
+        from .replica import read_replica
+        from .routers import ReplicaRouter
+
+        @read_replica
+        def view(request):
+            return ReplicaRouter().db_for_read(Vote), ReplicaRouter().db_for_write(Vote)
+
+        return view(request)
+
+    def test_decorated_views_read_from_a_fresh_replica(self):
+        from .routers import ReplicaRouter
+        self.assertEqual(self.routed(self.request), ('replica', None))
+        self.assertIsNone(ReplicaRouter().db_for_read(Vote))  # outside the view
+
+    def test_a_write_pins_the_session_to_the_primary(self):
+        from unittest import mock
+        from .replica import PIN_SESSION_KEY, pin_to_primary
+        pin_to_primary(self.request)
+        self.assertEqual(self.routed(self.request), (None, None))
+        with mock.patch('voting.replica.time.time', return_value=self.request.session[PIN_SESSION_KEY] + 1):
+            self.assertEqual(self.routed(self.request), ('replica', None))
+
+        # Views that write pin the user's session
+        admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        election = Election.objects.create(name='Council', start_date=timezone.now(),
+                                           end_date=timezone.now() + timedelta(hours=1), is_active=False)
+        self.client.force_login(admin)
+        self.client.post(f'/toggle-election/{election.pk}/')
+        self.assertIn(PIN_SESSION_KEY, self.client.session)
+
+    def test_a_lagging_replica_falls_back_to_the_primary(self):
+        from django.conf import settings
+        self.lag = settings.REPLICA_LAG_TOLERANCE + 1
+        self.assertEqual(self.routed(self.request), (None, None))
+        self.lag = float('inf')  # no snapshot at all
+        self.assertEqual(self.routed(self.request), (None, None))
+
+
+class ExportTests(TestCase):
+    """Streamed CSV/NDJSON audit exports: formats, gzip, and resuming after a vote id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.election = Election.objects.create(
+            name='Council', start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1)
+        )
+        cls.candidate = CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username='candidate', email='candidate@example.com', password='x', role='candidate', first_name='Ada'
+        ))
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'voter{i}', email=f'voter{i}@example.com', password='!', branch='CSE')
+            for i in range(5)
+        ])
+        voters = VoterProfile.objects.bulk_create([VoterProfile(user=u) for u in users])
+        Vote.objects.bulk_create([Vote(voter=v, candidate=cls.candidate, election=cls.election) for v in voters])
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x',
+                                                   role='admin')
+
+    def download(self, path):
+        self.client.force_login(self.admin)
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_and_ndjson_exports(self):
+        import csv
+        import json
+        _, body = self.download(f'/export/votes/{self.election.id}/')
+        rows = list(csv.DictReader(body.decode().splitlines()))
+        self.assertEqual([int(row['vote_id']) for row in rows], list(Vote.objects.order_by('pk').values_list(
+            'pk', flat=True)))
+        self.assertEqual({(row['candidate'], row['voter_branch']) for row in rows}, {('Ada', 'CSE')})
+
+        response, body = self.download(f'/export/results/{self.election.id}/?format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        [result] = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual((result['candidate_id'], result['votes']), (self.candidate.pk, 5))
+        self.assertEqual(self.client.get(f'/export/votes/{self.election.id}/?format=xml').status_code, 400)
+
+    def test_gzip_export_resumes_after_a_vote_id(self):
+        import gzip
+        import json
+        third = Vote.objects.order_by('pk')[2].pk
+        response, body = self.download(f'/export/votes/{self.election.id}/?format=ndjson&gzip=1&after={third}')
+        self.assertEqual(response['Content-Disposition'],
+                         f'attachment; filename="election-{self.election.id}-votes.ndjson.gz"')
+        rows = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+        self.assertEqual([row['vote_id'] for row in rows], list(Vote.objects.filter(pk__gt=third).order_by(
+            'pk').values_list('pk', flat=True)))
+
+    def test_votes_are_read_in_short_keyset_queries(self):
+        from .exports import vote_rows
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(vote_rows(self.election, chunk_size=2))
+        self.assertEqual([row['vote_id'] for row in rows], list(Vote.objects.order_by('pk').values_list(
+            'pk', flat=True)))
+        # One LIMITed query per chunk, each finished before its rows are yielded, so a
+        # slow download never holds a read open while ballots are being committed
+        vote_queries = [q['sql'] for q in ctx.captured_queries if '"voting_vote"' in q['sql']]
+        self.assertEqual(len(vote_queries), 3)
+        self.assertTrue(all('LIMIT 2' in sql for sql in vote_queries))
+
+
+class VoteLedgerTests(TestCase):
+    """Merkle ledger appends, inclusion proofs and tamper detection."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        candidate_user = CustomUser.objects.create_user(
+            username='candidate', email='candidate@example.com', password='x', role='candidate'
+        )
+        cls.candidate = CandidateProfile.objects.get(user=candidate_user)
+        cls.election = Election.objects.create(
+            name='Council', start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1)
+        )
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'voter{i}', email=f'voter{i}@example.com', password='!') for i in range(13)
+        ])
+        voters = VoterProfile.objects.bulk_create([VoterProfile(user=u) for u in users])
+        Vote.objects.bulk_create([Vote(voter=v, candidate=cls.candidate, election=cls.election) for v in voters])
+        # Let the ballots settle so append_pending picks them up
+        Vote.objects.update(timestamp=now - timedelta(minutes=1))
+
+    def reference_root(self, leaves):
+        from .ledger import EMPTY_ROOT, hash_children
+        if not leaves:
+            return EMPTY_ROOT
+        if len(leaves) == 1:
+            return leaves[0]
+        k = 1 << ((len(leaves) - 1).bit_length() - 1)
+        return hash_children(self.reference_root(leaves[:k]), self.reference_root(leaves[k:]))
+
+    def test_batched_appends_match_reference_tree_and_proofs_verify(self):
+        from .ledger import append_pending, inclusion_proof, receipt_for_vote, verify_inclusion
+        self.assertEqual(append_pending(self.election, batch_size=5), 5)
+        self.assertEqual(append_pending(self.election, batch_size=5), 5)
+        self.assertEqual(append_pending(self.election, batch_size=5), 3)
+        state = LedgerState.objects.get(election=self.election)
+        receipts = [receipt_for_vote(v) for v in Vote.objects.order_by('pk')]
+        self.assertEqual(state.size, 13)
+        self.assertEqual(state.root, self.reference_root(receipts))
+        for position, receipt in enumerate(receipts):
+            path = inclusion_proof(self.election, position, state.size)
+            self.assertTrue(verify_inclusion(receipt, position, state.size, path, state.root))
+            self.assertFalse(verify_inclusion(receipts[position - 1], position, state.size, path, state.root))
+
+    def test_verify_ledger_detects_edited_vote(self):
+        from django.core.management import CommandError, call_command
+        from .ledger import append_pending
+        append_pending(self.election)
+        call_command('verify_ledger', self.election.id, stdout=StringIO())
+        other = CandidateProfile.objects.create(
+            user=CustomUser.objects.create(username='other', email='other@example.com', role='voter')
+        )
+        Vote.objects.filter(pk=Vote.objects.order_by('pk')[4].pk).update(candidate=other)
+        with self.assertRaises(CommandError):
+            call_command('verify_ledger', self.election.id, stdout=StringIO())
+
+    def test_ledger_append_catches_up_closed_elections(self):
+        from django.core.management import call_command
+        from .ledger import append_pending
+        append_pending(self.election, batch_size=5)
+        # Closed with ballots still to append, e.g. cast in its last seconds
+        Election.objects.filter(pk=self.election.pk).update(is_active=False, finalised_at=timezone.now())
+        out = StringIO()
+        call_command('ledger_append', stdout=out)
+        self.assertIn('appended 8 ballots', out.getvalue())
+        self.assertEqual(LedgerState.objects.get(election=self.election).size, 13)
+        with self.assertNumQueries(3):  # the elections, the ledgers, and one check that it is caught up
+            call_command('ledger_append', stdout=StringIO())
+
+
+class RecountTests(TestCase):
+    """manage.py recount diffs its own tally against the live one, snapshots and the counters."""
+
+    def setUp(self):
+        from unittest import mock
+        from .recount import UNKNOWN, tally_range
+
+        def in_process(election_id, candidate_ids, low, high, workers, ranges):
+            # Worker processes cannot see the test transaction; tally the one range here
+            slots = {candidate_id: i for i, candidate_id in enumerate(candidate_ids)}
+            slots[UNKNOWN] = len(candidate_ids)
+            counts, rows = tally_range(election_id, low, high + 1, slots)
+            return {c: counts[slot] for c, slot in slots.items() if c != UNKNOWN or counts[slot]}, rows
+
+        patcher = mock.patch('voting.management.commands.recount.parallel_tally', side_effect=in_process)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        now = timezone.now()
+        self.elections = [
+            Election.objects.create(name=name, start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1))
+            for name in ('Council', 'Senate')
+        ]
+        self.candidates = [
+            CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+                username=name, email=f'{name}@example.com', password='x', role='candidate'))
+            for name in ('ada', 'grace')
+        ]
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'voter{i}', email=f'voter{i}@example.com', password='!') for i in range(5)
+        ])
+        self.voters = VoterProfile.objects.bulk_create([VoterProfile(user=u) for u in users])
+        # 3-2 in the Council; Ada's counter also holds her vote in the Senate
+        for voter, candidate in zip(self.voters, [0, 0, 0, 1, 1]):
+            Vote.objects.create(voter=voter, candidate=self.candidates[candidate], election=self.elections[0])
+        Vote.objects.create(voter=self.voters[0], candidate=self.candidates[0], election=self.elections[1])
+
+    def recount(self, *args):
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('recount', self.elections[0].id, '--workers=1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_recount_matches_live_tally_and_snapshot(self):
+        snapshot_dir = tempfile.mkdtemp(prefix='recount-test-')
+        self.addCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+        snapshot = f'{snapshot_dir}/tally.json'
+        out = self.recount(f'--write-snapshot={snapshot}')
+        self.assertIn('5 ballots', out)
+        self.assertIn('Recount matches.', out)
+        self.assertRegex(out, r'ada\s+3\s+3\s+4\s')
+        self.assertIn('Recount matches.', self.recount(f'--snapshot={snapshot}'))
+
+        # A ballot cast since the snapshot: the recount and live tally agree, the snapshot does not
+        late = VoterProfile.objects.get(user=CustomUser.objects.create(username='late', email='late@example.com'))
+        Vote.objects.create(voter=late, candidate=self.candidates[1], election=self.elections[0])
+        from django.core.management import CommandError
+        with self.assertRaisesMessage(CommandError, '1 candidate(s) differ'):
+            self.recount(f'--snapshot={snapshot}')
+
+    def test_tampered_counter_fails_the_recount(self):
+        from django.core.management import CommandError
+        CandidateProfile.objects.filter(pk=self.candidates[1].pk).update(votes_received=7)
+        with self.assertRaisesMessage(CommandError, '1 candidate(s) differ'):
+            self.recount()
+
+    def test_archived_elections_still_count_towards_the_counter(self):
+        from .models import ElectionArchive
+        from .lifecycle import finalise
+        finalise(self.elections[1])
+        ElectionArchive.objects.create(election=self.elections[1], votes_file='votes.ndjson.gz', vote_count=1,
+                                       size_bytes=1, sha256='0' * 64)
+        Vote.objects.filter(election=self.elections[1]).delete()
+        self.assertIn('Recount matches.', self.recount())
+
+
+class RankedTallyTests(TestCase):
+    """Instant runoff / STV counting and ranked ballot submission."""
+
+    def ballot_matrix(self, groups):
+        import numpy as np
+        from .tally import to_columns
+        rows = np.zeros((sum(n for n, _ in groups), RankedBallot.MAX_RANKS), dtype=np.int32)
+        i = 0
+        for n, ranking in groups:
+            rows[i:i + n, :len(ranking)] = ranking
+            i += n
+        return to_columns(rows, [1, 2, 3, 4, 5])
+
+    def test_stv_transfers_surplus_and_eliminations(self):
+        from .tally import count
+        # 20 ballots, 3 seats: 1=oranges 2=pears 3=chocolate 4=strawberries 5=sweets
+        ballots = self.ballot_matrix([(4, [1]), (2, [2, 1]), (8, [3, 4]), (4, [3, 5]), (1, [4]), (1, [5])])
+        result = count(ballots, 5, seats=3)
+        self.assertEqual(result['quota'], 6)
+        self.assertEqual(result['elected'], [2, 0, 3])  # chocolate, oranges, strawberries
+        # Chocolate's surplus of 6 moves at half weight: 8 * 0.5 to strawberries, 4 * 0.5 to sweets
+        self.assertEqual(result['rounds'][1]['tallies'].tolist(), [4, 2, 0, 5, 3])
+        self.assertEqual(result['rounds'][1]['eliminated'], [1])
+
+    def test_instant_runoff_needs_a_majority_of_continuing_votes(self):
+        from .tally import count
+        ballots = self.ballot_matrix([(4, [1, 2]), (3, [2]), (2, [3, 2])])
+        result = count(ballots, 5, majority=True)
+        self.assertEqual(result['elected'], [1])
+        self.assertEqual([r['eliminated'] for r in result['rounds']], [[4], [3], [2], []])
+
+    def test_no_ballots_elect_no_one(self):
+        from .tally import count, ranked_results
+        empty = self.ballot_matrix([])
+        for seats, majority in ((1, True), (2, False)):
+            result = count(empty, 5, seats=seats, majority=majority)
+            self.assertEqual((result['elected'], result['rounds']), ([], []))
+        # Ballots naming only withdrawn candidates carry no live weight either
+        self.assertEqual(count(self.ballot_matrix([(3, [9])]), 5, majority=True)['elected'], [])
+
+        now = timezone.now()
+        election = Election.objects.create(name='Council', start_date=now - timedelta(hours=1),
+                                           end_date=now + timedelta(hours=1), voting_method='stv', seats=2)
+        candidates = [CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username=f'candidate{i}', email=f'candidate{i}@example.com', password='x', role='candidate'
+        )) for i in range(3)]
+        self.assertEqual(ranked_results(election, candidates)['winners'], [])
+
+    def test_ranked_ballot_is_stored_with_first_preference_vote(self):
+        now = timezone.now()
+        election = Election.objects.create(name='Council', start_date=now - timedelta(hours=1),
+                                           end_date=now + timedelta(hours=1), voting_method='irv')
+        first, second = (
+            CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+                username=name, email=f'{name}@example.com', password='x', role='candidate'
+            ))
+            for name in ('first', 'second')
+        )
+        voter = CustomUser.objects.create_user(username='voter', email='voter@example.com', password='x')
+        self.client.force_login(voter)
+
+        response = self.client.post('/submit-vote/', {f'rank_{first.id}': '2', f'rank_{second.id}': '1'})
+        self.assertEqual(response.status_code, 200)
+        vote = Vote.objects.get(election=election)
+        self.assertEqual(vote.candidate, second)
+        self.assertEqual(RankedBallot.objects.get(election=election).preferences(), [second.id, first.id])
+
+        duplicate = CustomUser.objects.create_user(username='dup', email='dup@example.com', password='x')
+        self.client.force_login(duplicate)
+        self.client.post('/submit-vote/', {f'rank_{first.id}': '1', f'rank_{second.id}': '1'})
+        self.assertEqual(RankedBallot.objects.filter(election=election).count(), 1)
+
+        admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        self.client.force_login(admin)
+        response = self.client.get(f'/results/{election.id}/')
+        self.assertContains(response, 'Round 1')
+        self.assertEqual(response.context['ranked']['winners'], [second])
+
+
+class MultiPositionBallotTests(TestCase):
+    """Ballots with one race per position, submitted in a single request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.election = Election.objects.create(
+            name='Council', start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1)
+        )
+        cls.candidates = {}
+        for position in ('President', 'Secretary', 'Sports', 'Treasurer', 'Vice President'):
+            for i in range(2):
+                user = CustomUser.objects.create_user(
+                    username=f'{position}{i}', email=f'{position}{i}@example.com'.replace(' ', ''),
+                    password='x', role='candidate'
+                )
+                CandidateProfile.objects.filter(user=user).update(election=cls.election, position=position)
+                cls.candidates.setdefault(position, []).append(CandidateProfile.objects.get(user=user))
+
+    def submit(self, username, positions):
+        voter = CustomUser.objects.create_user(username=username, email=f'{username}@example.com', password='x')
+        self.client.force_login(voter)
+        ballot = {f'candidate_{n}': self.candidates[p][0].id for n, p in enumerate(positions, start=1)}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/submit-vote/', ballot)
+        self.assertEqual(response.status_code, 200)
+        return voter, len(ctx.captured_queries)
+
+    def test_whole_ballot_is_one_insert(self):
+        _, one_race = self.submit('one', ['President'])
+        voter, five_races = self.submit('five', list(self.candidates))
+        self.assertEqual(one_race, five_races)
+
+        votes = Vote.objects.filter(voter__user=voter)
+        self.assertEqual(sorted(votes.values_list('position', flat=True)), sorted(self.candidates))
+        self.assertTrue(VoterProfile.objects.get(user=voter).has_voted)
+        self.assertEqual(CandidateProfile.objects.get(pk=self.candidates['President'][0].pk).votes_received, 2)
+
+        # Already voted: nothing more is recorded
+        self.client.post('/submit-vote/', {'candidate_1': self.candidates['Sports'][1].id})
+        self.assertEqual(votes.count(), 5)
+
+    def test_partial_ballot_racing_another_is_rejected(self):
+        from unittest import mock
+        from . import views
+        voter = CustomUser.objects.create_user(username='racer', email='racer@example.com', password='x')
+        profile = VoterProfile.objects.get(user=voter)
+        # Another request cast the Sports race after this one's first check
+        calls = []
+
+        def racing(election):
+            calls.append(election)
+            if len(calls) == 1:
+                Vote.cast_ballot(profile, election, [self.candidates['Sports'][0]])
+                return Vote.objects.none()
+            return Vote.objects.filter(election=election)
+
+        self.client.force_login(voter)
+        with mock.patch.object(views, 'votes_for', side_effect=racing):
+            response = self.client.post('/submit-vote/', {'candidate_1': self.candidates['President'][0].id})
+        self.assertRedirects(response, '/dashboard/', fetch_redirect_response=False)
+        self.assertEqual(list(Vote.objects.filter(voter=profile).values_list('position', flat=True)), ['Sports'])
+
+    def test_database_keeps_one_ballot_per_election(self):
+        from django.db import IntegrityError, transaction
+        voter, _ = self.submit('once', ['President'])
+        profile = VoterProfile.objects.get(user=voter)
+        self.assertEqual(Ballot.objects.filter(voter=profile, election=self.election).count(), 1)
+        # Even for a race the first ballot left blank, written without the view's checks
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.cast_ballot(profile, self.election, [self.candidates['Sports'][0]])
+        self.assertEqual(list(Vote.objects.filter(voter=profile).values_list('position', flat=True)), ['President'])
+
+    def test_ballot_page_groups_candidates_by_position(self):
+        voter = CustomUser.objects.create_user(username='reader', email='reader@example.com', password='x')
+        self.client.force_login(voter)
+        response = self.client.get('/vote/')
+        self.assertEqual([race['position'] for race in response.context['races']], list(self.candidates))
+        self.assertContains(response, 'name="candidate_5"', count=2)
+
+    def test_two_candidates_for_one_position_are_rejected(self):
+        voter = CustomUser.objects.create_user(username='greedy', email='greedy@example.com', password='x')
+        self.client.force_login(voter)
+        first, second = self.candidates['President']
+        self.client.post('/submit-vote/', {'candidate_1': first.id, 'candidate_2': second.id})
+        self.assertFalse(Vote.objects.filter(voter__user=voter).exists())
+
+
+class EligibilityTests(TestCase):
+    """Eligibility rules and the incrementally maintained electorate size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.election = Election.objects.create(
+            name='Final years', start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1)
+        )
+        EligibilityRule.objects.create(election=cls.election, field='year_of_study', values=['4'])
+        EligibilityRule.objects.create(election=cls.election, field='branch', values=['ME'], exclude=True)
+        for i, (branch, year) in enumerate([('CSE', '4'), ('ME', '4'), ('CSE', '3'), ('ECE', '4')]):
+            CustomUser.objects.create_user(username=f'u{i}', email=f'u{i}@example.com', password='x',
+                                           branch=branch, year_of_study=year)
+
+    def electorate(self):
+        self.election.refresh_from_db(fields=['eligible_voter_count'])
+        return self.election.eligible_voter_count
+
+    def test_query_and_predicate_agree(self):
+        election = Election.objects.get(pk=self.election.pk)
+        in_sql = set(election.eligible_voters().values_list('username', flat=True))
+        in_memory = {u.username for u in CustomUser.objects.all() if election.is_eligible(u)}
+        self.assertEqual(in_sql, {'u0', 'u3'})
+        self.assertEqual(in_sql, in_memory)
+        self.assertEqual(self.electorate(), 2)
+
+    def test_electorate_follows_user_changes(self):
+        user = CustomUser.objects.get(username='u2')
+        user.year_of_study = '4'
+        user.save()
+        self.assertEqual(self.electorate(), 3)
+        user.branch = 'ME'
+        user.save(update_fields=['branch'])
+        self.assertEqual(self.electorate(), 2)
+        with CaptureQueriesContext(connection) as ctx:
+            user.save(update_fields=['last_login'])  # logins don't touch the electorate
+        self.assertFalse([q for q in ctx.captured_queries if 'voting_election' in q['sql']])
+        CustomUser.objects.get(username='u0').delete()
+        self.assertEqual(self.electorate(), 1)
+        CustomUser.promote_to_candidates([CustomUser.objects.get(username='u3').pk])
+        self.assertEqual(self.electorate(), 0)
+
+    def test_cached_rules_follow_rule_changes(self):
+        from .caching import eligibility_rules
+        election = Election.objects.get(pk=self.election.pk)
+        self.assertEqual(len(eligibility_rules(election)), 2)
+        rule = EligibilityRule.objects.create(election=election, field='branch', values=['ECE'], exclude=True)
+        self.assertEqual(len(eligibility_rules(election)), 3)
+        rule.values = ['CSE']
+        rule.save()
+        self.assertIn(('branch', ['CSE'], True), eligibility_rules(election))
+        rule.delete()
+        self.assertEqual(len(eligibility_rules(election)), 2)
+
+    def test_caches_must_be_shared_in_deployment(self):
+        from .caching import check_shared_cache
+        self.assertEqual([e.id for e in check_shared_cache(None)], ['voting.E002'])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                               'LOCATION': tempfile.gettempdir()}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_ineligible_voter_cannot_vote(self):
+        candidate = CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username='candidate', email='candidate@example.com', password='x', role='candidate'
+        ))
+        self.client.force_login(CustomUser.objects.get(username='u1'))
+        self.assertRedirects(self.client.get('/vote/'), '/dashboard/', fetch_redirect_response=False)
+        self.client.post('/submit-vote/', {'candidate_id': candidate.id})
+        self.assertFalse(Vote.objects.exists())
+
+
+class ElectionLifecycleTests(TestCase):
+    """The scheduler's warmup, open and close/finalise transitions."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        now = timezone.now()
+        self.election = Election.objects.create(
+            name='Council', start_date=now + timedelta(minutes=2), end_date=now + timedelta(hours=1),
+            is_active=False
+        )
+        self.candidate = CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username='candidate', email='candidate@example.com', password='x', role='candidate'
+        ))
+
+    def test_warm_open_and_finalise(self):
+        from .caching import ballot_candidates
+        from .lifecycle import tick
+        now = timezone.now()
+
+        done = tick(now)
+        self.assertEqual(done['warmed'], [self.election])
+        self.assertEqual(tick(now)['warmed'], [])  # already warm
+        with self.assertNumQueries(0):
+            self.assertEqual([c['id'] for c in ballot_candidates(self.election)], [self.candidate.id])
+
+        self.assertEqual(tick(now + timedelta(minutes=3))['opened'], [self.election])
+        self.election.refresh_from_db()
+        self.assertTrue(self.election.is_active)
+
+        voters = [VoterProfile.objects.get(user=CustomUser.objects.create_user(
+            username=f'voter{i}', email=f'voter{i}@example.com', password='x'
+        )) for i in range(3)]
+        Vote.objects.bulk_create([Vote(voter=v, candidate=self.candidate, election=self.election) for v in voters])
+
+        done = tick(now + timedelta(hours=2))
+        self.assertEqual(done['finalised'], [self.election])
+        self.assertEqual(tick(now + timedelta(hours=2))['finalised'], [])
+        self.election.refresh_from_db()
+        self.assertFalse(self.election.is_active)
+        self.assertEqual(self.election.ballots_cast, 3)
+        self.assertEqual(self.election.final_results.get(candidate=self.candidate).votes, 3)
+
+        # Results now come from the snapshot, not the Vote table
+        Vote.objects.all().delete()
+        self.client.force_login(CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='x', role='admin'
+        ))
+        response = self.client.get(f'/results/{self.election.id}/')
+        self.assertEqual(response.context['total_votes'], 3)
+        self.assertEqual(response.context['candidates_with_votes'][0]['votes'], 3)
+
+    def test_opening_an_election_closes_the_one_still_active(self):
+        from .lifecycle import tick
+        from .stress import check_invariants
+        now = timezone.now()
+        earlier = Election.objects.create(name='Sports', start_date=now - timedelta(hours=1),
+                                          end_date=now + timedelta(hours=2), is_active=False)
+        self.assertEqual(tick(now)['opened'], [earlier])
+        self.assertEqual(tick(now + timedelta(minutes=3))['opened'], [self.election])
+        self.assertEqual(list(Election.objects.filter(is_active=True)), [self.election])
+        self.assertEqual(check_invariants(), [])
+
+    def test_hand_toggled_election_is_not_reopened(self):
+        from .lifecycle import tick
+        admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x',
+                                               role='admin')
+        self.client.force_login(admin)
+        self.client.get(f'/toggle-election/{self.election.id}/')  # activate
+        self.client.get(f'/toggle-election/{self.election.id}/')  # and deactivate again
+        self.assertEqual(tick(timezone.now() + timedelta(minutes=3))['opened'], [])
+        self.election.refresh_from_db()
+        self.assertFalse(self.election.is_active)
+
+
+class SingleFlightTests(TestCase):
+    """Concurrent misses on one cache key share a single computation."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import singleflight
+        singleflight._flush()  # counts left over from earlier tests
+        cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        import threading
+        import time
+        from . import singleflight
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 42
+
+        before = singleflight.stats()['process']
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(singleflight.fetch('test:key', compute, 60)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        after = singleflight.stats()['process']
+
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(after['computed'] - before['computed'], 1)
+        self.assertEqual(after['coalesced'] - before['coalesced'], 7)
+
+    def test_one_follower_takes_over_a_failed_computation(self):
+        import threading
+        import time
+        from . import singleflight
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            if len(calls) == 1:
+                raise RuntimeError('the leader fails')
+            return 42
+
+        results, errors = [], []
+
+        def fetch():
+            try:
+                results.append(singleflight.fetch('test:key', compute, 60))
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=fetch) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(errors), results), (1, [42] * 5))
+        self.assertEqual(len(calls), 2)
+
+    def test_lock_released_by_another_worker_is_taken_over(self):
+        import threading
+        from django.core.cache import cache
+        from . import singleflight
+        cache.add('test:key:lock', True, 60)  # another worker is recomputing, and gives up
+        threading.Timer(0.2, cache.delete, ['test:key:lock']).start()
+        held = []
+
+        def compute():
+            held.append(cache.get('test:key:lock'))
+            return 42
+
+        self.assertEqual(singleflight.fetch('test:key', compute, 60), 42)
+        self.assertEqual(held, [True])
+        self.assertIsNone(cache.get('test:key:lock'))
+
+    def test_other_workers_get_the_stale_copy(self):
+        from django.core.cache import cache
+        from . import singleflight
+        cache.set('test:key:stale', 'old', 60)
+        cache.add('test:key:lock', True, 60)  # another worker is recomputing
+
+        def compute():
+            raise AssertionError('should not recompute while another worker holds the lock')
+
+        self.assertEqual(singleflight.fetch('test:key', compute, 60), 'old')
+        self.assertEqual(singleflight.stats()['all_workers']['stale'], 1)
+
+    def test_hits_are_counted_in_batches(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from . import singleflight
+        cache.set('test:key', 42, 60)
+        with mock.patch.object(singleflight, 'FLUSH_INTERVAL', 3600), \
+                mock.patch.object(cache, 'incr', wraps=cache.incr) as incr:
+            for _ in range(singleflight.FLUSH_EVERY - 1):
+                singleflight.fetch('test:key', None, 60)
+            self.assertFalse(incr.called)
+            singleflight.fetch('test:key', None, 60)
+            self.assertEqual(incr.call_count, 1)
+        self.assertEqual(singleflight.stats()['all_workers']['hit'], singleflight.FLUSH_EVERY)
+
+
+class RecordingMiddleware:
+    """Notes the views it sees, to check that earlier middleware lets requests through."""
+    seen = []
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.seen.append(request.resolver_match.url_name)
+
+
+@override_settings(WAITING_ROOM_CAPACITY=1)
+class WaitingRoomTests(TestCase):
+    """Admission control in front of the ballot pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.election = Election.objects.create(
+            name='Council', start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1)
+        )
+        cls.candidate = CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username='candidate', email='candidate@example.com', password='x', role='candidate'
+        ))
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def voter_client(self, name):
+        client = Client()
+        client.force_login(CustomUser.objects.create_user(username=name, email=f'{name}@example.com', password='x'))
+        return client
+
+    def test_voters_beyond_capacity_wait_their_turn(self):
+        first, second, third = (self.voter_client(name) for name in ('first', 'second', 'third'))
+        self.assertTemplateUsed(first.get('/vote/'), 'voting/vote.html')
+        waiting = second.get('/vote/')
+        self.assertTemplateUsed(waiting, 'voting/waiting_room.html')
+        self.assertEqual(waiting.context['position'], 1)
+        self.assertEqual(third.get('/vote/').context['position'], 2)
+
+        with self.assertNumQueries(0):
+            self.assertFalse(second.get('/waiting-room/status/').json()['admitted'])
+
+        first.post('/submit-vote/', {'candidate_1': self.candidate.id})  # frees the place
+        self.assertTrue(second.get('/waiting-room/status/').json()['admitted'])
+        self.assertEqual(third.get('/waiting-room/status/').json()['position'], 1)
+        self.assertTemplateUsed(second.get('/vote/'), 'voting/vote.html')
+
+    def test_an_admission_only_works_for_its_own_session(self):
+        first, second = self.voter_client('first'), self.voter_client('second')
+        self.assertTemplateUsed(first.get('/vote/'), 'voting/vote.html')
+        second.cookies['waiting_room'] = first.cookies['waiting_room'].value  # copied admission
+        self.assertTemplateUsed(second.get('/vote/'), 'voting/waiting_room.html')
+        self.assertEqual(second.get('/waiting-room/status/').json()['position'], 1)
+
+    def test_admitted_requests_pass_through_the_later_middleware(self):
+        RecordingMiddleware.seen = []
+        with self.modify_settings(MIDDLEWARE={'append': 'voting.tests.RecordingMiddleware'}):
+            response = self.voter_client('first').get('/vote/')
+        self.assertTemplateUsed(response, 'voting/vote.html')
+        self.assertEqual(RecordingMiddleware.seen, ['vote'])
+
+    def test_unclaimed_places_lapse_and_claimed_ones_last_the_session(self):
+        from . import admission
+        with self.settings(WAITING_ROOM_CAPACITY=2):
+            first, second, third = admission.enqueue(), admission.enqueue(), admission.enqueue()
+        self.assertEqual(admission.admit(now=1000)['head'], 2)
+        self.assertTrue(admission.claim(first))  # the second never turns up
+        state = admission.admit(now=1000 + admission.CLAIM_TIMEOUT + 1)
+        self.assertEqual((state['head'], state['in_flight']), (third, 2))
+        self.assertFalse(admission.claim(second))  # given away
+        self.assertTrue(admission.claim(third))
+        state = admission.admit(now=1000 + admission.SESSION_TIMEOUT + 1)
+        self.assertEqual(state['in_flight'], 1)  # the first's session ran out, the third's has not
+        admission.release(third)
+        self.assertEqual(admission.stats()['in_flight'], 0)
+
+    def test_polls_cost_the_same_whatever_the_capacity(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from . import admission
+
+        def poll_cost(capacity):
+            cache.clear()
+            with self.settings(WAITING_ROOM_CAPACITY=capacity):
+                for _ in range(capacity + 1):
+                    admission.enqueue()
+                admission.admit()
+                with mock.patch.object(admission, 'cache', wraps=cache) as spy:
+                    self.assertFalse(admission.try_admission(capacity + 1)[0])
+            return sum(len(c.args[0]) if c.args and isinstance(c.args[0], (list, dict)) else 1
+                       for c in spy.method_calls)
+
+        self.assertEqual(poll_cost(1000), poll_cost(10))
+
+    def test_room_needs_a_shared_cache(self):
+        from .admission import check_cache
+        self.assertEqual([e.id for e in check_cache(None)], ['voting.E001'])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                               'LOCATION': tempfile.gettempdir()}}):
+            self.assertEqual(check_cache(None), [])
+        with self.settings(WAITING_ROOM_CAPACITY=0):
+            self.assertEqual(check_cache(None), [])
+
+    def test_capacity_follows_p95_latency(self):
+        from . import admission
+        admission._latencies.clear()
+        state = {'head': 20, 'capacity': 20, 'in_flight': 20, 'adjusted_at': 0}
+        for _ in range(admission.MIN_SAMPLES):
+            admission.record_latency(5000)
+        admission._adjust_capacity(state, now=100)
+        self.assertEqual(state['capacity'], 15)
+
+        for _ in range(admission.MIN_SAMPLES):
+            admission.record_latency(10)
+        admission._adjust_capacity(state, now=101)  # too soon after the last change
+        self.assertEqual(state['capacity'], 15)
+        admission._adjust_capacity(state, now=100 + admission.ADJUST_INTERVAL)
+        self.assertEqual(state['capacity'], 16)
+
+
+class RequestProfilingTests(TestCase):
+    """Profiles are recorded only for signed-header (or sampled) requests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x',
+                                                   role='admin', is_staff=True, is_superuser=True)
+
+    def test_signed_header_profiles_the_request(self):
+        from .models import RequestProfile
+        from .profiling import make_token
+        self.client.force_login(self.admin)
+        self.client.get('/manage-elections/', HTTP_X_PROFILE=make_token(self.admin))
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.trigger, profile.user, profile.status_code), ('header', self.admin, 200))
+        self.assertEqual(profile.sql_count, len(profile.queries))
+        # Statements are traced back to the code that issued them
+        self.assertTrue(any(q['origin'].startswith('voting/views.py') for q in profile.queries))
+        self.assertIn('manage_elections_view', profile.summary)
+
+        download = self.client.get(f'/admin/voting/requestprofile/{profile.pk}/download/')
+        self.assertEqual(download.content, bytes(profile.stats))
+
+    def test_untriggered_and_forged_requests_are_not_profiled(self):
+        from .models import RequestProfile
+        self.client.force_login(self.admin)
+        self.client.get('/manage-elections/')
+        self.client.get('/manage-elections/', HTTP_X_PROFILE='forged:token')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_tokens_lapse_when_the_admin_is_demoted(self):
+        from .models import RequestProfile
+        from .profiling import make_token
+        token = make_token(self.admin)
+        CustomUser.objects.filter(pk=self.admin.pk).update(role='voter')
+        self.client.get('/login/', HTTP_X_PROFILE=token)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_query_string_is_not_stored(self):
+        from .models import RequestProfile
+        from .profiling import make_token
+        self.client.get('/verify-login/?token=secret-login-token', HTTP_X_PROFILE=make_token(self.admin))
+        self.assertEqual(RequestProfile.objects.get().path, '/verify-login/')
+
+
+class SyntheticDataTests(TestCase):
+    """generate_election_data's generator: deterministic, and consistent with what save() would maintain."""
+
+    def test_same_seed_same_dataset(self):
+        from django.db.models import Count
+        from .datagen import generate
+        end = timezone.now()
+
+        def build(prefix):
+            dataset = generate(end=end, elections=2, voters=300, candidates=4, positions=2, turnout=0.5,
+                               seed=7, prefix=prefix)
+            votes = Vote.objects.filter(election__in=dataset['elections'])
+            return dataset, {
+                'tallies': list(CandidateProfile.objects.filter(election__in=dataset['elections']).order_by(
+                    'pk').values_list('votes_received', flat=True)),
+                'branches': list(CustomUser.objects.filter(username__startswith=f'{prefix}-voter').values(
+                    'branch').annotate(n=Count('pk')).order_by('branch')),
+                'ballots': dataset['ballots'],
+                'offsets': sorted((v.timestamp - v.election.start_date) for v in votes.select_related('election')),
+            }
+
+        first, summary = build('a')
+        self.assertEqual(summary, build('b')[1])
+
+        election = first['elections'][0]
+        votes = Vote.objects.filter(election=election)
+        self.assertEqual(votes.count(), 2 * votes.values('voter').distinct().count())  # one vote per race
+        self.assertEqual(sum(summary['tallies']), Vote.objects.filter(election__in=first['elections']).count())
+        self.assertTrue(all(election.start_date <= v.timestamp <= election.end_date for v in votes))
+        self.assertEqual(VoterProfile.objects.filter(user__username__startswith='a-', has_voted=True).count(),
+                         Vote.objects.filter(voter__user__username__startswith='a-').values('voter').distinct().count())
+
+
+class ArchiveAndDeletionTests(TestCase):
+    """Archiving a finalised election's ballots, and deleting elections in background batches."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .datagen import generate
+        from .lifecycle import finalise
+        cache.clear()
+        archive_dir = tempfile.mkdtemp(prefix='archive-test-')
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        archive_settings = self.settings(ARCHIVE_DIR=archive_dir)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+
+        dataset = generate(end=timezone.now() - timedelta(minutes=5), voters=60, candidates=3, method='irv',
+                           turnout=0.9, seed=3)
+        self.election = dataset['elections'][0]
+        finalise(self.election)
+        self.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x',
+                                                    role='admin')
+
+    def test_archived_ballots_stay_readable_and_verifiable(self):
+        from django.core.management import call_command
+        from .archive import archive_election
+        from .caching import turnout_breakdown
+        from .deletion import run_pending
+        from .exports import vote_rows
+        from .ledger import append_pending
+        from .tally import ranked_results
+
+        append_pending(self.election, batch_size=10_000)
+        candidates = list(CandidateProfile.for_election(self.election))
+        before = {
+            'rows': list(vote_rows(self.election)),
+            'turnout': turnout_breakdown(self.election),
+            'ranked': ranked_results(self.election, candidates)['ballots'],
+        }
+
+        archive = archive_election(self.election)
+        self.assertEqual(archive.vote_count, len(before['rows']))
+        self.assertEqual(archive.ranked_count, before['ranked'])
+        [job] = run_pending(batch_size=7)
+        self.assertEqual((job.status, job.kind, job.total, job.deleted), ('done', 'votes', 2 * archive.vote_count,
+                                                                          2 * archive.vote_count))
+        self.assertFalse(Vote.objects.filter(election=self.election).exists())
+
+        election = Election.objects.get(pk=self.election.pk)
+        self.assertEqual(list(vote_rows(election)), before['rows'])
+        self.assertEqual(list(vote_rows(election, after=before['rows'][9]['vote_id'])), before['rows'][10:])
+        self.assertEqual(turnout_breakdown(election), before['turnout'])
+        self.assertEqual(ranked_results(election, candidates)['ballots'], before['ranked'])
+        out = StringIO()
+        call_command('verify_ledger', election.id, stdout=out)
+        self.assertIn('archive matches the ledger', out.getvalue())
+
+        self.client.force_login(self.admin)
+        response = self.client.get(f'/results/{election.id}/')
+        self.assertEqual(response.context['total_votes'], archive.vote_count)
+
+    def test_deleting_an_election_is_queued_and_batched(self):
+        from .deletion import run_pending
+        from .lifecycle import tick
+        from .models import DeletionJob, LedgerNode
+        from .ledger import append_pending
+        append_pending(self.election, batch_size=10_000)
+        rows = (Vote.objects.filter(election=self.election).count()
+                + Ballot.objects.filter(election=self.election).count()
+                + RankedBallot.objects.filter(election=self.election).count()
+                + LedgerNode.objects.filter(election=self.election).count())
+
+        self.client.force_login(self.admin)
+        response = self.client.get(f'/delete-election/{self.election.id}/')
+        self.assertRedirects(response, '/manage-elections/', fetch_redirect_response=False)
+        self.assertTrue(Election.objects.filter(pk=self.election.pk).exists())  # not deleted in the request
+        self.assertContains(self.client.get('/manage-elections/'), 'Deleting')
+        self.assertEqual(tick(timezone.now() + timedelta(days=1))['finalised'], [])
+
+        [job] = run_pending(batch_size=25)
+        self.assertEqual((job.status, job.total, job.deleted, job.progress()), ('done', rows, rows, 100))
+        self.assertFalse(Election.objects.filter(pk=self.election.pk).exists())
+        self.assertFalse(Vote.objects.filter(election_id=self.election.pk).exists())
+        self.assertEqual(DeletionJob.objects.get(pk=job.pk).election_name, self.election.name)
+
+
+class BulkMailerTests(TestCase):
+    """MailingJob recipients, batching over reused connections, and resuming."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.election = Election.objects.create(name='Council', start_date=timezone.now(),
+                                               end_date=timezone.now() + timedelta(days=1))
+        EligibilityRule.objects.create(election=cls.election, field='branch', values=['CSE', 'ECE'])
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'voter{i}', email=f'voter{i}@example.com', password='!', first_name=f'Voter{i}',
+                       branch=branch, year_of_study=year)
+            for i, (branch, year) in enumerate([('CSE', '1'), ('ECE', '2'), ('ME', '1'), ('CSE', '3'), ('ECE', '1'),
+                                                ('CSE', '1'), ('CE', '4')])
+        ] + [CustomUser(username='candidate', email='candidate@example.com', password='!', role='candidate')])
+
+    def test_announcement_reaches_the_electorate_once(self):
+        from django.core import mail
+        from .mailer import announcement, send
+        job = send(announcement(self.election), workers=3, rate=0, batch_size=2)
+        self.assertEqual((job.status, job.total, job.sent, job.failed), ('done', 5, 5, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ['voter0@example.com', 'voter1@example.com', 'voter3@example.com', 'voter4@example.com',
+                          'voter5@example.com'])
+        message = next(m for m in mail.outbox if m.to == ['voter0@example.com'])  # workers finish in any order
+        self.assertEqual(message.subject, 'Voting is open: Council')
+        self.assertIn('Hi Voter0', message.body)
+        self.assertEqual(job.last_user_id, CustomUser.objects.get(username='voter5').pk)
+
+    def test_filters_and_resume_from_cursor(self):
+        from django.core import mail
+        from .mailer import send
+        from .models import MailingJob
+        job = MailingJob.objects.create(role='voter', branches=['CSE', 'ECE'], years=['1'], subject='Hello',
+                                        body='Hi {{ name }}', status='paused', sent=1,
+                                        last_user_id=CustomUser.objects.get(username='voter0').pk)
+        job = send(job, workers=2, rate=0, batch_size=1)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['voter4@example.com', 'voter5@example.com'])
+        self.assertEqual((job.status, job.total, job.sent), ('done', 3, 3))
+
+    def test_rate_limiter_caps_throughput(self):
+        import time
+        from .mailer import RateLimiter
+        limiter = RateLimiter(200)
+        started = time.monotonic()
+        for _ in range(300):  # a second's burst, then 100 more at 200/s
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.45)
+
+
+class LeaderboardTests(TestCase):
+    """Fenwick-tree standings, incremental updates and the election's visibility setting."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import leaderboard
+        cache.clear()
+        leaderboard.forget()
+        now = timezone.now()
+        self.election = Election.objects.create(name='Council', start_date=now - timedelta(hours=1),
+                                                end_date=now + timedelta(hours=1))
+        self.candidates = [
+            CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+                username=f'candidate{i}', email=f'candidate{i}@example.com', password='x', role='candidate'
+            ))
+            for i in range(3)
+        ]
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'voter{i}', email=f'voter{i}@example.com', password='!') for i in range(6)
+        ])
+        self.voters = VoterProfile.objects.bulk_create([VoterProfile(user=u) for u in users])
+
+    def test_ranks_match_a_full_sort(self):
+        import random
+        from .leaderboard import Standings
+        rng = random.Random(4)
+        standings = Standings({c: 0 for c in range(50)})
+        for _ in range(3000):
+            standings.increment(rng.randrange(50) if rng.random() < 0.9 else rng.randrange(3))
+            candidate = rng.randrange(50)
+            expected = 1 + sum(v > standings.counts[candidate] for v in standings.counts.values())
+            self.assertEqual(standings.rank(candidate), expected)
+
+    def test_dashboard_shows_live_rank_and_honours_visibility(self):
+        from . import leaderboard
+        Vote.objects.bulk_create([
+            Vote(voter=v, candidate=self.candidates[i % 2], election=self.election) for i, v in enumerate(self.voters[:3])
+        ])
+        self.client.force_login(self.candidates[1].user)
+        response = self.client.get('/candidate/dashboard/')
+        self.assertEqual((response.context['standing']['votes'], response.context['standing']['rank']), (1, 2))
+
+        # Ballots cast through this worker count at once, without a query
+        leaderboard.record(self.election, [self.candidates[1]])
+        leaderboard.record(self.election, [self.candidates[1]])
+        self.assertEqual(leaderboard.standing(self.election, self.candidates[1])['rank'], 1)
+
+        Election.objects.filter(pk=self.election.pk).update(results_visibility='closed')
+        response = self.client.get('/candidate/dashboard/')
+        self.assertIsNone(response.context['standing'])
+        self.assertContains(response, 'hidden until the election ends')
+
+        Election.objects.filter(pk=self.election.pk).update(results_visibility='delayed')
+        first = leaderboard.standing(Election.objects.get(pk=self.election.pk), self.candidates[1])
+        leaderboard.record(self.election, [self.candidates[0]])
+        self.assertEqual(leaderboard.standing(Election.objects.get(pk=self.election.pk), self.candidates[1]), first)
+        # Nor does a candidate editing their profile, which bumps the election's version
+        self.candidates[0].slogan = 'Forward'
+        self.candidates[0].save()
+        self.assertEqual(leaderboard.standing(Election.objects.get(pk=self.election.pk), self.candidates[1]), first)
+
+
+class ConcurrencyInvariantTests(TestCase):
+    """The invariants stress_test checks, and the losing side of a double-submit race."""
+
+    def setUp(self):
+        now = timezone.now()
+        self.election = Election.objects.create(name='Council', start_date=now - timedelta(hours=1),
+                                                end_date=now + timedelta(hours=1))
+        self.candidate = CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username='candidate', email='candidate@example.com', password='x', role='candidate'
+        ))
+        self.voter = CustomUser.objects.create_user(username='voter', email='voter@example.com', password='x')
+        self.client.force_login(self.voter)
+
+    def test_invariants_catch_counter_drift(self):
+        from .stress import check_invariants
+        self.assertEqual(self.client.post('/submit-vote/', {'candidate_1': self.candidate.pk}).status_code, 200)
+        self.assertEqual(check_invariants(), [])
+
+        CandidateProfile.objects.filter(pk=self.candidate.pk).update(votes_received=2)
+        VoterProfile.objects.filter(user=self.voter).update(has_voted=False)
+        Election.objects.create(name='Other', start_date=self.election.start_date, end_date=self.election.end_date)
+        violations = check_invariants()
+        self.assertEqual(len(violations), 3)
+        self.assertIn('the Vote table has 1', violations[0])
+
+    def test_invariants_catch_a_second_ballot(self):
+        from .stress import check_invariants
+        self.client.post('/submit-vote/', {'candidate_1': self.candidate.pk})
+        self.assertEqual(check_invariants(accepted=1), [])
+        # Accepted twice, or votes written around the Ballot row
+        self.assertEqual(len(check_invariants(accepted=2)), 1)
+        other = CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username='other', email='other@example.com', password='x', role='candidate'
+        ))
+        voter = VoterProfile.objects.get(user=CustomUser.objects.create(username='sneaky', email='s@example.com'))
+        Vote.objects.bulk_create([Vote(voter=voter, election=self.election, candidate=other, position='Treasurer')])
+        self.assertIn(f'voter {voter.pk} has votes without a ballot', check_invariants()[0])
+
+    def test_ballot_committed_after_the_check_reads_as_already_voted(self):
+        from unittest import mock
+        from .stress import check_invariants
+        self.client.post('/submit-vote/', {'candidate_1': self.candidate.pk})
+        # As if a concurrent submission committed between the check and the insert
+        with mock.patch('voting.views.votes_for', return_value=Vote.objects.none()):
+            response = self.client.post('/submit-vote/', {'candidate_1': self.candidate.pk}, follow=True)
+        self.assertContains(response, 'You have already voted.')
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(check_invariants(), [])
+
+
+@override_settings(KIOSK_ID='library-1', KIOSK_SECRET='booth-secret', KIOSK_KEYS={'library-1': 'booth-secret'},
+                   KIOSK_SERVER_URL='http://server.test')
+class KioskSyncTests(TestCase):
+    """Ballots queued at an offline kiosk, the bulk ingestion endpoint and its reconciliation report."""
+
+    def setUp(self):
+        now = timezone.now()
+        self.election = Election.objects.create(name='Council', start_date=now - timedelta(hours=1),
+                                                end_date=now + timedelta(hours=1))
+        self.candidates = [
+            CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+                username=f'candidate{i}', email=f'candidate{i}@example.com', password='x', role='candidate'
+            ))
+            for i in range(2)
+        ]
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'voter{i}', email=f'voter{i}@example.com', password='!') for i in range(300)
+        ])
+        self.voters = VoterProfile.objects.bulk_create([VoterProfile(user=u) for u in users])
+
+    def ballot(self, voter, candidate, secret='booth-secret'):
+        import uuid
+        from .kiosk import sign
+        ballot = {'ballot_id': str(uuid.uuid4()), 'kiosk': 'library-1', 'election': self.election.pk,
+                  'voter': voter.pk, 'candidates': [candidate.pk], 'ranking': [],
+                  'cast_at': timezone.now().isoformat()}
+        return {**ballot, 'signature': sign(ballot, secret)}
+
+    def sync(self, ballots):
+        return self.client.post('/kiosk/ballots/', {'kiosk': 'library-1', 'ballots': ballots},
+                                content_type='application/json').json()
+
+    def test_kiosk_queues_ballots_and_sync_casts_them(self):
+        import gzip
+        import json
+        from unittest import mock
+        from django.core.management import call_command
+        from .management.commands.kiosk_sync import Command
+        from .models import QueuedBallot
+
+        self.client.force_login(self.voters[0].user)
+        response = self.client.post('/submit-vote/', {'candidate_1': self.candidates[0].pk})
+        queued = QueuedBallot.objects.get()
+        self.assertContains(response, str(queued.ballot_id))
+        self.assertEqual(Vote.objects.count(), 0)
+        response = self.client.post('/submit-vote/', {'candidate_1': self.candidates[1].pk}, follow=True)
+        self.assertContains(response, 'You have already voted.')
+
+        def post(command, url, body):
+            self.assertEqual(json.loads(gzip.decompress(body))['ballots'][0]['ballot_id'], str(queued.ballot_id))
+            return self.client.generic('POST', '/kiosk/ballots/', body, content_type='application/json',
+                                       HTTP_CONTENT_ENCODING='gzip').json()
+
+        out = StringIO()
+        with mock.patch.object(Command, 'post', post):
+            call_command('kiosk_sync', '--once', stdout=out)
+        self.assertIn('1 accepted', out.getvalue())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'accepted')
+        self.assertEqual(Vote.objects.get().candidate, self.candidates[0])
+        self.candidates[0].refresh_from_db()
+        self.assertEqual(self.candidates[0].votes_received, 1)
+
+    def test_ingest_reconciles_duplicates_rejections_and_resends(self):
+        Vote.cast_ballot(self.voters[1], self.election, [self.candidates[0]])
+        ballots = [
+            self.ballot(self.voters[2], self.candidates[1]),
+            self.ballot(self.voters[1], self.candidates[1]),  # voted online
+            self.ballot(self.voters[3], self.candidates[1], secret='forged'),
+            self.ballot(self.voters[2], self.candidates[0]),  # a second ballot id for the same voter
+            {**self.ballot(self.voters[4], self.candidates[0]), 'candidates': [999]},
+        ]
+        report = self.sync(ballots)
+        self.assertEqual((report['accepted'], report['duplicate'], report['rejected']), (1, 2, 2))
+        self.assertEqual([r['status'] for r in report['results']],
+                         ['accepted', 'duplicate', 'rejected', 'duplicate', 'rejected'])
+        self.assertEqual(report['results'][2]['detail'], 'Bad signature.')
+        self.assertTrue(VoterProfile.objects.get(pk=self.voters[2].pk).has_voted)
+        self.candidates[1].refresh_from_db()
+        self.assertEqual(self.candidates[1].votes_received, 1)
+
+        # A lost response: the kiosk sends the batch again and gets the same answers
+        again = self.sync(ballots)
+        self.assertEqual(again['resent'], 5)
+        self.assertEqual([r['status'] for r in again['results']], [r['status'] for r in report['results']])
+        self.assertEqual(Vote.objects.count(), 2)
+
+    def test_booth_offline_at_close_syncs_into_the_frozen_tally(self):
+        from django.core.cache import cache
+        from .caching import participation, result_counts
+        from .lifecycle import tick
+        from .models import ElectionResult
+        cache.clear()
+        Vote.cast_ballot(self.voters[0], self.election, [self.candidates[0]])
+        on_time = [self.ballot(self.voters[1], self.candidates[0]), self.ballot(self.voters[2], self.candidates[1])]
+        closed = timezone.now()
+        Election.objects.filter(pk=self.election.pk).update(end_date=closed)
+        late = self.ballot(self.voters[3], self.candidates[1])
+        self.assertEqual(tick(closed)['finalised'], [self.election])
+        election = Election.objects.get(pk=self.election.pk)
+        self.assertEqual((result_counts(election), election.ballots_cast), ({self.candidates[0].pk: 1,
+                                                                             self.candidates[1].pk: 0}, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = self.sync(on_time + [late])
+        self.assertEqual([r['status'] for r in report['results']], ['accepted', 'accepted', 'rejected'])
+        self.assertEqual(report['results'][2]['detail'], 'Cast outside the election.')
+        election.refresh_from_db()
+        self.assertEqual(election.ballots_cast, 3)
+        self.assertEqual(dict(ElectionResult.objects.filter(election=election).values_list('candidate_id', 'votes')),
+                         {self.candidates[0].pk: 2, self.candidates[1].pk: 1})
+        self.assertEqual((result_counts(election), participation(election)),
+                         ({self.candidates[0].pk: 2, self.candidates[1].pk: 1}, 3))
+
+    def test_late_ballot_for_a_candidate_missing_from_the_frozen_tally(self):
+        from .lifecycle import tick
+        from .models import ElectionResult
+        newcomer = CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username='newcomer', email='newcomer@example.com', password='x', role='candidate', first_name='Nia'
+        ))
+        on_time = [self.ballot(self.voters[0], newcomer)]
+        closed = timezone.now()
+        Election.objects.filter(pk=self.election.pk).update(end_date=closed)
+        # Not standing when the election was finalised, so it has no row, even with zero votes
+        other = Election.objects.create(name='Other', start_date=closed, end_date=closed + timedelta(hours=1))
+        CandidateProfile.objects.filter(pk=newcomer.pk).update(election=other)
+        self.assertEqual(tick(closed)['finalised'], [self.election])
+        self.assertFalse(ElectionResult.objects.filter(candidate=newcomer).exists())
+        CandidateProfile.objects.filter(pk=newcomer.pk).update(election=None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.sync(on_time)['accepted'], 1)
+        result = ElectionResult.objects.get(election=self.election, candidate=newcomer)
+        self.assertEqual((result.candidate_name, result.votes), ('Nia', 1))
+        self.assertEqual(Election.objects.get(pk=self.election.pk).ballots_cast, 1)
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        small = [self.ballot(v, self.candidates[0]) for v in self.voters[:10]]
+        large = [self.ballot(v, self.candidates[1]) for v in self.voters[10:]]
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.sync(small)['accepted'], 10)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self.sync(large)['accepted'], 290)
+        # Bulk statements only split at SQLite's limit on query parameters
+        self.assertLessEqual(len(many), len(few) + 3)
+        self.assertEqual(Vote.objects.filter(candidate=self.candidates[1]).count(), 290)
+
+
+class EventLogTests(TestCase):
+    """Structured events from the views, the queued JSON file handler and sampling."""
+
+    def setUp(self):
+        now = timezone.now()
+        self.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x',
+                                                    role='admin')
+        self.election = Election.objects.create(name='Council', start_date=now - timedelta(hours=1),
+                                                end_date=now + timedelta(hours=1), is_active=False)
+
+    def test_admin_actions_and_logins_are_logged(self):
+        self.client.force_login(self.admin)
+        with self.assertLogs('voting.events') as logs:
+            self.client.post(f'/toggle-election/{self.election.pk}/')
+            self.client.logout()
+            self.client.post('/send-verification/', {'email': 'admin@example.com'})
+        toggled, issued = logs.records
+        self.assertEqual((toggled.event, toggled.fields),
+                         ('election_toggled', {'actor': self.admin.pk, 'election': self.election.pk, 'active': True}))
+        self.assertEqual((issued.event, issued.fields['user']), ('token_issued', self.admin.pk))
+
+    @override_settings(EVENT_SAMPLE_RATES={'token_issued': 0})
+    def test_sampled_out_events_are_not_logged(self):
+        from . import events
+        with self.assertLogs('voting.events') as logs:
+            events.emit('token_issued', user=1)
+            events.emit('election_toggled', actor=1)
+        self.assertEqual([r.event for r in logs.records], ['election_toggled'])
+
+    def test_handler_writes_json_lines_off_the_calling_thread_and_rotates(self):
+        import json
+        import logging
+        import os
+        from .events import QueuedRotatingFileHandler
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        handler = QueuedRotatingFileHandler(os.path.join(workdir, 'events.log'), max_bytes=2000, backup_count=2)
+        log = logging.getLogger('voting.events.test')
+        log.addHandler(handler)
+        log.propagate = False
+        try:
+            for n in range(40):
+                log.info('ballot_accepted', extra={'event': 'ballot_accepted', 'fields': {'election': n}})
+        finally:
+            log.removeHandler(handler)
+            handler.close()  # drains the queue
+        self.assertEqual(sorted(os.listdir(workdir)), ['events.log', 'events.log.1', 'events.log.2'])
+        with open(os.path.join(workdir, 'events.log')) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(lines[-1]['election'], 39)
+        self.assertEqual(lines[-1]['event'], 'ballot_accepted')
+
+
+class ConditionalResponseTests(TestCase):
+    """ETag / Last-Modified on polled pages: unchanged polls get an empty 304 before the view's queries."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        now = timezone.now()
+        self.election = Election.objects.create(name='Council', start_date=now - timedelta(hours=1),
+                                                end_date=now + timedelta(hours=1))
+        self.candidate = CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username='candidate', email='candidate@example.com', password='x', role='candidate'
+        ))
+        self.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x',
+                                                    role='admin')
+        self.voter = CustomUser.objects.create_user(username='voter', email='voter@example.com', password='x')
+
+    def poll(self, path, response):
+        """Poll `path` again with the validators of `response`; returns (poll response, queries)."""
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'],
+                                    HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        return again, len(queries)
+
+    def test_results_poll_is_answered_with_304_until_a_ballot_arrives(self):
+        self.client.force_login(self.admin)
+        path = f'/results/{self.election.pk}/'
+        with CaptureQueriesContext(connection) as full:
+            first = self.client.get(path)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertIn('private', first['Cache-Control'])
+
+        again, queries = self.poll(path, first)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+        # Saved per poll: the whole page, and every query after the session, user and election
+        # lookups and the election's two stamps
+        self.assertGreater(len(first.content), 2000)
+        self.assertLessEqual(queries, 5)
+        self.assertLess(queries, len(full))
+
+        voter_client = Client()
+        voter_client.force_login(self.voter)
+        voter_client.post('/submit-vote/', {'candidate_1': self.candidate.pk})
+        changed, _ = self.poll(path, first)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_stamps_move_for_every_worker(self):
+        from django.core.cache import cache
+        self.client.force_login(self.admin)
+        path = f'/results/{self.election.pk}/'
+        first = self.client.get(path)
+        # The ballot is counted by another worker, whose cache this one does not share
+        voter_client = Client()
+        voter_client.force_login(self.voter)
+        voter_client.post('/submit-vote/', {'candidate_1': self.candidate.pk})
+        cache.clear()
+        counted, _ = self.poll(path, first)
+        self.assertEqual(counted.status_code, 200)
+        self.assertEqual(self.poll(path, counted)[0].status_code, 304)
+
+        # An admin deletes an earlier ballot: the last one is the same, but the tally changed
+        voter_client.force_login(CustomUser.objects.create_user(username='voter2', email='voter2@example.com',
+                                                                password='x'))
+        voter_client.post('/submit-vote/', {'candidate_1': self.candidate.pk})
+        counted = self.client.get(path)
+        root = Client()
+        root.force_login(CustomUser.objects.create_superuser(username='root', email='root@example.com', password='x',
+                                                       role='admin'))
+        vote = Vote.objects.order_by('pk').first()
+        root.post(f'/admin/voting/vote/{vote.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(Vote.objects.count(), 1)
+        cache.clear()
+        self.assertEqual(self.poll(path, counted)[0].status_code, 200)
+
+    def test_ballot_page_and_dashboard_revalidate_per_voter(self):
+        self.client.force_login(self.voter)
+        self.client.get('/vote/')  # sets the CSRF cookie the ballot form's token belongs to
+        ballot = self.client.get('/vote/')
+        self.assertEqual(self.poll('/vote/', ballot)[0].status_code, 304)
+
+        # A new candidate bumps the election's version
+        CustomUser.objects.create_user(username='late', email='late@example.com', password='x', role='candidate')
+        self.assertEqual(self.poll('/vote/', ballot)[0].status_code, 200)
+
+        dashboard = self.client.get('/dashboard/')
+        self.assertNotIn('Last-Modified', dashboard)  # depends on the voter alone
+        again = self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=dashboard['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.client.post('/submit-vote/', {'candidate_1': self.candidate.pk})
+        voted = self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=dashboard['ETag'])
+        self.assertContains(voted, 'You have already voted')
+
+        # Another voter never gets this voter's page
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='x')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=voted['ETag']).status_code, 200)
+
+
+class StaticAssetTests(TestCase):
+    """Pages link the self-hosted bundles, which collectstatic fingerprints and compresses."""
+
+    def test_built_bundles_match_their_sources(self):
+        from .bundles import minify_css, stale
+        self.assertEqual(stale(), [], 'Run manage.py build_assets')
+        self.assertEqual(minify_css('/* x */ a > b { content: "a ; b" ; }'), 'a>b{content:"a ; b"}\n')
+
+    def test_pages_have_no_inline_styles_or_third_party_assets(self):
+        for path in ('/login/', '/register/'):
+            page = self.client.get(path).content.decode()
+            self.assertNotIn('<style', page)
+            self.assertNotIn('https://', page)
+            self.assertIn('/static/voting/app.css', page)
+
+    def test_collectstatic_fingerprints_and_precompresses_the_bundles(self):
+        import json
+        import os
+        from django.core.management import call_command
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        storages = {'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'}}
+        with override_settings(STATIC_ROOT=static_root, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            with open(os.path.join(static_root, 'staticfiles.json')) as f:
+                hashed = json.load(f)['paths']['voting/app.css']
+            self.assertRegex(hashed, r'^voting/app\.[0-9a-f]{12}\.css$')
+            self.assertTrue(os.path.exists(os.path.join(static_root, hashed + '.gz')))
+
+            client = Client()  # WhiteNoise indexes STATIC_ROOT when the client's middleware loads
+            self.assertContains(client.get('/login/'), f'/static/{hashed}')
+            asset = client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(asset['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', asset['Cache-Control'])
+            self.assertIn('max-age=315360000', asset['Cache-Control'])
+
+
+class APITests(TestCase):
+    """The read-only JSON API: access rules, version-cached payloads, keyset pages and the batch endpoint."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        now = timezone.now()
+        self.election = Election.objects.create(name='Council', start_date=now - timedelta(hours=1),
+                                                end_date=now + timedelta(hours=1))
+        self.candidate = CandidateProfile.objects.get(user=CustomUser.objects.create_user(
+            username='candidate', email='candidate@example.com', password='x', role='candidate',
+            first_name='Ada', last_name='Lovelace'
+        ))
+        self.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='x',
+                                                    role='admin')
+        self.voter = CustomUser.objects.create_user(username='voter', email='voter@example.com', password='x')
+
+    def test_voter_reads_the_ballot_and_their_own_status(self):
+        self.client.force_login(self.voter)
+        ballot = self.client.get(f'/api/elections/{self.election.pk}/ballot/').json()
+        self.assertEqual([c['name'] for race in ballot['races'] for c in race['candidates']], ['Ada Lovelace'])
+        self.assertEqual(self.client.get('/api/me/').json()['has_voted'], False)
+
+        self.client.post('/submit-vote/', {'candidate_1': self.candidate.pk})
+        me = self.client.get('/api/me/').json()
+        self.assertEqual((me['election'], me['eligible'], me['has_voted']), (self.election.pk, True, True))
+        # Results stay hidden from voters until the election ends
+        self.assertEqual(self.client.get(f'/api/elections/{self.election.pk}/results/').status_code, 403)
+
+    def test_cached_results_follow_the_election_version(self):
+        self.client.force_login(self.admin)
+        path = f'/api/elections/{self.election.pk}/results/'
+        self.assertEqual(self.client.get(path).json()['results'][0]['votes'], 0)
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(path)
+        self.candidate.slogan = 'Forward'
+        self.candidate.save()  # bumps the election's version
+        Vote.objects.create(voter=VoterProfile.objects.get(user=self.voter), candidate=self.candidate,
+                            election=self.election, position=self.candidate.position)
+        with CaptureQueriesContext(connection) as recomputed:
+            results = self.client.get(path).json()
+        self.assertLess(len(cached), len(recomputed))
+        self.assertEqual((results['results'][0]['votes'], results['results'][0]['leading']), (1, True))
+
+    def test_elections_are_paged_by_id(self):
+        now = timezone.now()
+        Election.objects.bulk_create([
+            Election(name=f'Old {n}', start_date=now - timedelta(days=n + 2), end_date=now - timedelta(days=n + 1),
+                     is_active=False)
+            for n in range(150)
+        ])
+        self.client.force_login(self.voter)
+        first = self.client.get('/api/elections/').json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(first['results']) + len(second['results']), 151)
+        self.assertIsNone(second['next'])
+        self.assertLess(first['results'][-1]['id'], second['results'][0]['id'])
+
+    def test_batch_answers_each_resource_on_its_own(self):
+        self.client.force_login(self.voter)
+        found = self.client.get('/api/batch/?include=active,ballot,results,me').json()
+        self.assertEqual(found['active']['id'], self.election.pk)
+        self.assertEqual(len(found['ballot']['races']), 1)
+        self.assertEqual(found['results']['status'], 403)
+        self.assertEqual(found['me']['role'], 'voter')
+        self.assertEqual(self.client.get('/api/batch/?include=everything').status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/batch/?include=me').status_code, 403)
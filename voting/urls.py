@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import admission, api, views
 
 urlpatterns = [
     path('', views.login_view, name='index'),
@@ -10,6 +10,7 @@ urlpatterns = [
     path('dashboard/', views.dashboard_view, name='dashboard'),
     path('vote/', views.vote_view, name='vote'),
     path('submit-vote/', views.submit_vote_view, name='submit_vote'),
+    path('waiting-room/status/', admission.status_view, name='waiting_room_status'),
     path('results/', views.election_results, name='election_results'),
     path('results/<int:election_id>/', views.election_results, name='election_results_specific'),
     path('candidate/dashboard/', views.candidate_dashboard_view, name='candidate_dashboard'),
@@ -21,4 +22,18 @@ urlpatterns = [
     path('create-election/', views.create_election_view, name='create_election'),
     path('toggle-election/<int:election_id>/', views.toggle_election_status_view, name='toggle_election'),
     path('delete-election/<int:election_id>/', views.delete_election_view, name='delete_election'),
+    path('ledger/<int:election_id>/', views.ledger_root_view, name='ledger_root'),
+    path('ledger/<int:election_id>/proof/<str:receipt>/', views.ledger_proof_view, name='ledger_proof'),
+    path('kiosk/ballots/', views.kiosk_ballots_view, name='kiosk_ballots'),
+    path('export/votes/<int:election_id>/', views.export_votes_view, name='export_votes'),
+    path('export/results/<int:election_id>/', views.export_results_view, name='export_results'),
+    path('stats/cache/', views.cache_stats_view, name='cache_stats'),
+    # Read-only JSON API (voting/api.py)
+    path('api/elections/', api.elections_api, name='api_elections'),
+    path('api/elections/active/', api.active_election_api, name='api_active_election'),
+    path('api/elections/<int:election_id>/ballot/', api.ballot_api, name='api_ballot'),
+    path('api/elections/<int:election_id>/results/', api.results_api, name='api_results'),
+    path('api/elections/<int:election_id>/turnout/', api.turnout_api, name='api_turnout'),
+    path('api/me/', api.me_api, name='api_me'),
+    path('api/batch/', api.batch_api, name='api_batch'),
 ]
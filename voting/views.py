@@ -1,17 +1,38 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.contrib import messages
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.core.signing import Signer, BadSignature
+import logging
 import secrets
-from .models import CustomUser, VoterProfile, CandidateProfile, Election, Vote, LoginToken
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+from .models import (CustomUser, VoterProfile, CandidateProfile, Election, EligibilityRule, Vote, LoginToken,
+                     LedgerNode, LedgerState, RankedBallot)
 from django.contrib import messages
 from django.urls import reverse
+from django.utils.http import urlencode
+from django.db.models import Q
+from django.views.decorators.csrf import csrf_exempt
+from .pagination import keyset_page, parse_cursor
+from .replica import REPLICA_DB_ALIAS, pin_to_primary, read_replica, reading_from_replica
+from .ledger import EMPTY_ROOT, inclusion_proof, receipt_for_vote
+from .exports import EXPORT_FORMATS, RESULT_FIELDS, VOTE_FIELDS, encode, result_rows, vote_rows
+from .sharding import ranked_ballots_for, vote_db, votes_for
+from .deletion import pending_for as pending_deletions, queue as queue_deletion
+from .conditional import page_stamps, revalidate
+from .caching import (
+    ballot_candidates, bump_version, count_ballot, participation, ranked_tally, result_counts,
+    turnout_breakdown,
+)
+from . import events, kiosk, leaderboard, singleflight
 
 # ===============================================
 # Basic Views
@@ -60,7 +81,7 @@ def register_view(request):
             year_of_study=year_of_study
         )
 
-        print("this is working")
+        events.emit('user_registered', user=user.pk, branch=branch, year=year_of_study)
         messages.success(request, 'Registration successful! You can now log in.')
         return redirect('login')
 
@@ -81,6 +102,7 @@ def send_verification_view(request):
             
             # Create a new login token (15 minute expiry by default)
             login_token = LoginToken.create_token(user, expiry_minutes=15)
+            events.emit('token_issued', user=user.pk, token=login_token.pk)
             
             # Sign the token for additional security (prevents tampering)
             signer = Signer()
@@ -100,9 +122,10 @@ def send_verification_view(request):
                 )
                 messages.success(request, 'Verification link sent! Check your email. Link expires in 15 minutes.')
             except Exception as email_error:
-                # If email fails, show the link in the message (development fallback)
-                print(f"Email error: {email_error}")
-                print(f"Login link for {email}: {verification_url}")
+                # If email fails, show the link in the message (development fallback).
+                # The link itself is a credential, so it is not logged.
+                events.emit('token_email_failed', logging.WARNING, user=user.pk, token=login_token.pk,
+                            error=f'{type(email_error).__name__}: {email_error}')
                 if settings.DEBUG:
                     messages.warning(request, f'Email failed. Development link: {verification_url}')
                 else:
@@ -138,6 +161,8 @@ def verify_login_view(request):
         
         # Check if token is valid (not expired, not used)
         if not login_token.is_valid():
+            events.emit('token_rejected', user=login_token.user_id, token=login_token.pk,
+                        reason='used' if login_token.is_used else 'expired')
             if login_token.is_used:
                 messages.error(request, 'This login link has already been used.')
             else:
@@ -150,6 +175,7 @@ def verify_login_view(request):
         # Log the user in
         user = login_token.user
         login(request, user)
+        events.emit('token_used', user=user.pk, token=login_token.pk)
         
         messages.success(request, f'Welcome back, {user.first_name or user.username}!')
         
@@ -166,19 +192,27 @@ def verify_login_view(request):
         messages.error(request, f'Error: {str(e)}')
         return redirect('login')
 
+def _voted_in(user, election_ids):
+    """Whether `user` has a ballot (cast, or queued at this kiosk) in any of `election_ids`"""
+    profile = VoterProfile.objects.filter(user=user).first()
+    if profile is None or not election_ids:
+        return False
+    return any(votes_for(election_id).filter(voter=profile).exists() or kiosk.has_queued(profile, election_id)
+               for election_id in election_ids)
+
+def dashboard_stamps(request):
+    user = request.user
+    voted = user.role == 'voter' and _voted_in(user, list(Election.objects.filter(is_active=True).values_list('pk', flat=True)))
+    return page_stamps(request, 'dashboard', [], user.first_name, user.last_name, user.username, voted)
+
 @login_required
+@revalidate(dashboard_stamps)
 def dashboard_view(request):
     user = request.user
     has_voted = False
     
     if user.role == 'voter':
-        try:
-            voter_profile = VoterProfile.objects.get(user=user)
-            active_elections = Election.objects.filter(is_active=True)
-            has_voted = any(Vote.objects.filter(voter=voter_profile, election=e).exists() 
-                          for e in active_elections)
-        except VoterProfile.DoesNotExist:
-            pass
+        has_voted = _voted_in(user, list(Election.objects.filter(is_active=True).values_list('pk', flat=True)))
     
     context = {
         'user': {
@@ -205,10 +239,18 @@ def admin_required(view_func):
 
 @login_required
 @admin_required
+@read_replica
 def manage_elections_view(request):
+    elections = list(Election.objects.select_related('archive').order_by('-start_date'))
+    deleting = pending_deletions([e.pk for e in elections])
+    for election in elections:
+        election.deletion = deleting.get(election.pk)
     context = {
-        'elections': Election.objects.all().order_by('-start_date'),
-        'candidates': CandidateProfile.objects.all()
+        'elections': elections,
+        'candidates': CandidateProfile.objects.all(),
+        'branch_choices': CustomUser.BRANCH_CHOICES,
+        'year_choices': CustomUser.YEAR_CHOICES,
+        'visibility_choices': Election.RESULTS_VISIBILITY_CHOICES,
     }
     return render(request, 'voting/manage_elections.html', context)
 
@@ -219,6 +261,8 @@ def create_election_view(request):
         title = request.POST.get('title')
         start_date = request.POST.get('start_date')
         end_date = request.POST.get('end_date')
+        voting_method = request.POST.get('voting_method', 'fptp')
+        results_visibility = request.POST.get('results_visibility', 'live')
         
         try:
             from django.utils.dateparse import parse_datetime
@@ -229,14 +273,55 @@ def create_election_view(request):
                 messages.error(request, 'End date must be after start date.')
                 return redirect('manage_elections')
             
-            Election.objects.all().update(is_active=False)  # Deactivate others
-            Election.objects.create(
+            if voting_method not in dict(Election.VOTING_METHOD_CHOICES):
+                messages.error(request, 'Unknown voting method.')
+                return redirect('manage_elections')
+            if results_visibility not in dict(Election.RESULTS_VISIBILITY_CHOICES):
+                messages.error(request, 'Unknown results visibility.')
+                return redirect('manage_elections')
+            seats = int(request.POST.get('seats') or 1) if voting_method == 'stv' else 1
+            if seats < 1:
+                messages.error(request, 'An election needs at least one seat.')
+                return redirect('manage_elections')
+            
+            rules = [
+                EligibilityRule(field=field, values=values)
+                for field, values in (('branch', request.POST.getlist('branches')),
+                                      ('year_of_study', request.POST.getlist('years')))
+                if values
+            ]
+            for rule in rules:
+                rule.clean()
+            
+            # An election that has already started opens now, replacing the
+            # active one; later ones are opened by `manage.py run_scheduler`
+            opens_now = start_datetime <= timezone.now()
+            if opens_now:
+                Election.objects.filter(is_active=True).update(is_active=False)
+            election = Election.objects.create(
                 name=title,
                 start_date=start_datetime,
                 end_date=end_datetime,
-                is_active=True
+                is_active=opens_now,
+                opened_at=timezone.now() if opens_now else None,
+                voting_method=voting_method,
+                seats=seats,
+                results_visibility=results_visibility,
             )
-            messages.success(request, f'Election "{title}" created!')
+            if rules:
+                for rule in rules:
+                    rule.election = election
+                EligibilityRule.objects.bulk_create(rules)
+                bump_version(election.pk)
+                Election.refresh_eligible_counts([election.pk])
+            pin_to_primary(request)
+            if opens_now:
+                messages.success(request, f'Election "{title}" created!')
+            else:
+                messages.success(request, f'Election "{title}" created; it opens automatically at '
+                                          f'{timezone.localtime(start_datetime):%b %d, %Y %H:%M}.')
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
         except Exception as e:
             messages.error(request, f'Error: {str(e)}')
     
@@ -248,11 +333,15 @@ def toggle_election_status_view(request, election_id):
     try:
         election = Election.objects.get(id=election_id)
         if not election.is_active:
-            Election.objects.all().update(is_active=False)
+            Election.objects.filter(is_active=True).update(is_active=False)
             election.is_active = True
         else:
             election.is_active = False
+        # Toggled by hand: the scheduler no longer opens this election itself
+        election.opened_at = election.opened_at or timezone.now()
         election.save()
+        pin_to_primary(request)
+        events.emit('election_toggled', actor=request.user.pk, election=election.pk, active=election.is_active)
         
         status = "activated" if election.is_active else "deactivated"
         messages.success(request, f'Election {status}.')
@@ -265,33 +354,77 @@ def toggle_election_status_view(request, election_id):
 def delete_election_view(request, election_id):
     try:
         election = Election.objects.get(id=election_id)
-        election.delete()
-        messages.success(request, 'Election deleted.')
+        if pending_deletions([election.pk]):
+            messages.info(request, 'This election is already being deleted.')
+            return redirect('manage_elections')
+        # Its rows are deleted in batches by `manage.py run_deletion_jobs` (voting/deletion.py);
+        # opened_at keeps the scheduler from opening it in the meantime
+        Election.objects.filter(pk=election.pk).update(is_active=False,
+                                                       opened_at=election.opened_at or timezone.now())
+        job = queue_deletion(election, 'election', requested_by=request.user)
+        pin_to_primary(request)
+        events.emit('election_deletion_queued', actor=request.user.pk, election=election.pk, job=job.pk)
+        messages.success(request, f'Election "{election.name}" is being deleted in the background.')
     except Election.DoesNotExist:
         messages.error(request, 'Election not found.')
     return redirect('manage_elections')
 
+ADMIN_PANEL_PAGE_SIZE = 50
+
+def search_voters(queryset, query):
+    """Filter users by name, email or branch; every search term must match."""
+    for term in query.split():
+        branches = [code for code, label in CustomUser.BRANCH_CHOICES
+                    if term.lower() == code.lower() or term.lower() in label.lower()]
+        queryset = queryset.filter(
+            Q(first_name__icontains=term) | Q(last_name__icontains=term) |
+            Q(email__icontains=term) | Q(branch__in=branches)
+        )
+    return queryset
+
 @login_required
 @admin_required
+@read_replica
 def admin_panel_view(request):
-    voters = CustomUser.objects.filter(role='voter', year_of_study__in=['3', '4'])
-    return render(request, 'voting/admin_panel.html', {'voters': voters})
+    query = request.GET.get('q', '').strip()
+    voters = CustomUser.objects.filter(role='voter', year_of_study__in=['3', '4']).only(
+        'id', 'first_name', 'last_name', 'email', 'branch', 'year_of_study'
+    )
+    if query:
+        voters = search_voters(voters, query)
+    voters, next_cursor = keyset_page(voters, parse_cursor(request.GET.get('after')), ADMIN_PANEL_PAGE_SIZE)
+    return render(request, 'voting/admin_panel.html', {
+        'voters': voters,
+        'query': query,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
+    })
 
 @login_required
 @admin_required
 def promote_candidate_view(request):
     if request.method == 'POST':
-        user_id = request.POST.get('user_id')
+        user_ids = request.POST.getlist('user_ids') or request.POST.getlist('user_id')
         try:
-            user = CustomUser.objects.get(id=user_id)
-            user.role = 'candidate'
-            user.save()
-            CandidateProfile.objects.get_or_create(user=user)
-            messages.success(request, f'{user.first_name} {user.last_name} promoted to candidate.')
-        except CustomUser.DoesNotExist:
-            messages.error(request, 'User not found.')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+            user_ids = [int(user_id) for user_id in user_ids]
+        except ValueError:
+            user_ids = []
+        if not user_ids:
+            messages.error(request, 'Select at least one user to promote.')
+        else:
+            try:
+                promoted = CustomUser.promote_to_candidates(user_ids)
+                if promoted:
+                    pin_to_primary(request)
+                    events.emit('candidates_promoted', actor=request.user.pk, users=user_ids, promoted=promoted)
+                    messages.success(request, f'{promoted} user(s) promoted to candidate.')
+                else:
+                    messages.error(request, 'User not found.')
+            except Exception as e:
+                messages.error(request, f'Error: {str(e)}')
+    query = request.POST.get('q', '').strip()
+    if query:
+        return redirect(f"{reverse('admin_panel')}?{urlencode({'q': query})}")
     return redirect('admin_panel')
 
 # ===============================================
@@ -314,15 +447,25 @@ def candidate_dashboard_view(request):
     try:
         candidate_profile = CandidateProfile.objects.get(user=request.user)
         
-        # Get current vote count
-        current_votes = Vote.objects.filter(candidate=candidate_profile).count()
-        
         # Get active election info
-        active_election = Election.objects.filter(is_active=True).first()
+        active_election = Election.objects.filter(is_active=True).order_by('-start_date').first()
+        
+        # Count and rank in the active election, from this worker's in-memory
+        # standings (voting/leaderboard.py); None while the election hides them
+        standing = None
+        if active_election and candidate_profile.election_id in (None, active_election.pk):
+            standing = leaderboard.standing(active_election, candidate_profile)
+        if standing:
+            names = {c['id']: c['name'] for c in ballot_candidates(active_election)}
+            standing['table'] = [
+                {'name': names.get(candidate_id, ''), 'votes': votes, 'rank': rank,
+                 'is_you': candidate_id == candidate_profile.pk}
+                for candidate_id, votes, rank in standing['table']
+            ]
         
         context = {
             'candidate_profile': candidate_profile,
-            'current_votes': current_votes,
+            'standing': standing,
             'active_election': active_election,
             'user_name': f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username
         }
@@ -373,8 +516,24 @@ def voter_required(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
+def _open_election_id():
+    now = timezone.now()
+    return Election.objects.filter(
+        is_active=True, start_date__lte=now, end_date__gte=now
+    ).order_by('-start_date').values_list('pk', flat=True).first()
+
+def ballot_stamps(request):
+    election_id = _open_election_id()
+    if election_id is None:
+        return None
+    user = request.user
+    # Eligibility rules and the candidates are covered by the election's version
+    return page_stamps(request, 'ballot', [election_id], user.branch, user.year_of_study,
+                       _voted_in(user, [election_id]))
+
 @login_required
 @voter_required
+@revalidate(ballot_stamps)
 def vote_view(request):
     try:
         voter_profile = VoterProfile.objects.get(user=request.user)
@@ -382,30 +541,34 @@ def vote_view(request):
             is_active=True,
             start_date__lte=timezone.now(),
             end_date__gte=timezone.now()
-        ).first()
+        ).order_by('-start_date').first()
         
         if not active_election:
             messages.error(request, 'No active elections.')
             return redirect('dashboard')
         
-        if Vote.objects.filter(voter=voter_profile, election=active_election).exists():
+        if not active_election.is_eligible(request.user):
+            messages.error(request, 'You are not eligible to vote in this election.')
+            return redirect('dashboard')
+        
+        if votes_for(active_election).filter(voter=voter_profile).exists() or kiosk.has_queued(voter_profile, active_election):
             messages.error(request, 'You have already voted.')
             return redirect('dashboard')
         
-        candidates = []
-        for c in CandidateProfile.objects.all():
-            candidate_info = {
-                'id': c.id,
-                'name': f"{c.user.first_name} {c.user.last_name}".strip() or c.user.username,
-                'party': getattr(c, 'party', 'Independent'),
-                'slogan': getattr(c, 'slogan', ''),
-                'manifesto': c.manifesto[:200] + '...' if len(c.manifesto) > 200 else c.manifesto
-            }
-            candidates.append(candidate_info)
+        # Warmed by the scheduler before the election opens (voting/caching.py)
+        candidates = ballot_candidates(active_election)
+        
+        # One race per position; the whole ballot is submitted in one go
+        races = [
+            {'position': position, 'candidates': list(group)}
+            for position, group in groupby(candidates, key=itemgetter('position'))
+        ]
         
         return render(request, 'voting/vote.html', {
             'candidates': candidates,
-            'election': active_election
+            'races': races,
+            'election': active_election,
+            'ranks': range(1, min(len(candidates), RankedBallot.MAX_RANKS) + 1),
         })
     except VoterProfile.DoesNotExist:
         messages.error(request, 'Voter profile not found.')
@@ -419,42 +582,134 @@ def submit_vote_view(request):
     
     try:
         voter_profile = VoterProfile.objects.get(user=request.user)
-        candidate_id = request.POST.get('candidate_id')
         
-        if not candidate_id:
-            messages.error(request, 'Please select a candidate.')
-            return redirect('vote')
-        
-        active_election = Election.objects.filter(is_active=True).first()
+        active_election = Election.objects.filter(
+            is_active=True,
+            start_date__lte=timezone.now(),
+            end_date__gte=timezone.now()
+        ).order_by('-start_date').first()
         if not active_election:
             messages.error(request, 'No active elections.')
             return redirect('dashboard')
         
-        candidate = get_object_or_404(CandidateProfile, id=candidate_id)
+        if not active_election.is_eligible(request.user):
+            messages.error(request, 'You are not eligible to vote in this election.')
+            return redirect('dashboard')
+        
+        ranking = None
+        if active_election.is_ranked():
+            ranking = ranking_from_post(request.POST)
+            candidate_ids = ranking[:1]
+        else:
+            candidate_ids = ballot_from_post(request.POST)
         
-        if Vote.objects.filter(voter=voter_profile, election=active_election).exists():
+        if not candidate_ids:
+            messages.error(request, 'Please select a candidate.')
+            return redirect('vote')
+        
+        standing = CandidateProfile.for_election(active_election)
+        candidates = list(standing.filter(id__in=candidate_ids))
+        if len(candidates) != len(set(candidate_ids)):
+            messages.error(request, 'Your ballot includes a candidate who is not standing in this election.')
+            return redirect('vote')
+        if len({c.position for c in candidates}) != len(candidates):
+            messages.error(request, 'Choose one candidate per position.')
+            return redirect('vote')
+        if ranking and standing.filter(id__in=ranking).count() != len(ranking):
+            messages.error(request, 'Your ranking includes an unknown candidate.')
+            return redirect('vote')
+        packed = RankedBallot.pack(ranking) if ranking else None
+        
+        # A ballot is all-or-nothing, so one check covers every race on it
+        if votes_for(active_election).filter(voter=voter_profile).exists() or kiosk.has_queued(voter_profile, active_election):
             messages.error(request, 'You have already voted.')
             return redirect('dashboard')
         
-        with transaction.atomic():
-            Vote.objects.create(
-                voter=voter_profile,
-                candidate=candidate,
-                election=active_election
-            )
-            if hasattr(voter_profile, 'has_voted'):
-                voter_profile.has_voted = True
-                voter_profile.save()
+        if settings.KIOSK_ID:
+            # Polling-station kiosk: the ballot waits here for `manage.py kiosk_sync` (voting/kiosk.py)
+            try:
+                queued = kiosk.queue_ballot(voter_profile, active_election, candidates, ranking)
+            except IntegrityError:
+                messages.error(request, 'You have already voted.')
+                return redirect('dashboard')
+            events.emit('ballot_queued', election=active_election.pk, voter=voter_profile.pk,
+                        kiosk=settings.KIOSK_ID, ballot=str(queued.ballot_id))
+            return render(request, 'voting/vote_success.html', {'queued': queued, 'election': active_election})
         
-        return render(request, 'voting/vote_success.html')
+        db = vote_db(active_election.id)
+        try:
+            with transaction.atomic(using=db):
+                # One bulk insert for every race, which also flags the voter and bumps the counts
+                votes = Vote.cast_ballot(voter_profile, active_election, candidates)
+                transaction.on_commit(lambda: leaderboard.record(active_election, candidates), using=db)
+                if packed:
+                    # The Vote holds the first preference; the full order goes alongside it
+                    ranked_ballots_for(active_election).create(
+                        voter=voter_profile,
+                        election=active_election,
+                        ranking=packed
+                    )
+        except IntegrityError:
+            # The voter's Ballot row exists: another submission committed since the check above,
+            # even if it was for other races
+            messages.error(request, 'You have already voted.')
+            return redirect('dashboard')
+        count_ballot(active_election)
+        pin_to_primary(request)
+        # Which candidates were chosen is never logged
+        events.emit('ballot_accepted', election=active_election.pk, voter=voter_profile.pk, races=len(votes))
+        
+        # The ledger append itself is batched (manage.py ledger_append); the
+        # receipt is just the ballot's leaf hash, so it is known right away.
+        return render(request, 'voting/vote_success.html', {
+            'receipts': [receipt_for_vote(vote) for vote in votes],
+            'election': active_election,
+        })
+    except ValidationError as e:
+        messages.error(request, e.messages[0])
+        return redirect('vote')
     except Exception as e:
         messages.error(request, f'Error: {str(e)}')
         return redirect('vote')
 
+def ballot_from_post(data):
+    """Chosen candidate ids from the ballot's candidate_<race> radio groups"""
+    try:
+        return [int(value) for key, value in data.items() if key.startswith('candidate_') and value]
+    except ValueError:
+        raise ValidationError('Invalid ballot.')
+
+def ranking_from_post(data):
+    """Candidate ids in order of preference from the ballot's rank_<candidate id> fields"""
+    ranks = {}
+    for key, value in data.items():
+        if not key.startswith('rank_') or not value:
+            continue
+        try:
+            rank, candidate_id = int(value), int(key[len('rank_'):])
+        except ValueError:
+            raise ValidationError('Invalid ranking.')
+        if rank in ranks:
+            raise ValidationError('Give each candidate a different rank.')
+        ranks[rank] = candidate_id
+    return [ranks[rank] for rank in sorted(ranks)]
+
+def results_stamps(request, election_id=None):
+    elections = Election.objects.filter(pk=election_id) if election_id else (
+        Election.objects.filter(is_active=True).order_by('-start_date'))
+    election = elections.only('pk', 'is_active', 'start_date', 'end_date', 'eligible_voter_count').first()
+    if election is None:
+        return None
+    # Opening and closing happen with the clock, not with a write
+    return page_stamps(request, 'results', [election.pk], election.is_voting_open(), election.has_ended(),
+                       election.eligible_voter_count)
+
 @login_required
+@revalidate(results_stamps)
+@read_replica
 def election_results(request, election_id=None):
     election = (get_object_or_404(Election, id=election_id) if election_id 
-               else Election.objects.filter(is_active=True).first())
+               else Election.objects.filter(is_active=True).order_by('-start_date').first())
     
     if not election:
         return render(request, 'voting/no_active_election.html')
@@ -462,27 +717,41 @@ def election_results(request, election_id=None):
     if request.user.role != 'admin' and not election.has_ended():
         raise PermissionDenied("Results viewable by admins only or after election ends.")
     
-    candidates_with_votes = []
-    for candidate in CandidateProfile.objects.all():
-        vote_count = Vote.objects.filter(candidate=candidate, election=election).count()
-        candidates_with_votes.append({
-            'candidate': candidate,
-            'votes': vote_count,
-            'percentage': 0
-        })
+    # Frozen tally once finalised, else a GROUP BY; single-flight cached (voting/caching.py)
+    counts = result_counts(election)
+    candidates = list(CandidateProfile.for_election(election).select_related('user'))
+    candidates_with_votes = [
+        {'candidate': candidate, 'votes': counts.get(candidate.pk, 0), 'percentage': 0, 'leading': False}
+        for candidate in candidates
+    ]
     
-    total_votes = sum(item['votes'] for item in candidates_with_votes)
+    race_totals = Counter()
+    for item in candidates_with_votes:
+        race_totals[item['candidate'].position] += item['votes']
     for item in candidates_with_votes:
-        if total_votes > 0:
-            item['percentage'] = round((item['votes'] / total_votes) * 100, 2)
+        race_total = race_totals[item['candidate'].position]
+        if race_total > 0:
+            item['percentage'] = round((item['votes'] / race_total) * 100, 2)
     
-    candidates_with_votes.sort(key=lambda x: x['votes'], reverse=True)
+    candidates_with_votes.sort(key=lambda x: (x['candidate'].position, -x['votes']))
+    for position, group in groupby(candidates_with_votes, key=lambda x: x['candidate'].position):
+        leader = next(group)
+        leader['leading'] = leader['votes'] > 0
     
-    total_eligible_voters = VoterProfile.objects.count()
+    # Ballots cast: a voter has one vote per race
+    total_votes = election.ballots_cast if election.finalised_at else participation(election)
+    total_eligible_voters = election.eligible_voter_count  # maintained by voting/signals.py
     voter_turnout = round((total_votes / total_eligible_voters) * 100, 2) if total_eligible_voters > 0 else 0
     
+    ranked = None
+    if election.is_ranked():
+        # Round-by-round instant runoff / STV count over the ranked ballots
+        ranked = ranked_tally(election, candidates)
+    
     return render(request, 'voting/results.html', {
         'election': election,
+        'ranked': ranked,
+        'turnout': turnout_breakdown(election),
         'candidates_with_votes': candidates_with_votes,
         'total_votes': total_votes,
         'total_eligible_voters': total_eligible_voters,
@@ -491,6 +760,102 @@ def election_results(request, election_id=None):
         'election_active': election.is_voting_open(),
     })
 
+# ===============================================
+# Ledger Views
+# ===============================================
+
+def ledger_root_view(request, election_id):
+    """Current size and Merkle root of an election's vote ledger"""
+    election = get_object_or_404(Election, id=election_id)
+    state = LedgerState.objects.filter(election=election).first()
+    return JsonResponse({
+        'election': election.id,
+        'tree_size': state.size if state else 0,
+        'root': state.root if state else EMPTY_ROOT,
+    })
+
+def ledger_proof_view(request, election_id, receipt):
+    """Inclusion proof for a ballot receipt; 202 while the ballot awaits the next ledger batch"""
+    election = get_object_or_404(Election, id=election_id)
+    leaf = LedgerNode.objects.filter(election=election, level=0, digest=receipt).first()
+    if leaf is None:
+        return JsonResponse({'receipt': receipt, 'status': 'pending'}, status=202)
+    state = LedgerState.objects.get(election=election)
+    return JsonResponse({
+        'election': election.id,
+        'receipt': receipt,
+        'status': 'included',
+        'position': leaf.index,
+        'tree_size': state.size,
+        'root': state.root,
+        'path': inclusion_proof(election, leaf.index, state.size),
+    })
+
+# ===============================================
+# Kiosk Views
+# ===============================================
+
+@csrf_exempt
+def kiosk_ballots_view(request):
+    """Bulk ingestion of ballots queued at polling-station kiosks; answers with a reconciliation report"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a batch of ballots.'}, status=405)
+    try:
+        kiosk_id, ballots = kiosk.read_batch(request)
+    except kiosk.KioskError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if kiosk_id not in settings.KIOSK_KEYS:
+        return JsonResponse({'error': 'Unknown kiosk.'}, status=403)
+    report = kiosk.ingest(kiosk_id, ballots)
+    events.emit('kiosk_batch_synced', kiosk=kiosk_id, batch=report['batch'], received=report['received'],
+                accepted=report['accepted'], duplicate=report['duplicate'], rejected=report['rejected'],
+                resent=report['resent'])
+    return JsonResponse(report)
+
+# ===============================================
+# Export Views
+# ===============================================
+
+def _export_response(request, chunks, fields, basename):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f'Unknown format: {fmt}')
+    compress = request.GET.get('gzip') == '1'
+    response = StreamingHttpResponse(
+        encode(chunks, fields, fmt=fmt, compress=compress),
+        content_type='application/gzip' if compress else EXPORT_FORMATS[fmt],
+    )
+    filename = f"{basename}.{fmt}{'.gz' if compress else ''}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required
+@admin_required
+@read_replica
+def export_votes_view(request, election_id):
+    """Stream every vote of an election as CSV or NDJSON (?format=, ?gzip=1, ?after=<vote id>)"""
+    election = get_object_or_404(Election, id=election_id)
+    # Rows are read after the view returns, so fix the database now
+    using = REPLICA_DB_ALIAS if reading_from_replica() else 'default'
+    rows = vote_rows(election, after=parse_cursor(request.GET.get('after')), using=using)
+    return _export_response(request, rows, VOTE_FIELDS, f'election-{election.id}-votes')
+
+@login_required
+@admin_required
+@read_replica
+def export_results_view(request, election_id):
+    """Stream per-candidate vote counts of an election as CSV or NDJSON"""
+    election = get_object_or_404(Election, id=election_id)
+    using = REPLICA_DB_ALIAS if reading_from_replica() else 'default'
+    return _export_response(request, result_rows(election, using=using), RESULT_FIELDS,
+                            f'election-{election.id}-results')
+
+@login_required
+@admin_required
+def cache_stats_view(request):
+    """How often cached results were served, computed or coalesced (voting/singleflight.py)"""
+    return JsonResponse(singleflight.stats())
+
 @login_required
 def logout_view(request):
     logout(request)
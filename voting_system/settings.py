@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'voting.profiling.RequestProfilingMiddleware',  # first, so profiles cover all the other middleware
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Added for static files in production
@@ -38,6 +39,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'voting.admission.WaitingRoomMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -68,11 +70,105 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Write transactions take the lock when they begin. With SQLite's default
+        # (deferred), a transaction that read first cannot wait for the lock when
+        # it comes to write and fails with 'database is locked' at once; see
+        # `manage.py stress_test`.
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
     }
 }
 
 AUTH_USER_MODEL = 'voting.CustomUser'
 
+# Per-election vote shards: when set, each election's Vote rows are stored in
+# <VOTE_SHARD_DIR>/election_<id>.sqlite3 (see voting/sharding.py)
+VOTE_SHARD_DIR = os.environ.get('VOTE_SHARD_DIR', '')
+
+# Ballots of archived elections, as compressed files written by
+# `manage.py archive_elections` (see voting/archive.py)
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# Read replica for results, admin lists and exports (see voting/replica.py).
+# Locally, point REPLICA_DB_NAME at a snapshot kept fresh by
+# `python manage.py refresh_replica --interval 5`.
+REPLICA_DB_NAME = os.environ.get('REPLICA_DB_NAME', '')
+if REPLICA_DB_NAME:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_DB_NAME,
+        'OPTIONS': {'init_command': 'PRAGMA query_only = ON'},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Seconds a replica may lag behind before reads fall back to the primary; also
+# how long a session that just wrote stays pinned to the primary
+REPLICA_LAG_TOLERANCE = int(os.environ.get('REPLICA_LAG_TOLERANCE', '10'))
+
+DATABASE_ROUTERS = ['voting.routers.ElectionShardRouter', 'voting.routers.ReplicaRouter']
+
+# Shared cache for ballots, eligibility rules and participation counts (see
+# voting/caching.py). The local-memory default is per process, so caches the
+# scheduler warms, and invalidations, only reach web workers through a shared
+# backend (check --deploy requires one), e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache with
+# CACHE_LOCATION=redis://127.0.0.1:6379, or a FileBasedCache directory.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Waiting room in front of vote/ and submit-vote/ (see voting/admission.py):
+# voters allowed on the ballot pages at once to start with (0, the default,
+# turns it off), adjusted up or down to keep ballot requests' p95 latency under
+# the target. Its queue lives in the cache, so it needs a shared CACHE_BACKEND.
+WAITING_ROOM_CAPACITY = int(os.environ.get('WAITING_ROOM_CAPACITY', '0'))
+WAITING_ROOM_TARGET_P95_MS = int(os.environ.get('WAITING_ROOM_TARGET_P95_MS', '1000'))
+
+# Structured event log (see voting/events.py): JSON lines written by a
+# background thread, the file rotated at EVENT_LOG_MAX_BYTES keeping
+# EVENT_LOG_BACKUPS old files. EVENT_SAMPLE_RATES keeps only a fraction of
+# high-volume events, e.g. ballot_accepted=0.1,token_issued=0.5
+EVENT_LOG_FILE = os.environ.get('EVENT_LOG_FILE', str(BASE_DIR / 'logs' / 'events.log'))
+EVENT_LOG_MAX_BYTES = int(os.environ.get('EVENT_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+EVENT_LOG_BACKUPS = int(os.environ.get('EVENT_LOG_BACKUPS', '5'))
+EVENT_SAMPLE_RATES = {
+    event: float(rate) for event, rate in
+    (pair.split('=', 1) for pair in os.environ.get('EVENT_SAMPLE_RATES', '').split(',') if '=' in pair)
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'events': {
+            '()': 'voting.events.QueuedRotatingFileHandler',
+            'filename': EVENT_LOG_FILE,
+            'max_bytes': EVENT_LOG_MAX_BYTES,
+            'backup_count': EVENT_LOG_BACKUPS,
+        },
+    },
+    'loggers': {
+        'voting.events': {'handlers': ['events'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Polling-station kiosks (see voting/kiosk.py). On a kiosk, whose database is
+# a snapshot of the server's: its id, its signing secret and the server that
+# `manage.py kiosk_sync` sends queued ballots to. On the server: every kiosk's
+# secret, as comma-separated id=secret pairs.
+KIOSK_ID = os.environ.get('KIOSK_ID', '')
+KIOSK_SECRET = os.environ.get('KIOSK_SECRET', '')
+KIOSK_SERVER_URL = os.environ.get('KIOSK_SERVER_URL', '')
+KIOSK_KEYS = dict(pair.split('=', 1) for pair in os.environ.get('KIOSK_KEYS', '').split(',') if '=' in pair)
+
+# Request profiling (see voting/profiling.py). Besides requests carrying a
+# `manage.py profile_token` header, profile this fraction of requests whose
+# path starts with one of the comma-separated prefixes
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SAMPLE_PATHS = [p for p in os.environ.get('PROFILE_SAMPLE_PATHS', '/').split(',') if p]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -99,8 +195,17 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-# Whitenoise configuration for serving static files in production
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Whitenoise configuration for serving static files in production. collectstatic
+# fingerprints every file (app.3f2a9c1b.css) and writes compressed variants next to
+# it; WhiteNoise serves the fingerprinted names with far-future, immutable cache
+# headers (voting/bundles.py). The test runner (voting/testing.py) renders pages
+# without collecting first, so it swaps in the plain storage.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+TEST_RUNNER = 'voting.testing.TestRunner'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -124,6 +229,13 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 #     EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 #     DEFAULT_FROM_EMAIL = os.environ.get('EMAIL_HOST_USER', 'noreply@yourdomain.com')
 
+# Bulk email (see voting/mailer.py): worker threads, each holding one
+# connection to the mail server, the most messages sent per second across
+# them (0: no cap), and recipients read from the database per batch
+MAILER_WORKERS = int(os.environ.get('MAILER_WORKERS', '4'))
+MAILER_RATE = float(os.environ.get('MAILER_RATE', '50'))
+MAILER_BATCH_SIZE = int(os.environ.get('MAILER_BATCH_SIZE', '100'))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',